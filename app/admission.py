@@ -0,0 +1,89 @@
+# app/admission.py
+"""
+Admission control для работы с БД.
+
+Без него при подвисшем Postgres каждый запрос ждёт соединение DB_POOL_TIMEOUT
+секунд, а uvicorn продолжает принимать новые — копятся тысячи зависших
+корутин. Здесь одновременно к БД допускается не больше DB_MAX_INFLIGHT
+запросов, в очереди ждут не больше DB_MAX_QUEUE и не дольше DB_QUEUE_TIMEOUT
+секунд; остальным сразу 503 с Retry-After (обработчик — в main.py).
+
+Фоновый диспетчер outbox сюда не входит: он не отвечает клиентам и сам
+отступает при ошибках.
+"""
+from __future__ import annotations
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from . import metrics
+from .config import settings
+
+
+class Overloaded(Exception):
+    """Запрос не допущен к БД — отвечаем 503 с Retry-After."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Семафор с ограниченной очередью и таймаутом ожидания. limit <= 0 — без ограничения."""
+
+    def __init__(self, limit: int, max_queue: int, queue_timeout: float, retry_after: int):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.inflight = 0
+        self.queued = 0
+        self._sem = asyncio.Semaphore(max(limit, 1))
+
+    def _reject(self, reason: str) -> Overloaded:
+        metrics.observe_admission_rejected(reason)
+        return Overloaded(reason, self.retry_after)
+
+    def check(self) -> None:
+        """Без ожидания: отказ, если все слоты заняты (для низкоприоритетных запросов)."""
+        if self.limit > 0 and self._sem.locked():
+            raise self._reject("saturated")
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        if self.limit <= 0:
+            yield
+            return
+        if self._sem.locked():
+            if self.queued >= self.max_queue:
+                raise self._reject("queue_full")
+            self.queued += 1
+            try:
+                await asyncio.wait_for(self._sem.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                raise self._reject("queue_timeout") from None
+            finally:
+                self.queued -= 1
+        else:
+            await self._sem.acquire()
+        self.inflight += 1
+        try:
+            yield
+        finally:
+            self.inflight -= 1
+            self._sem.release()
+
+
+db_admission = AdmissionController(
+    limit=(
+        settings.DB_MAX_INFLIGHT
+        if settings.DB_MAX_INFLIGHT is not None
+        else settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+    ),
+    max_queue=settings.DB_MAX_QUEUE,
+    queue_timeout=settings.DB_QUEUE_TIMEOUT,
+    retry_after=settings.OVERLOAD_RETRY_AFTER,
+)
+metrics.track_admission("db", db_admission)
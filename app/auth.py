@@ -1,48 +1,145 @@
 # app/auth.py
-import hmac, hashlib, urllib.parse
+import hmac
+import math
 from typing import Optional
 from fastapi import Header, HTTPException, Request
+from pydantic import ValidationError
+from . import idempotency, metrics
 from .config import settings  # settings.BOT_TOKEN
+from .ratelimit import RateLimiter, build_backend
+from .schemas import TransferCreate
+from .security import TelegramInitData, parse_init_data, verify_init_data
 
-def _parse_init_data(raw: str) -> dict:
-    # initData приходит как query-string; parse_qsl сам сделает percent-decode
-    pairs = urllib.parse.parse_qsl(raw, keep_blank_values=True, strict_parsing=False)
-    return {k: v for k, v in pairs}
-
-def _calc_hash(data: dict, bot_token: str) -> str:
-    # data_check_string: key=value\n (отсортированные ключи, кроме "hash")
-    lines = [f"{k}={data[k]}" for k in sorted(data) if k != "hash"]
-    check = "\n".join(lines).encode()
-    secret = hmac.new(b"WebAppData", bot_token.encode(), hashlib.sha256).digest()
-    return hmac.new(secret, check, hashlib.sha256).hexdigest()
-
-def validate_init_data(raw: str, bot_token: str) -> bool:
-    if not raw or "hash=" not in raw:
-        return False
-    data = _parse_init_data(raw)
-    rec = data.get("hash", "")
-    calc = _calc_hash(data, bot_token)
-    return hmac.compare_digest(calc.lower(), rec.lower())
-
-async def require_telegram(
-    request: Request,
+transfer_limiter = RateLimiter(
+    build_backend(settings.RATE_LIMIT_REDIS_URL, settings.RATE_LIMIT_MAX_KEYS),
+    {
+        "user": (settings.RATE_LIMIT_USER_PER_MINUTE, settings.RATE_LIMIT_USER_BURST),
+        "ip": (settings.RATE_LIMIT_IP_PER_MINUTE, settings.RATE_LIMIT_IP_BURST),
+        "batch": (settings.RATE_LIMIT_BATCH_ITEMS_PER_MINUTE, settings.RATE_LIMIT_BATCH_BURST),
+    },
+)
+
+def resolve_init_data(init_data: str) -> Optional[TelegramInitData]:
+    """
+    Опциональная проверка подписи Telegram initData (401 при ошибке).
+    Пока тестируете на внешнем домене, можно отключить через env:
+    SKIP_INITDATA_VERIFY=true
+    """
+    if not settings.SKIP_INITDATA_VERIFY and settings.BOT_TOKEN:
+        init = verify_init_data(init_data)
+        if init is None:
+            raise HTTPException(status_code=401, detail="Invalid Telegram init data")
+        return init
+    # без проверки подписи — разбираем только ради user.id
+    return parse_init_data(init_data)
+
+async def require_telegram_user(
     x1: Optional[str] = Header(None, alias="X-Telegram-InitData"),
-    x2: Optional[str] = Header(None, alias="X-Telegram-Init-Data"),  # на всякий случай
-):
-    # если BOT_TOKEN пустой — пропускаем (удобно для теста из браузера)
-    if not settings.BOT_TOKEN:
-        return True
+    x2: Optional[str] = Header(None, alias="X-Telegram-Init-Data"),
+) -> TelegramInitData:
+    # Эндпоинты «от имени пользователя» отдают чужие данные (телефоны), поэтому только
+    # по проверенной подписи: без BOT_TOKEN или с SKIP_INITDATA_VERIFY — всегда 401
+    if settings.SKIP_INITDATA_VERIFY or not settings.BOT_TOKEN:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    init = verify_init_data((x1 or x2 or "").strip())
+    if init is None or init.user_id is None:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    return init
 
-    raw = x1 or x2
-    if not raw:
-        # fallback: возьмём из тела, если фронт положил туда
-        try:
-            body = await request.json()
-            if isinstance(body, dict):
-                raw = body.get("telegram_init_data", "")
-        except Exception:
-            raw = ""
-
-    if not validate_init_data(raw, settings.BOT_TOKEN):
+async def require_admin(
+    x_admin_token: Optional[str] = Header(None, alias="X-Admin-Token"),
+) -> None:
+    # Доступ диспетчеров к чтению заявок (телефоны клиентов). Без ADMIN_TOKEN — закрыто:
+    # забытая переменная не должна открывать данные; открыть можно только явно (ADMIN_OPEN, dev)
+    if not settings.ADMIN_TOKEN:
+        if settings.ADMIN_OPEN:
+            return
+        raise HTTPException(status_code=503, detail="ADMIN_TOKEN не задан: чтение заявок отключено.")
+    # байты: на не-ASCII строках compare_digest бросает TypeError (был бы 500)
+    if not x_admin_token or not hmac.compare_digest(
+        x_admin_token.encode(), settings.ADMIN_TOKEN.encode()
+    ):
         raise HTTPException(status_code=401, detail="Unauthorized")
-    return True
+
+def client_ip(request: Request) -> str:
+    """
+    IP клиента для лимита. За прокси (Render) адрес соединения — адрес прокси,
+    поэтому при RATE_LIMIT_IP_HEADER берётся значение, которое записал сам прокси:
+    RATE_LIMIT_PROXY_HOPS-й адрес справа в списке (левее клиент может дописать что угодно).
+    Нет заголовка — адрес соединения.
+    """
+    if settings.RATE_LIMIT_IP_HEADER:
+        value = request.headers.get(settings.RATE_LIMIT_IP_HEADER, "")
+        hops = [h.strip() for h in value.split(",") if h.strip()]
+        n = max(settings.RATE_LIMIT_PROXY_HOPS, 1)
+        if len(hops) >= n:
+            return hops[-n]
+    return request.client.host if request.client else "unknown"
+
+def _signature_checked() -> bool:
+    return bool(settings.BOT_TOKEN) and not settings.SKIP_INITDATA_VERIFY
+
+def rate_limit_key(request: Request, init: Optional[TelegramInitData]) -> tuple[str, str]:
+    """
+    Чей лимит: user.id только из проверенного initData (неподписанный можно
+    подделать), иначе IP клиента (client_ip; за прокси нужен RATE_LIMIT_IP_HEADER).
+    init — результат resolve_init_data (без проверки подписи user.id не берём).
+    """
+    if _signature_checked() and init is not None and init.user_id is not None:
+        return "user", str(init.user_id)
+    return "ip", client_ip(request)
+
+async def charge_transfer_rate(scope: str, key: str, cost: float = 1.0) -> None:
+    """Берёт cost токенов из корзины scope:key; нет токенов — 429 с Retry-After."""
+    retry_after = await transfer_limiter.check(scope, key, cost)
+    if retry_after > 0:
+        metrics.observe_rate_limited(scope)
+        raise HTTPException(
+            status_code=429,
+            detail="Слишком много заявок, повторите позже.",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+
+async def limit_transfer_rate(
+    request: Request,
+    x1: Optional[str] = Header(None, alias="X-Telegram-InitData"),
+    x2: Optional[str] = Header(None, alias="X-Telegram-Init-Data"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+) -> None:
+    """
+    Лимит частоты POST /transfers: зависимость уровня маршрута, поэтому 429
+    отдаётся раньше admission control и сессии БД. Ключ — rate_limit_key.
+    Повтор уже принятой заявки (ключ идемпотентности в кэше процесса) токен
+    не тратит: ретрай должен получить исходный ответ, а не 429. Проверка
+    подписи кэшируется в app/security.py, обработчик повторно её не считает.
+    """
+    raw = x1 or x2
+    try:
+        body = await request.json()  # уже разобрано FastAPI, берётся из кэша Request
+    except Exception:
+        body = None
+    if not isinstance(body, dict):
+        body = {}
+    raw = (raw or body.get("telegram_init_data") or "").strip()
+    # как resolve_init_data, но без 401 — его отдаст обработчик
+    init = verify_init_data(raw) if _signature_checked() else parse_init_data(raw)
+
+    try:
+        data = TransferCreate.model_validate(body)
+    except ValidationError:
+        data = None  # 422 отдаст обработчик
+    if data is not None:
+        key = idempotency.derive_key(idempotency_key, init, data)
+        if key and idempotency.cached(key) is not None:
+            return
+
+    await charge_transfer_rate(*rate_limit_key(request, init))
+
+async def limit_batch_rate(request: Request, init: Optional[TelegramInitData], cost: int) -> None:
+    """
+    Лимит POST /transfers/batch: своя область "batch", токен на каждую заявку,
+    которую пакет запишет (повторы из кэша не в счёт). Вызывается из обработчика —
+    число заявок известно только после разбора тела.
+    """
+    scope, key = rate_limit_key(request, init)
+    await charge_transfer_rate("batch", f"{scope}:{key}", cost)
@@ -0,0 +1,142 @@
+# app/backfill_initdata.py
+"""
+Миграция transfer.telegram_init_data → telegram_user_id / telegram_auth_date.
+
+1. добавляет новые колонки и индекс (если их ещё нет);
+2. проходит по старым строкам пачками (keyset по id, без загрузки всей таблицы),
+   разбирает initData и заполняет новые колонки; с --audit копирует сырую строку
+   в transfer_init_data_audit;
+3. удаляет колонку telegram_init_data (без неё новые INSERT не упадут на NOT NULL).
+
+Запуск (синхронный движок, можно повторять — обработанные строки пропускаются):
+    python -m app.backfill_initdata --batch-size 1000 [--audit]
+
+То же без --audit выполняет миграция 0002 (alembic upgrade head), но одной
+транзакцией миграции: вся таблица переписывается без промежуточных commit,
+обновлённые строки заблокированы до конца upgrade. На большой таблице сначала
+запусти этот скрипт (commit после каждой пачки, можно прервать и продолжить),
+тогда миграция найдёт колонку уже удалённой и пропустит шаг. Отдельный запуск
+нужен и чтобы сохранить сырые initData (--audit).
+
+Прогресс пишется в лог (logger app.backfill_initdata, уровень INFO).
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import (
+    BigInteger, DateTime, bindparam, column, inspect, select, table, text, update,
+)
+from sqlalchemy.engine import Connection
+
+from .db import engine
+from .models import TransferInitDataAudit
+from .security import parse_init_data
+
+logger = logging.getLogger(__name__)
+
+transfer = table(
+    "transfer",
+    column("id"),
+    column("telegram_init_data"),
+    column("telegram_user_id", BigInteger),
+    column("telegram_auth_date", DateTime),
+)
+
+
+def _add_columns(conn: Connection) -> None:
+    existing = {c["name"] for c in inspect(conn).get_columns("transfer")}
+    if "telegram_user_id" not in existing:
+        conn.execute(text("ALTER TABLE transfer ADD COLUMN telegram_user_id BIGINT"))
+    if "telegram_auth_date" not in existing:
+        conn.execute(text("ALTER TABLE transfer ADD COLUMN telegram_auth_date TIMESTAMP"))
+    indexes = {i["name"] for i in inspect(conn).get_indexes("transfer")}
+    if "ix_transfer_telegram_user_id_datetime" not in indexes:
+        conn.execute(text(
+            "CREATE INDEX ix_transfer_telegram_user_id_datetime ON transfer (telegram_user_id, datetime)"
+        ))
+
+
+def backfill(conn: Connection, batch_size: int, audit: bool, commit: bool = True) -> int:
+    """
+    Заполняет новые колонки пачками; возвращает число обработанных строк.
+    commit=False — внутри чужой транзакции (миграция 0002): всё одной транзакцией.
+    """
+    done = 0
+    last_id = None
+    while True:
+        stmt = (
+            select(transfer.c.id, transfer.c.telegram_init_data)
+            .where(transfer.c.telegram_user_id.is_(None))
+            .where(transfer.c.telegram_init_data != "")
+            .order_by(transfer.c.id)
+            .limit(batch_size)
+        )
+        if last_id is not None:
+            stmt = stmt.where(transfer.c.id > last_id)
+        rows = conn.execute(stmt).all()
+        if not rows:
+            return done
+
+        updates, audit_rows = [], []
+        for row_id, raw in rows:
+            init = parse_init_data(raw)
+            if init is None or init.user_id is None:
+                continue
+            auth_date = (
+                datetime.fromtimestamp(init.auth_date, timezone.utc).replace(tzinfo=None)
+                if init.auth_date else None
+            )
+            updates.append({"b_id": row_id, "b_user_id": init.user_id, "b_auth_date": auth_date})
+            if audit:
+                audit_rows.append({"transfer_id": uuid.UUID(str(row_id)), "init_data": raw,
+                                   "created_at": datetime.utcnow()})
+        if updates:
+            conn.execute(
+                update(transfer)
+                .where(transfer.c.id == bindparam("b_id"))
+                .values(
+                    telegram_user_id=bindparam("b_user_id"),
+                    telegram_auth_date=bindparam("b_auth_date"),
+                ),
+                updates,
+            )
+        if audit_rows:
+            conn.execute(TransferInitDataAudit.__table__.insert(), audit_rows)
+        if commit:
+            conn.commit()
+        done += len(rows)
+        last_id = rows[-1][0]
+        logger.info("processed %s rows", done)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Backfill telegram_user_id из telegram_init_data")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--audit", action="store_true",
+                        help="скопировать сырые initData в transfer_init_data_audit")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    with engine.connect() as conn:
+        columns = {c["name"] for c in inspect(conn).get_columns("transfer")}
+        if "telegram_init_data" not in columns:
+            print("telegram_init_data already dropped, nothing to do")
+            return
+        _add_columns(conn)
+        if args.audit:
+            TransferInitDataAudit.__table__.create(conn, checkfirst=True)
+        conn.commit()
+
+        backfill(conn, args.batch_size, args.audit)
+
+        conn.execute(text("ALTER TABLE transfer DROP COLUMN telegram_init_data"))
+        conn.commit()
+        print("done")
+
+
+if __name__ == "__main__":
+    main()
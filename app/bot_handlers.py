@@ -0,0 +1,36 @@
+# app/bot_handlers.py
+# Обработчики бота и Dispatcher — общие для polling (bot.py, run.py) и webhook (app/webhook.py).
+from aiogram import Dispatcher, Router
+from aiogram.filters import Command, CommandStart
+from aiogram.types import Message
+
+from .admission import Overloaded
+from .history import format_history_text, get_user_transfers
+
+router = Router()
+
+
+@router.message(CommandStart())
+async def on_start(m: Message):
+    # Никаких WebApp-кнопок. Пользователь открывает мини-апп
+    # через нижнюю меню-кнопку «Заявка на трансфер»
+    # (настраивается в BotFather -> /setmenubutton -> Web App).
+    await m.answer(
+        "Здравствуйте! Чтобы оформить поездку, нажмите нижнюю кнопку "
+        "«Заявка на трансфер»."
+    )
+
+
+@router.message(Command("my"))
+async def on_my(m: Message):
+    # Запрос идёт через async-движок — общий event loop с API не блокируется
+    try:
+        history = await get_user_transfers(m.from_user.id)
+    except Overloaded:
+        await m.answer("Сервис сейчас перегружен, попробуйте через минуту.")
+        return
+    await m.answer(format_history_text(history))
+
+
+dp = Dispatcher()
+dp.include_router(router)
@@ -0,0 +1,328 @@
+# app/cities.py
+"""
+Справочник городов: подсказки для GET /cities/suggest и нормализованный id
+города, который пишется в transfer.departure_city_id / arrival_city_id рядом
+с сырой строкой («Москва», «москва», «Moscow» → moscow).
+
+Индекс в памяти процесса — отсортированный список ключей, поиск по префиксу
+через bisect (O(log n) + размер ответа). Ключи: нормализованное название
+(регистр, ё/е, дефисы), каждое слово-хвост («петербург» для
+«Санкт-Петербург»), транслитерация и алиасы. Запрос пробуется как есть и в
+другой раскладке клавиатуры («vjcr» → «моск»).
+
+Источники: встроенный список BUNDLED_CITIES и самые частые значения из
+transfer за CITIES_DB_LOOKBACK_DAYS (load_from_db при старте). Новые заявки
+дополняют индекс (observe) — в пределах своего процесса и только названиями,
+набравшими CITIES_SUGGEST_MIN_COUNT заявок.
+
+Проставить id старым заявкам (--recompute — пересчитать и уже проставленные):
+    python -m app.cities backfill [--recompute]
+"""
+from __future__ import annotations
+
+import argparse
+import re
+from bisect import bisect_left, insort
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, literal_column, or_, union_all, update
+from sqlmodel import Session, select
+
+from .config import settings
+from .db import AsyncSessionLocal, engine
+from .models import Transfer
+
+# (id, название, алиасы); транслитерацию названия добавлять в алиасы не нужно
+BUNDLED_CITIES: tuple[tuple[str, str, tuple[str, ...]], ...] = (
+    ("moscow", "Москва", ("Moscow", "Мск", "Msk")),
+    ("saint-petersburg", "Санкт-Петербург", ("Saint Petersburg", "St Petersburg", "СПб", "Spb", "Питер", "Piter")),
+    ("novosibirsk", "Новосибирск", ()),
+    ("yekaterinburg", "Екатеринбург", ("Yekaterinburg", "Екб", "Ekb")),
+    ("kazan", "Казань", ()),
+    ("nizhny-novgorod", "Нижний Новгород", ("Nizhny Novgorod", "Нн")),
+    ("chelyabinsk", "Челябинск", ()),
+    ("samara", "Самара", ()),
+    ("omsk", "Омск", ()),
+    ("rostov-on-don", "Ростов-на-Дону", ("Rostov-on-Don", "Ростов")),
+    ("ufa", "Уфа", ()),
+    ("krasnoyarsk", "Красноярск", ()),
+    ("voronezh", "Воронеж", ()),
+    ("perm", "Пермь", ()),
+    ("volgograd", "Волгоград", ()),
+    ("krasnodar", "Краснодар", ()),
+    ("saratov", "Саратов", ()),
+    ("tyumen", "Тюмень", ()),
+    ("tolyatti", "Тольятти", ("Togliatti",)),
+    ("izhevsk", "Ижевск", ()),
+    ("barnaul", "Барнаул", ()),
+    ("irkutsk", "Иркутск", ()),
+    ("ulyanovsk", "Ульяновск", ()),
+    ("khabarovsk", "Хабаровск", ()),
+    ("vladivostok", "Владивосток", ()),
+    ("yaroslavl", "Ярославль", ()),
+    ("makhachkala", "Махачкала", ()),
+    ("tomsk", "Томск", ()),
+    ("orenburg", "Оренбург", ()),
+    ("kemerovo", "Кемерово", ()),
+    ("ryazan", "Рязань", ()),
+    ("astrakhan", "Астрахань", ()),
+    ("penza", "Пенза", ()),
+    ("kirov", "Киров", ()),
+    ("lipetsk", "Липецк", ()),
+    ("kaliningrad", "Калининград", ()),
+    ("tula", "Тула", ()),
+    ("kursk", "Курск", ()),
+    ("stavropol", "Ставрополь", ()),
+    ("sochi", "Сочи", ()),
+    ("adler", "Адлер", ()),
+    ("krasnaya-polyana", "Красная Поляна", ()),
+    ("anapa", "Анапа", ()),
+    ("gelendzhik", "Геленджик", ()),
+    ("novorossiysk", "Новороссийск", ()),
+    ("mineralnye-vody", "Минеральные Воды", ("Минводы", "Mineralnye Vody")),
+    ("kislovodsk", "Кисловодск", ()),
+    ("pyatigorsk", "Пятигорск", ()),
+    ("simferopol", "Симферополь", ()),
+    ("sevastopol", "Севастополь", ()),
+    ("yalta", "Ялта", ()),
+    ("tver", "Тверь", ()),
+    ("vladimir", "Владимир", ()),
+    ("suzdal", "Суздаль", ()),
+    ("kostroma", "Кострома", ()),
+    ("veliky-novgorod", "Великий Новгород", ("Veliky Novgorod",)),
+    ("pskov", "Псков", ()),
+    ("petrozavodsk", "Петрозаводск", ()),
+    ("murmansk", "Мурманск", ()),
+    ("arkhangelsk", "Архангельск", ()),
+    ("surgut", "Сургут", ()),
+    ("minsk", "Минск", ()),
+    ("almaty", "Алматы", ("Алма-Ата",)),
+    ("astana", "Астана", ()),
+    ("tashkent", "Ташкент", ()),
+    ("tbilisi", "Тбилиси", ()),
+    ("yerevan", "Ереван", ()),
+    ("baku", "Баку", ()),
+)
+
+_TRANSLIT = dict(zip(
+    "абвгдеёжзийклмнопрстуфхцчшщъыьэюя",
+    ["a", "b", "v", "g", "d", "e", "e", "zh", "z", "i", "y", "k", "l", "m", "n", "o",
+     "p", "r", "s", "t", "u", "f", "kh", "ts", "ch", "sh", "shch", "", "y", "", "e", "yu", "ya"],
+))
+_EN = "qwertyuiop[]asdfghjkl;'zxcvbnm,.`"
+_RU = "йцукенгшщзхъфывапролджэячсмитьбюё"
+_EN_TO_RU = str.maketrans(_EN, _RU)
+_RU_TO_EN = str.maketrans(_RU, _EN)
+_SEPARATORS = re.compile(r"[\s\-–—.,()\"«»]+")
+
+
+def normalize(value: str) -> str:
+    """Регистр, ё→е, дефисы/точки → пробел; «г. Москва» → «москва»."""
+    text = _SEPARATORS.sub(" ", value.casefold().replace("ё", "е")).strip()
+    if text.startswith("г "):
+        text = text[2:]
+    return text
+
+
+def translit(value: str) -> str:
+    return "".join(_TRANSLIT.get(ch, ch) for ch in value)
+
+
+def other_layout(value: str) -> str:
+    """Текст, набранный не в той раскладке: латиница ↔ кириллица по позициям клавиш."""
+    if re.search("[a-z]", value):
+        return value.translate(_EN_TO_RU)
+    return value.translate(_RU_TO_EN)
+
+
+def slugify(normalized: str) -> str:
+    return normalized.replace(" ", "-")[:64]
+
+
+def _keys(name: str, aliases: tuple[str, ...] = ()) -> set[str]:
+    keys = set()
+    for value in (name, *aliases):
+        norm = normalize(value)
+        for variant in (norm, translit(norm)):
+            words = variant.split(" ")
+            # полное название и каждый хвост с границы слова
+            keys.update(" ".join(words[i:]) for i in range(len(words)))
+    keys.discard("")
+    return keys
+
+
+class CityIndex:
+    """
+    id города — чистая функция строки: известный город (BUNDLED_CITIES) по
+    названию, алиасу, транслиту или раскладке, иначе slug транслитерации
+    («Уренгой», «Urengoy» → urengoy). От того, что индекс видел раньше, id не
+    зависит — одинаков во всех воркерах и после рестарта.
+
+    Неизвестные названия попадают в подсказки, только набрав min_count заявок
+    (счётчики кандидатов — LRU на max_candidates ключей), и не больше
+    max_learned штук на процесс: разовые строки пользователей другим не показываются.
+    """
+
+    def __init__(self, min_count: int = 1, max_learned: int = 1000, max_candidates: int = 10000) -> None:
+        self._keys: list[tuple[str, str]] = []  # (ключ, id), отсортирован
+        self._exact: dict[str, str] = {}        # полное нормализованное название/алиас → id (только add)
+        self._names: dict[str, str] = {}        # id → название для показа
+        self.popularity: Counter[str] = Counter()
+        self.min_count = min_count
+        self.max_learned = max_learned
+        self.max_candidates = max_candidates
+        self._learned = 0
+        self._candidates: OrderedDict[str, list] = OrderedDict()  # id → [заявок, название], LRU
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def add(self, city_id: str, name: str, aliases: tuple[str, ...] = ()) -> None:
+        """Город справочника: точные совпадения для resolve + ключи подсказок."""
+        self._names.setdefault(city_id, name)
+        for value in (name, *aliases):
+            norm = normalize(value)
+            self._exact.setdefault(norm, city_id)
+            self._exact.setdefault(translit(norm), city_id)
+        self._add_keys(city_id, name, aliases)
+
+    def _add_keys(self, city_id: str, name: str, aliases: tuple[str, ...] = ()) -> None:
+        for key in _keys(name, aliases):
+            i = bisect_left(self._keys, (key, city_id))
+            if i == len(self._keys) or self._keys[i] != (key, city_id):
+                insort(self._keys, (key, city_id))
+
+    def resolve(self, raw: str) -> str | None:
+        """id города справочника по точному (с точностью до нормализации) совпадению."""
+        norm = normalize(raw)
+        for variant in (norm, translit(norm), normalize(other_layout(norm))):
+            city_id = self._exact.get(variant)
+            if city_id is not None:
+                return city_id
+        return None
+
+    def city_id(self, raw: str) -> str | None:
+        norm = normalize(raw)
+        if not norm:
+            return None
+        return self.resolve(raw) or slugify(translit(norm))
+
+    def observe(self, raw: str, weight: int = 1) -> str | None:
+        """id города для новой заявки; неизвестное название копит счёт до min_count."""
+        if not raw or not raw.strip():
+            return None
+        city_id = self.city_id(raw)
+        if city_id is None:
+            return None
+        if city_id in self._names:
+            self.popularity[city_id] += weight
+        else:
+            self._count_candidate(city_id, raw.strip()[:64], weight)
+        return city_id
+
+    def _count_candidate(self, city_id: str, name: str, weight: int) -> None:
+        entry = self._candidates.pop(city_id, None) or [0, name]
+        entry[0] += weight
+        if entry[0] >= self.min_count and self._learned < self.max_learned:
+            self._learned += 1
+            self._names[city_id] = entry[1]
+            self.popularity[city_id] = entry[0]
+            self._add_keys(city_id, entry[1])
+            return
+        self._candidates[city_id] = entry  # в конец — самый свежий
+        if len(self._candidates) > self.max_candidates:
+            self._candidates.popitem(last=False)
+
+    def suggest(self, q: str, limit: int = 10) -> list[tuple[str, str]]:
+        norm = normalize(q)
+        if not norm:
+            top = self.popularity.most_common(limit)
+            return [(city_id, self._names[city_id]) for city_id, _ in top]
+        found: set[str] = set()
+        for prefix in {norm, translit(norm), normalize(other_layout(norm))}:
+            i = bisect_left(self._keys, (prefix, ""))
+            while i < len(self._keys) and self._keys[i][0].startswith(prefix):
+                found.add(self._keys[i][1])
+                i += 1
+        ranked = sorted(found, key=lambda c: (-self.popularity[c], self._names[c]))
+        return [(city_id, self._names[city_id]) for city_id in ranked[:limit]]
+
+
+index = CityIndex(
+    min_count=settings.CITIES_SUGGEST_MIN_COUNT,
+    max_learned=settings.CITIES_LEARNED_MAX,
+    max_candidates=settings.CITIES_CANDIDATES_MAX,
+)
+for _city_id, _name, _aliases in BUNDLED_CITIES:
+    index.add(_city_id, _name, _aliases)
+
+
+def _frequent_stmt():
+    since = datetime.utcnow() - timedelta(days=settings.CITIES_DB_LOOKBACK_DAYS)
+    cities = union_all(
+        select(Transfer.departure_city.label("city")).where(Transfer.created_at >= since),
+        select(Transfer.arrival_city.label("city")).where(Transfer.created_at >= since),
+    ).subquery()
+    n = func.count().label("n")
+    return (
+        select(cities.c.city, n)
+        .group_by(cities.c.city)
+        .order_by(literal_column("n").desc())
+        .limit(settings.CITIES_DB_LIMIT)
+    )
+
+
+async def load_from_db() -> None:
+    """Частые значения из transfer (по индексу created_at за последние N дней)."""
+    async with AsyncSessionLocal() as session:
+        rows = (await session.exec(_frequent_stmt())).all()
+    for city, n in rows:
+        index.observe(city, weight=n)
+
+
+# ------------------------------- CLI -------------------------------
+
+def backfill(recompute: bool = False) -> None:
+    """
+    departure_city_id / arrival_city_id для старых заявок: по одному UPDATE на сырое
+    значение. recompute — пересчитать и проставленные (id прежних версий зависели
+    от порядка заявок), после этого — python -m app.stats rebuild.
+    """
+    with Session(engine) as session:
+        for raw_col, id_col in (
+            (Transfer.departure_city, Transfer.departure_city_id),
+            (Transfer.arrival_city, Transfer.arrival_city_id),
+        ):
+            stmt = select(raw_col).distinct()
+            if not recompute:
+                stmt = stmt.where(id_col.is_(None))
+            values = session.exec(stmt).all()
+            for raw in values:
+                city_id = index.observe(raw)
+                session.exec(
+                    update(Transfer)
+                    .where(raw_col == raw, or_(id_col.is_(None), id_col != city_id))
+                    .values({id_col: city_id})
+                )
+                session.commit()
+            print(f"{raw_col.key}: {len(values)} distinct values")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Справочник городов")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("backfill", help="проставить *_city_id старым заявкам")
+    p.add_argument("--recompute", action="store_true", help="пересчитать и уже проставленные id")
+    p = sub.add_parser("suggest", help="проверить подсказки")
+    p.add_argument("q")
+    args = parser.parse_args(argv)
+    if args.command == "backfill":
+        backfill(args.recompute)
+    else:
+        for city_id, name in index.suggest(args.q):
+            print(f"{city_id}\t{name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings
 
 
@@ -5,13 +7,85 @@ class Settings(BaseSettings):
     # URL подключения к БД
     DATABASE_URL: str
 
+    # Пул соединений с БД (для PostgreSQL; SQLite эти параметры игнорирует)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0     # сек. ожидания свободного соединения из пула
+    DB_POOL_RECYCLE: int = 1800       # сек., после которых соединение пересоздаётся
+    DB_CONNECT_TIMEOUT: int = 10      # сек. на установку TCP-соединения с БД
+    DB_POOL_WARM: int = 2             # соединений, открываемых в фоне при старте (0 — не греть)
+    # Схемой управляют миграции (alembic upgrade head); true — create_all при старте (dev/тесты)
+    DB_AUTO_CREATE: bool = False
+
+    # SQLite-режим (DATABASE_URL=sqlite:///…): прагмы на каждое соединение и group commit
+    SQLITE_WAL: bool = True           # journal_mode=WAL: чтения не ждут запись
+    SQLITE_SYNCHRONOUS: Literal["OFF", "NORMAL", "FULL", "EXTRA"] = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000  # сколько ждать блокировку записи другим процессом
+    SQLITE_GROUP_COMMIT: bool = True  # POST /transfers пишет через один writer-таск (app/sqlite_writer.py)
+    SQLITE_WRITER_MAX_BATCH: int = 64  # заявок в одной транзакции writer'а
+
+    # Admission control (app/admission.py): сколько запросов одновременно работают с БД
+    # (по умолчанию DB_POOL_SIZE + DB_MAX_OVERFLOW; 0 — без ограничения), сколько ждут в очереди
+    # и сколько секунд; сверх этого — сразу 503 с Retry-After
+    DB_MAX_INFLIGHT: int | None = None
+    DB_MAX_QUEUE: int = 50
+    DB_QUEUE_TIMEOUT: float = 1.0
+    OVERLOAD_RETRY_AFTER: int = 5     # сек., значение заголовка Retry-After
+
+    # Лимит POST /transfers (429 + Retry-After): по проверенному user.id из initData, иначе по IP.
+    # 0 в *_PER_MINUTE — без ограничения
+    RATE_LIMIT_USER_PER_MINUTE: float = 6.0
+    RATE_LIMIT_USER_BURST: int = 3
+    RATE_LIMIT_IP_PER_MINUTE: float = 30.0
+    RATE_LIMIT_IP_BURST: int = 10
+    # POST /transfers/batch: отдельная корзина на клиента, токен — на каждую заявку пакета
+    RATE_LIMIT_BATCH_ITEMS_PER_MINUTE: float = 600.0
+    RATE_LIMIT_BATCH_BURST: int = 500
+    RATE_LIMIT_MAX_KEYS: int = 10000  # корзин в памяти процесса (LRU)
+    RATE_LIMIT_REDIS_URL: str = ""    # redis://… — общие корзины для всех воркеров
+    # IP клиента за прокси: заголовок, который пишет прокси (Render — X-Forwarded-For), и сколько
+    # прокси перед API (берётся N-й адрес справа). Пусто — адрес соединения (API без прокси)
+    RATE_LIMIT_IP_HEADER: str = ""
+    RATE_LIMIT_PROXY_HOPS: int = 1
+
     # Основной токен бота (для верификации initData)
     BOT_TOKEN: str | None = None
 
+    # Режим бота: polling (dev, run.py/bot.py) или webhook (апдейты идут в API,
+    # можно несколько воркеров uvicorn). Для webhook нужен публичный WEBHOOK_URL.
+    BOT_MODE: str = "polling"
+    WEBHOOK_URL: str | None = None        # например https://transfer-api.onrender.com
+    WEBHOOK_PATH: str = "/telegram/webhook"
+    WEBHOOK_SECRET: str | None = None     # пусто — выводится из BOT_TOKEN
+
     # ⚡ ВРЕМЕННЫЙ ФЛАГ: отключение проверки initData
     # Если true → POST /transfers разрешается без проверки подписи Telegram
+    # (GET /me/transfers при этом всегда отвечает 401)
     SKIP_INITDATA_VERIFY: bool = False
 
+    # Срок годности initData по auth_date, сек. (0 — не проверять)
+    INITDATA_MAX_AGE: int = 86400
+    # Сохранять сырой initData в transfer_init_data_audit (по умолчанию — только user.id)
+    STORE_RAW_INITDATA: bool = False
+    # Кэш уже проверенных initData (повторные отправки из одной сессии мини-аппа)
+    INITDATA_CACHE_SIZE: int = 2048
+    INITDATA_CACHE_TTL: int = 600
+
+    # Токен диспетчеров для чтения заявок (заголовок X-Admin-Token).
+    # Пустой — чтение закрыто (503), если не включён ADMIN_OPEN
+    ADMIN_TOKEN: str | None = None
+    # ⚡ Только для dev: без ADMIN_TOKEN чтение заявок открыто всем
+    ADMIN_OPEN: bool = False
+
+    # Заголовок Server-Timing с длительностями этапов POST /transfers (для бенчмарков)
+    SERVER_TIMING: bool = False
+
+    # Метрики Prometheus на GET /metrics (латентность, этапы, пул БД, вызовы Telegram)
+    METRICS_ENABLED: bool = True
+
+    # orjson для тел запросов/ответов API и вызовов Bot API (app/fastjson.py)
+    FAST_JSON: bool = False
+
     # Список доменов, которым разрешён доступ (через CORS)
     # Можно оставить пустым — тогда в main.py будет * (всё разрешено)
     CORS_ORIGINS: str = ""
@@ -20,6 +94,82 @@ class Settings(BaseSettings):
     FORWARD_BOT_TOKEN: str | None = None
     FORWARD_CHAT_ID: str | None = None
 
+    # HTTP-клиент Bot API (app/telegram_client.py).
+    # TELEGRAM_API_BASE можно направить на локальную заглушку для тестов.
+    TELEGRAM_API_BASE: str = "https://api.telegram.org"
+    TELEGRAM_TIMEOUT: float = 10.0
+    TELEGRAM_CONNECT_TIMEOUT: float = 5.0
+    TELEGRAM_MAX_CONNECTIONS: int = 20
+    TELEGRAM_MAX_KEEPALIVE: int = 10
+    TELEGRAM_KEEPALIVE_EXPIRY: float = 60.0   # сек. жизни простаивающего соединения
+    TELEGRAM_HTTP2: bool = False
+
+    # Кэш ключей идемпотентности POST /transfers (повторы без похода в БД)
+    IDEMPOTENCY_CACHE_SIZE: int = 4096
+    IDEMPOTENCY_CACHE_TTL: int = 600
+    # Сколько сек. ключ хранится в transfer_idempotency: позже повтор создаст новую заявку
+    IDEMPOTENCY_KEY_TTL: int = 172800
+    # Раз в сколько сек. API удаляет просроченные ключи (0 — не удалять, только python -m app.idempotency purge)
+    IDEMPOTENCY_PURGE_INTERVAL: float = 3600.0
+
+    # История пользователя (/me/transfers, /my в боте)
+    HISTORY_UPCOMING_LIMIT: int = 10
+    HISTORY_RECENT_LIMIT: int = 5
+    HISTORY_CACHE_SIZE: int = 2048
+    HISTORY_CACHE_TTL: int = 60   # сек.; при новой заявке пользователя кэш сбрасывается
+
+    # Максимум заявок в одном POST /transfers/batch
+    TRANSFER_BATCH_MAX_ITEMS: int = 500
+
+    # Выгрузка /transfers/export и python -m app.export: строк на одну пачку курсора
+    EXPORT_CHUNK_ROWS: int = 1000
+
+    # Помесячные партиции transfer (только PostgreSQL, app/partitions.py)
+    PARTITION_MONTHS_AHEAD: int = 12    # сколько месяцев вперёд держать созданными
+    PARTITION_RETAIN_MONTHS: int = 24   # месяцы поездок старше — в архив
+    ARCHIVE_DIR: str = "archive"        # куда писать transfer_pYYYY_MM.ndjson.gz
+
+    # Outbox уведомлений (app/outbox.py)
+    # false → диспетчер не стартует вместе с API, запускайте outbox_worker.py отдельно
+    OUTBOX_DISPATCHER_ENABLED: bool = True
+    OUTBOX_POLL_INTERVAL: float = 2.0   # сек. между опросами таблицы
+    OUTBOX_BATCH_SIZE: int = 20
+    # сек. аренды забранной пачки: дольше отправки OUTBOX_BATCH_SIZE сообщений (по TELEGRAM_TIMEOUT);
+    # строки упавшего диспетчера вернутся в очередь через это время
+    OUTBOX_LEASE_SECONDS: float = 300.0
+    OUTBOX_MAX_ATTEMPTS: int = 10       # после этого сообщение уходит в dead
+    OUTBOX_BACKOFF_BASE: float = 2.0    # сек., задержка удваивается с каждой попыткой
+    OUTBOX_BACKOFF_MAX: float = 900.0
+
+    # Подсказки городов (app/cities.py): сколько частых значений из transfer и за какой период
+    # подгружать в индекс при старте
+    CITIES_DB_LIMIT: int = 500
+    CITIES_DB_LOOKBACK_DAYS: int = 180
+    # Неизвестное название попадает в подсказки, набрав столько заявок; не больше CITIES_LEARNED_MAX
+    # таких названий на процесс, счётчики кандидатов — LRU на CITIES_CANDIDATES_MAX
+    CITIES_SUGGEST_MIN_COUNT: int = 3
+    CITIES_LEARNED_MAX: int = 1000
+    CITIES_CANDIDATES_MAX: int = 10000
+
+    # GET /stats: кэш ответа из сводной таблицы, сек.
+    STATS_CACHE_TTL: int = 30
+
+    # Автопарк (app/fleet.py): не принимать заявку, если все машины класса заняты
+    FLEET_CHECK_ENABLED: bool = False
+    FLEET_DEFAULT_TRIP_MINUTES: int = 120  # если пары городов нет в route_duration
+    FLEET_BUFFER_MINUTES: int = 30         # подача и возврат машины между поездками
+
+    # Сообщения менеджерам в FORWARD_CHAT_ID: лимит Telegram для группы ~20 в минуту
+    FORWARD_RATE_PER_MINUTE: float = 20.0  # 0 — без ограничения
+    FORWARD_RATE_BURST: int = 5
+    # Дайджест: копим заявки до FORWARD_DIGEST_WINDOW сек. или FORWARD_DIGEST_MAX_ITEMS штук
+    # и отправляем одним сообщением (режется по 4096 символов)
+    FORWARD_DIGEST_ENABLED: bool = False
+    FORWARD_DIGEST_WINDOW: float = 60.0
+    FORWARD_DIGEST_MAX_ITEMS: int = 20
+    # Заявка с выездом раньше чем через столько минут уходит сразу, минуя дайджест
+    FORWARD_URGENT_WITHIN_MINUTES: int = 180
+
 
 # Экземпляр настроек (автоматически подтянет переменные из env)
 settings = Settings()
@@ -1,4 +1,16 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from . import metrics
+from .admission import db_admission
 from .config import settings
 
 db_url = settings.DATABASE_URL
@@ -8,11 +20,144 @@ if db_url.startswith("postgres://"):
 elif db_url.startswith("postgresql://") and "+psycopg" not in db_url:
     db_url = db_url.replace("postgresql://", "postgresql+psycopg://", 1)
 
-engine = create_engine(db_url, pool_pre_ping=True)
+is_sqlite = db_url.startswith("sqlite")
+
+# psycopg 3 умеет и sync, и async — для async-движка URL тот же.
+# Для SQLite нужен отдельный async-драйвер (aiosqlite).
+async_db_url = db_url
+if is_sqlite and "+aiosqlite" not in async_db_url:
+    async_db_url = async_db_url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+
+
+def _engine_kwargs() -> dict:
+    """Параметры пула и таймаутов из Settings (SQLite пул не настраиваем)."""
+    if is_sqlite:
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        "pool_pre_ping": True,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "connect_args": {"connect_timeout": settings.DB_CONNECT_TIMEOUT},
+    }
+
+
+def _sqlite_connect(dbapi_connection, connection_record) -> None:
+    # транзакции начинает SQLAlchemy (_sqlite_begin), а не драйвер — иначе не работают SAVEPOINT
+    dbapi_connection.isolation_level = None
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={'WAL' if settings.SQLITE_WAL else 'DELETE'}")
+    cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.close()
+
+
+def _sqlite_begin(conn) -> None:
+    # BEGIN IMMEDIATE — для транзакций из begin_write, остальные (чтение) — обычный BEGIN
+    mode = conn.get_execution_options().get("sqlite_begin", "")
+    conn.exec_driver_sql(f"BEGIN {mode}".strip())
+
+
+def _setup_sqlite(sync_engine) -> None:
+    event.listen(sync_engine, "connect", _sqlite_connect)
+    event.listen(sync_engine, "begin", _sqlite_begin)
+
+
+# Синхронный движок — только для CLI/обслуживания (create_all, ручные скрипты).
+engine = create_engine(db_url, **_engine_kwargs())
+
+
+class TimedAsyncPool(AsyncAdaptedQueuePool):
+    """Пул, который замеряет ожидание свободного соединения (метрика checkout wait)."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            metrics.observe_pool_wait(time.perf_counter() - started)
+
+
+# Асинхронный движок — основной путь для API (не блокирует event loop).
+async_engine = create_async_engine(
+    async_db_url,
+    **_engine_kwargs(),
+    **({} if is_sqlite else {"poolclass": TimedAsyncPool}),
+)
+metrics.track_pool("async", async_engine.pool)
+if is_sqlite:
+    _setup_sqlite(engine)
+    _setup_sqlite(async_engine.sync_engine)
+
+# expire_on_commit=False: после commit объект остаётся читаемым без refresh
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, expire_on_commit=False
+)
+
+async def begin_write(session: AsyncSession) -> None:
+    """
+    Начинает транзакцию, которая будет писать (вызывать до первого запроса в ней).
+    На SQLite — BEGIN IMMEDIATE: блокировка записи берётся сразу, ожидание — busy_timeout.
+    С обычным BEGIN транзакция, успевшая прочитать, падает на первой записи с
+    SQLITE_BUSY_SNAPSHOT («database is locked»), если между чтением и записью
+    закоммитил кто-то другой, и busy_timeout тут не помогает. На PostgreSQL — ничего.
+    """
+    if is_sqlite:
+        await session.connection(execution_options={"sqlite_begin": "IMMEDIATE"})
+
+@asynccontextmanager
+async def write_session() -> AsyncIterator[AsyncSession]:
+    """Сессия для пишущей транзакции (outbox, writer SQLite, очистка): begin_write сразу."""
+    async with AsyncSessionLocal() as session:
+        await begin_write(session)
+        yield session
 
 def init_db() -> None:
+    # Только для dev/тестов (DB_AUTO_CREATE); в проде схема — alembic upgrade head
     SQLModel.metadata.create_all(engine)
 
+async def warm_pool() -> None:
+    """Открывает DB_POOL_WARM соединений заранее, чтобы первые запросы не ждали connect/TLS."""
+    n = min(settings.DB_POOL_WARM, 1 if is_sqlite else settings.DB_POOL_SIZE)
+
+    async def ping() -> None:
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    # одновременно — иначе пул n раз отдаст одно и то же соединение
+    await asyncio.gather(*(ping() for _ in range(n)))
+
 def get_session():
     with Session(engine) as session:
         yield session
+
+async def get_async_session():
+    # при перегрузке бросает Overloaded → 503 до того, как запрос займёт соединение
+    async with db_admission.slot():
+        async with AsyncSessionLocal() as session:
+            yield session
+
+# SQLSTATE-классы, при которых БД недоступна, а не ошибка в запросе:
+# 08 — соединение, 53 — ресурсы сервера (too many connections), 57P — сервер останавливается
+_UNAVAILABLE_SQLSTATES = ("08", "53", "57P")
+_SQLITE_UNAVAILABLE = ("database is locked", "database is busy", "unable to open database file")
+
+def is_unavailable(exc: OperationalError) -> bool:
+    """
+    OperationalError — это и обрыв соединения, и «no such table» / синтаксис (на SQLite).
+    Перегрузкой (503) считаем только первое, остальное — ошибка приложения (500).
+    """
+    if exc.connection_invalidated:
+        return True
+    orig = exc.orig
+    if is_sqlite:
+        return any(m in str(orig).lower() for m in _SQLITE_UNAVAILABLE)
+    sqlstate = getattr(orig, "sqlstate", None)
+    if sqlstate:
+        return sqlstate.startswith(_UNAVAILABLE_SQLSTATES)
+    return True  # psycopg без SQLSTATE: сервер не ответил (connect_timeout, обрыв)
+
+async def dispose_engines() -> None:
+    await async_engine.dispose()
+    engine.dispose()
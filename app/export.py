@@ -0,0 +1,155 @@
+# app/export.py
+"""
+Потоковая выгрузка заявок в CSV / NDJSON.
+
+Строки читаются серверным курсором (stream_results + yield_per) пачками по
+EXPORT_CHUNK_ROWS и сразу уходят клиенту, поэтому память не зависит от
+объёма выгрузки, а первый байт приходит до окончания запроса.
+
+CLI (синхронный движок, для бухгалтерии/крона):
+    python -m app.export --format csv --datetime-from 2025-10-01 --datetime-to 2025-11-01 -o oct.csv
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import json
+import sys
+from datetime import datetime
+from enum import Enum
+from typing import AsyncIterator, Iterable, Iterator, Sequence
+
+from sqlmodel import select
+
+from .config import settings
+from .admission import db_admission
+from .db import AsyncSessionLocal, engine
+from .models import Transfer, VehicleClass
+from .queries import TransferFilters
+
+EXPORT_FORMATS = ("csv", "ndjson")
+MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+EXPORT_COLUMNS = (
+    Transfer.id,
+    Transfer.created_at,
+    Transfer.datetime,
+    Transfer.departure_city,
+    Transfer.departure_address,
+    Transfer.arrival_city,
+    Transfer.arrival_address,
+    Transfer.departure_city_id,
+    Transfer.arrival_city_id,
+    Transfer.vehicle_class,
+    Transfer.pax_count,
+    Transfer.luggage,
+    Transfer.child_seat,
+    Transfer.contact_phone,
+    Transfer.contact_method,
+    Transfer.comment,
+)
+FIELD_NAMES = [c.key for c in EXPORT_COLUMNS]
+
+
+def export_stmt(filters: TransferFilters):
+    return (
+        select(*EXPORT_COLUMNS)
+        .where(*filters.conditions())
+        .order_by(Transfer.datetime, Transfer.id)
+    )
+
+
+def _plain(value):
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)  # uuid
+
+
+def encode_header(fmt: str) -> str:
+    if fmt != "csv":
+        return ""
+    buf = io.StringIO()
+    csv.writer(buf).writerow(FIELD_NAMES)
+    return buf.getvalue()
+
+
+def encode_rows(rows: Iterable, fmt: str, field_names: Sequence[str] = FIELD_NAMES) -> str:
+    """Кодирует пачку строк результата в кусок CSV/NDJSON (field_names — ключи NDJSON)."""
+    if fmt == "csv":
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        for row in rows:
+            writer.writerow(["" if v is None else _plain(v) for v in row])
+        return buf.getvalue()
+    return "".join(
+        json.dumps(dict(zip(field_names, map(_plain, row))), ensure_ascii=False) + "\n"
+        for row in rows
+    )
+
+
+async def stream_export(filters: TransferFilters, fmt: str) -> AsyncIterator[bytes]:
+    """Тело StreamingResponse. Сессия своя: зависимость закрылась бы до начала отдачи."""
+    yield encode_header(fmt).encode()
+    async with db_admission.slot(), AsyncSessionLocal() as session:
+        result = await session.stream(
+            export_stmt(filters),
+            execution_options={"yield_per": settings.EXPORT_CHUNK_ROWS},
+        )
+        async for rows in result.partitions():
+            yield encode_rows(rows, fmt).encode()
+
+
+def iter_export_sync(filters: TransferFilters, fmt: str) -> Iterator[str]:
+    yield encode_header(fmt)
+    with engine.connect() as conn:
+        result = conn.execution_options(
+            stream_results=True, yield_per=settings.EXPORT_CHUNK_ROWS
+        ).execute(export_stmt(filters))
+        for rows in result.partitions():
+            yield encode_rows(rows, fmt)
+
+
+# ------------------------------- CLI -------------------------------
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Выгрузка заявок в CSV/NDJSON")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+    parser.add_argument("-o", "--output", help="файл (по умолчанию stdout)")
+    parser.add_argument("--datetime-from", type=datetime.fromisoformat)
+    parser.add_argument("--datetime-to", type=datetime.fromisoformat)
+    parser.add_argument("--departure-city")
+    parser.add_argument("--arrival-city")
+    parser.add_argument("--departure-city-id")
+    parser.add_argument("--arrival-city-id")
+    parser.add_argument("--vehicle-class", type=VehicleClass)
+    parser.add_argument("--created-from", type=datetime.fromisoformat)
+    parser.add_argument("--created-to", type=datetime.fromisoformat)
+    args = parser.parse_args(argv)
+
+    filters = TransferFilters(
+        datetime_from=args.datetime_from,
+        datetime_to=args.datetime_to,
+        departure_city=args.departure_city,
+        arrival_city=args.arrival_city,
+        departure_city_id=args.departure_city_id,
+        arrival_city_id=args.arrival_city_id,
+        vehicle_class=args.vehicle_class,
+        created_from=args.created_from,
+        created_to=args.created_to,
+    )
+    out = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+    try:
+        for chunk in iter_export_sync(filters, args.format):
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
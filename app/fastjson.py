@@ -0,0 +1,39 @@
+# app/fastjson.py
+"""
+JSON для горячего пути: тела POST /transfers и ответов API, вызовы Bot API,
+поле user в initData.
+
+FAST_JSON=true — orjson (C/Rust, сразу bytes в UTF-8, в разы быстрее на
+коротких объектах), иначе stdlib json. Реализация выбирается один раз при
+импорте, на запросе нет даже проверки флага. orjson — необязательная
+зависимость: без FAST_JSON он не нужен, с FAST_JSON без него приложение не
+стартует (а не тихо работает медленно).
+
+Ключи идемпотентности считаются stdlib json (app/idempotency.py) в обоих
+режимах — байты orjson отличаются, и переключение флага сломало бы повторы.
+"""
+from __future__ import annotations
+
+import json
+from typing import Any, Callable
+
+from .config import settings
+
+try:
+    import orjson
+except ImportError:  # необязательная зависимость
+    orjson = None
+
+if settings.FAST_JSON and orjson is None:
+    raise RuntimeError("FAST_JSON=true requires orjson (pip install orjson)")
+
+enabled = settings.FAST_JSON
+
+
+def _std_dumps(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+# оба варианта бросают ValueError-наследник на некорректном JSON
+loads: Callable[[bytes | str], Any] = orjson.loads if enabled else json.loads
+dumps: Callable[[Any], bytes] = orjson.dumps if enabled else _std_dumps
@@ -0,0 +1,164 @@
+# app/fleet.py
+"""
+Доступность автопарка: не принимаем больше заявок класса X на время t, чем
+есть свободных машин этого класса.
+
+Поездка занимает машину на [t, t + длительность маршрута + FLEET_BUFFER_MINUTES).
+Брони одной машины не пересекаются (это инвариант, который поддерживает
+reserve), поэтому пересечение с [s, e) возможно только у последней брони,
+начавшейся раньше e: её находит один index seek по (vehicle_id, starts_at)
+— O(log n) на машину, без сканирования истории.
+
+Конкурентность: перед проверкой строки vehicle нужного класса блокируются
+FOR UPDATE, проверка идёт уже отдельным запросом (в READ COMMITTED он видит
+брони, закоммиченные конкурентом, пока мы ждали блокировку). Так несколько
+воркеров не отдадут одну машину дважды; блокировки снимает commit заявки.
+
+Классы без единой машины в таблице vehicle не ограничиваются.
+
+CLI:
+    python -m app.fleet add-vehicle --class minivan --name "Vito A123BC" [--count 4]
+    python -m app.fleet set-duration "Москва" "Казань" 780
+    python -m app.fleet list
+"""
+from __future__ import annotations
+
+import argparse
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import and_, func, or_
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .cache import TTLCache
+from .config import settings
+from .db import engine
+from .models import RouteDuration, Transfer, Vehicle, VehicleBooking, VehicleClass
+
+EPOCH = datetime(1970, 1, 1)
+
+_durations = TTLCache(maxsize=4096, ttl=300)
+
+
+async def trip_minutes(session: AsyncSession, departure_city: str, arrival_city: str) -> int:
+    """Длительность маршрута из route_duration (в любую сторону) или FLEET_DEFAULT_TRIP_MINUTES."""
+    key = (departure_city, arrival_city)
+    minutes = _durations.get(key)
+    if minutes is None:
+        rows = (await session.exec(
+            select(RouteDuration.departure_city, RouteDuration.minutes).where(or_(
+                and_(RouteDuration.departure_city == departure_city,
+                     RouteDuration.arrival_city == arrival_city),
+                and_(RouteDuration.departure_city == arrival_city,
+                     RouteDuration.arrival_city == departure_city),
+            ))
+        )).all()
+        # прямое направление важнее обратного
+        direct = [m for dep, m in rows if dep == departure_city]
+        minutes = (direct or [m for _, m in rows] or [settings.FLEET_DEFAULT_TRIP_MINUTES])[0]
+        _durations.set(key, minutes)
+    return minutes
+
+
+def _free_vehicle_stmt(vehicle_class: VehicleClass, starts_at: datetime, ends_at: datetime):
+    last_end = (
+        select(VehicleBooking.ends_at)
+        .where(VehicleBooking.vehicle_id == Vehicle.id, VehicleBooking.starts_at < ends_at)
+        .order_by(VehicleBooking.starts_at.desc())
+        .limit(1)
+        .correlate(Vehicle)
+        .scalar_subquery()
+    )
+    return (
+        select(Vehicle.id)
+        .where(Vehicle.vehicle_class == vehicle_class, Vehicle.active)
+        .where(func.coalesce(last_end, EPOCH) <= starts_at)
+        .order_by(Vehicle.id)
+        .limit(1)
+    )
+
+
+async def reserve(session: AsyncSession, transfer: Transfer) -> int | None:
+    """
+    Бронирует свободную машину под заявку (в текущей транзакции).
+    Возвращает id машины, None — если класс не ограничен; 409, если свободных нет.
+    """
+    locked = (await session.exec(
+        select(Vehicle.id)
+        .where(Vehicle.vehicle_class == transfer.vehicle_class, Vehicle.active)
+        .order_by(Vehicle.id)
+        .with_for_update()
+    )).all()
+    if not locked:
+        return None
+
+    minutes = await trip_minutes(session, transfer.departure_city, transfer.arrival_city)
+    starts_at = transfer.datetime
+    ends_at = starts_at + timedelta(minutes=minutes + settings.FLEET_BUFFER_MINUTES)
+    vehicle_id = (await session.exec(
+        _free_vehicle_stmt(transfer.vehicle_class, starts_at, ends_at)
+    )).first()
+    if vehicle_id is None:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Нет свободных автомобилей класса {transfer.vehicle_class.value} на это время.",
+        )
+    session.add(VehicleBooking(
+        vehicle_id=vehicle_id, transfer_id=transfer.id, starts_at=starts_at, ends_at=ends_at,
+    ))
+    return vehicle_id
+
+
+# ------------------------------- CLI -------------------------------
+
+def _add_vehicle(args) -> None:
+    with Session(engine) as session:
+        for n in range(args.count):
+            name = args.name if args.count == 1 else f"{args.name} #{n + 1}"
+            session.add(Vehicle(vehicle_class=args.vehicle_class, name=name))
+        session.commit()
+
+
+def _set_duration(args) -> None:
+    with Session(engine) as session:
+        row = session.get(RouteDuration, (args.departure_city, args.arrival_city))
+        if row is None:
+            row = RouteDuration(departure_city=args.departure_city, arrival_city=args.arrival_city)
+        row.minutes = args.minutes
+        session.add(row)
+        session.commit()
+
+
+def _list(args) -> None:
+    with Session(engine) as session:
+        for v in session.exec(select(Vehicle).order_by(Vehicle.vehicle_class, Vehicle.id)):
+            print(f"{v.id}\t{v.vehicle_class.value}\t{'active' if v.active else 'off'}\t{v.name}")
+        for r in session.exec(select(RouteDuration).order_by(RouteDuration.departure_city)):
+            print(f"{r.departure_city} → {r.arrival_city}: {r.minutes} мин")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Автопарк и длительности маршрутов")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("add-vehicle")
+    p.add_argument("--class", dest="vehicle_class", type=VehicleClass, required=True)
+    p.add_argument("--name", required=True)
+    p.add_argument("--count", type=int, default=1)
+    p.set_defaults(func=_add_vehicle)
+
+    p = sub.add_parser("set-duration")
+    p.add_argument("departure_city")
+    p.add_argument("arrival_city")
+    p.add_argument("minutes", type=int)
+    p.set_defaults(func=_set_duration)
+
+    sub.add_parser("list").set_defaults(func=_list)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# app/history.py
+"""
+История заявок пользователя Telegram: для GET /me/transfers и команды /my в боте.
+
+Читается по индексу (telegram_user_id, datetime) и кэшируется на пользователя
+на HISTORY_CACHE_TTL секунд; новая заявка пользователя сбрасывает его кэш
+(в пределах процесса — в других воркерах запись доживает до TTL).
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Optional
+
+from sqlmodel import select
+
+from .cache import TTLCache
+from .admission import db_admission
+from .config import settings
+from .db import AsyncSessionLocal
+from .models import Transfer
+from .schemas import TransferDetail, UserTransfers
+from .texts import human_datetime, human_vehicle_label
+
+_cache = TTLCache(maxsize=settings.HISTORY_CACHE_SIZE, ttl=settings.HISTORY_CACHE_TTL)
+
+
+def invalidate(user_id: Optional[int]) -> None:
+    if user_id:
+        _cache.pop(user_id)
+
+
+async def get_user_transfers(user_id: int) -> UserTransfers:
+    cached = _cache.get(user_id)
+    if cached is not None:
+        return cached
+
+    now = datetime.utcnow()
+    by_user = Transfer.telegram_user_id == user_id
+    async with db_admission.slot(), AsyncSessionLocal() as session:
+        upcoming = (await session.exec(
+            select(Transfer).where(by_user, Transfer.datetime >= now)
+            .order_by(Transfer.datetime).limit(settings.HISTORY_UPCOMING_LIMIT)
+        )).all()
+        recent = (await session.exec(
+            select(Transfer).where(by_user, Transfer.datetime < now)
+            .order_by(Transfer.datetime.desc()).limit(settings.HISTORY_RECENT_LIMIT)
+        )).all()
+
+    result = UserTransfers(
+        upcoming=[TransferDetail.model_validate(t, from_attributes=True) for t in upcoming],
+        recent=[TransferDetail.model_validate(t, from_attributes=True) for t in recent],
+    )
+    _cache.set(user_id, result)
+    return result
+
+
+def _line(t: TransferDetail) -> str:
+    return (
+        f"{human_datetime(t.datetime)} — {t.departure_city} → {t.arrival_city}, "
+        f"{human_vehicle_label(t.vehicle_class)}, пассажиров: {t.pax_count}\n"
+        f"ID заявки: {t.id}"
+    )
+
+
+def format_history_text(history: UserTransfers) -> str:
+    """Ответ на /my в боте."""
+    if not history.upcoming and not history.recent:
+        return "У вас пока нет заявок. Оформить поездку можно нижней кнопкой «Заявка на трансфер»."
+    parts = []
+    if history.upcoming:
+        parts.append("Предстоящие поездки:\n\n" + "\n\n".join(map(_line, history.upcoming)))
+    if history.recent:
+        parts.append("Недавние поездки:\n\n" + "\n\n".join(map(_line, history.recent)))
+    return "\n\n".join(parts)
@@ -0,0 +1,149 @@
+# app/idempotency.py
+"""
+Идемпотентность POST /transfers и элементов POST /transfers/batch.
+
+Ключ — заголовок Idempotency-Key (в пределах пользователя Telegram), а если его
+нет — дайджест initData.hash + тела заявки: двойной тап или ретрай WebApp
+присылает ровно то же самое. У элементов пакета в ключ входит ещё и позиция. В БД ключ хранится в transfer_idempotency
+(первичный ключ = уникальный индекс), горячие повторы отвечаются из кэша
+процесса без похода в БД.
+
+Ключи в БД живут IDEMPOTENCY_KEY_TTL секунд (окно, в котором повтор ещё
+считается повтором), потом их удаляет purge_expired — фоновой задачей API
+раз в IDEMPOTENCY_PURGE_INTERVAL или из cron:
+    python -m app.idempotency purge
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from sqlalchemy import delete
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .cache import TTLCache
+from .config import settings
+from .db import write_session
+from .models import TransferIdempotency
+from .schemas import TransferCreate
+from .security import TelegramInitData
+
+logger = logging.getLogger(__name__)
+
+_recent = TTLCache(maxsize=settings.IDEMPOTENCY_CACHE_SIZE, ttl=settings.IDEMPOTENCY_CACHE_TTL)
+
+
+def derive_key(
+    header: Optional[str],
+    init: Optional[TelegramInitData],
+    data: TransferCreate,
+    position: Optional[int] = None,
+) -> Optional[str]:
+    """
+    position — индекс элемента пакета без Idempotency-Key: две одинаковые заявки
+    в одном пакете (две машины для одной группы) — разные заявки, а не повтор.
+    """
+    if header and header.strip():
+        scope = init.user_id if init and init.user_id else ""
+        raw = f"h:{scope}:{header.strip()}"
+    elif init and init.hash:
+        payload = data.model_dump(mode="json", exclude={"telegram_init_data"})
+        digest = hashlib.sha256(
+            json.dumps(payload, sort_keys=True, ensure_ascii=False).encode()
+        ).hexdigest()
+        raw = f"d:{init.hash}:{digest}"
+        if position is not None:
+            raw += f":{position}"
+    else:
+        return None  # dev-режим без initData: не с чем связать повтор
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def cached(key: str) -> Optional[uuid.UUID]:
+    return _recent.get(key)
+
+
+def remember(key: str, transfer_id: uuid.UUID) -> None:
+    _recent.set(key, transfer_id)
+
+
+def add(session: AsyncSession, key: str, transfer_id: uuid.UUID) -> None:
+    """Пишется в той же транзакции, что и заявка: конфликт ключа откатит всё."""
+    session.add(TransferIdempotency(key=key, transfer_id=transfer_id))
+
+
+async def lookup(session: AsyncSession, key: str) -> Optional[uuid.UUID]:
+    row = await session.get(TransferIdempotency, key)
+    if row is None:
+        return None
+    remember(key, row.transfer_id)
+    return row.transfer_id
+
+
+async def lookup_many(session: AsyncSession, keys: Iterable[str]) -> dict[str, uuid.UUID]:
+    """Ключ → заявка для уже записанных ключей (POST /transfers/batch)."""
+    keys = list(keys)
+    if not keys:
+        return {}
+    rows = (await session.exec(
+        select(TransferIdempotency).where(TransferIdempotency.key.in_(keys))
+    )).all()
+    return {row.key: row.transfer_id for row in rows}
+
+
+# ------------------------------ Очистка -----------------------------
+
+async def purge_expired(batch_size: int = 5000) -> int:
+    """
+    Удаляет ключи старше IDEMPOTENCY_KEY_TTL пачками по batch_size — по короткой
+    транзакции на пачку, чтобы не держать блокировки. Возвращает число удалённых.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    expired = (
+        select(TransferIdempotency.key)
+        .where(TransferIdempotency.created_at < cutoff)
+        .limit(batch_size)
+    )
+    total = 0
+    while True:
+        async with write_session() as session:
+            result = await session.exec(
+                delete(TransferIdempotency).where(TransferIdempotency.key.in_(expired))
+            )
+            await session.commit()
+        total += result.rowcount
+        if result.rowcount < batch_size:
+            return total
+
+
+async def run_purger() -> None:
+    """Фоновая очистка раз в IDEMPOTENCY_PURGE_INTERVAL; останавливается отменой задачи."""
+    while True:
+        await asyncio.sleep(settings.IDEMPOTENCY_PURGE_INTERVAL)
+        try:
+            deleted = await purge_expired()
+        except Exception:
+            logger.exception("idempotency purge failed")
+        else:
+            if deleted:
+                logger.info("idempotency purge: %s expired keys deleted", deleted)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Ключи идемпотентности POST /transfers")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("purge", help="удалить ключи старше IDEMPOTENCY_KEY_TTL")
+    args = parser.parse_args(argv)
+    if args.command == "purge":
+        print(f"transfer_idempotency: {asyncio.run(purge_expired())} expired keys deleted")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,151 @@
 from __future__ import annotations
 
-from datetime import datetime, timedelta, timezone
-from urllib.parse import quote
-from fastapi import FastAPI, Depends, Header, HTTPException, Request
+import asyncio
+import contextlib
+import functools
+import importlib
+import logging
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from sqlmodel import Session
-
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
+from fastapi.routing import APIRoute
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .admission import Overloaded, db_admission
+from .auth import (
+    limit_batch_rate,
+    limit_transfer_rate,
+    require_admin,
+    require_telegram_user,
+    resolve_init_data,
+    transfer_limiter,
+)
 from .config import settings
-from .db import init_db, get_session
-from .models import Transfer, VehicleClass
-from .schemas import TransferCreate, TransferRead
-from .telegram_forwarder import forward_transfer_message
-from .telegram_notify import send_user_confirmation
+from .db import (
+    begin_write,
+    dispose_engines,
+    get_async_session,
+    init_db,
+    is_unavailable,
+    warm_pool,
+)
+from .export import MEDIA_TYPES, stream_export
+from .models import Transfer, TransferInitDataAudit, VehicleClass
+from .queries import TransferFilters, encode_cursor, list_transfers_stmt, to_utc_naive
+from .schemas import (
+    CitySuggestion,
+    StatsRow,
+    TransferBatchItemResult,
+    TransferBatchRead,
+    TransferCreate,
+    TransferDetail,
+    TransferPage,
+    TransferRead,
+    UserTransfers,
+)
+from . import cities, fastjson, fleet, history, idempotency, metrics, outbox, sqlite_writer, stats
+from .security import TelegramInitData
+from .telegram_client import telegram
+from .telegram_forwarder import split_message
+from .texts import (
+    build_batch_text,
+    build_confirmation_text,
+    build_transfer_text,
+)
+from .timing import StageTimer
+
+logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Transfer API")
+# ---------------------------- Lifecycle ----------------------------
+
+async def warmup() -> None:
+    """
+    Всё, без чего POST /transfers работает, — в фоне после старта:
+    соединения пула, подсказки городов из БД, httpx и aiogram.
+    Ошибка одного шага не мешает остальным и не роняет приложение.
+    """
+    steps = {
+        "db_pool": warm_pool(),
+        "cities": cities.load_from_db(),
+        "telegram": _start_telegram(),
+    }
+    if settings.BOT_MODE == "webhook":
+        steps["webhook"] = webhook.start_webhook()
+    results = await asyncio.gather(*steps.values(), return_exceptions=True)
+    for name, result in zip(steps, results):
+        if isinstance(result, Exception):
+            logger.warning("warmup step %s failed: %r", name, result)
+
+async def _start_telegram() -> None:
+    await asyncio.to_thread(importlib.import_module, "httpx")
+    await telegram.start()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.BOT_MODE == "webhook":
+        webhook.check_config()  # ошибку конфигурации — сразу, а не в логе warmup
+    if settings.DB_AUTO_CREATE:
+        await asyncio.to_thread(init_db)
+    tasks = [asyncio.create_task(warmup(), name="warmup")]
+    if settings.OUTBOX_DISPATCHER_ENABLED:
+        tasks.append(asyncio.create_task(outbox.run_dispatcher(), name="outbox"))
+    if settings.IDEMPOTENCY_PURGE_INTERVAL > 0:
+        tasks.append(asyncio.create_task(idempotency.run_purger(), name="idempotency-purge"))
+    yield
+    for task in tasks:
+        task.cancel()
+    for task in tasks:
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+    if settings.BOT_MODE == "webhook":
+        await webhook.stop_webhook()
+    if sqlite_writer.writer is not None:
+        await sqlite_writer.writer.stop()
+    await telegram.close()
+    await transfer_limiter.close()
+    await dispose_engines()
+
+# ------------------------- Быстрый JSON ----------------------------
+
+class FastJSONRequest(Request):
+    """Тело запроса разбирает orjson (FastAPI вызывает request.json() перед валидацией)."""
+
+    async def json(self):
+        if not hasattr(self, "_json"):
+            self._json = fastjson.loads(await self.body())
+        return self._json
+
+class FastJSONRoute(APIRoute):
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            return await handler(FastJSONRequest(request.scope, request.receive))
+
+        return route_handler
+
+app = FastAPI(
+    title="Transfer API",
+    lifespan=lifespan,
+    # ответы с response_model сериализует orjson вместо json.dumps
+    default_response_class=ORJSONResponse if fastjson.enabled else JSONResponse,
+)
+if fastjson.enabled:
+    app.router.route_class = FastJSONRoute  # до объявления маршрутов
+
+if settings.BOT_MODE == "webhook":
+    # aiogram импортируем только в этом режиме
+    from . import webhook
+    app.include_router(webhook.router)
 
 # --- CORS: включаем всегда (на этапе интеграции можно оставить '*') ---
 origins_str = getattr(settings, "CORS_ORIGINS", "").strip()
@@ -27,11 +159,35 @@ app.add_middleware(
     allow_headers=["*"],   # в т.ч. X-Telegram-InitData
 )
 
-# ---------------------------- Lifecycle ----------------------------
+if settings.METRICS_ENABLED:
+    # добавлен последним → внешний слой: время считается вместе с CORS и ошибками
+    app.add_middleware(metrics.MetricsMiddleware)
 
-@app.on_event("startup")
-def on_startup() -> None:
-    init_db()
+# ------------------------ Перегрузка БД → 503 ------------------------
+
+def _unavailable(retry_after: int) -> JSONResponse:
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Сервис временно перегружен, повторите позже."},
+        headers={"Retry-After": str(retry_after)},
+    )
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    return _unavailable(exc.retry_after)
+
+@app.exception_handler(PoolTimeoutError)
+async def pool_timeout_handler(request: Request, exc: PoolTimeoutError):
+    # пул исчерпан дольше DB_POOL_TIMEOUT (например, соединения держит диспетчер outbox)
+    return _unavailable(settings.OVERLOAD_RETRY_AFTER)
+
+@app.exception_handler(OperationalError)
+async def db_unavailable_handler(request: Request, exc: OperationalError):
+    # БД недоступна (connect_timeout, обрыв соединения, SQLite занят) — 503;
+    # ошибки схемы и SQL («no such table») — дальше, как обычная 500 с трассировкой в логе
+    if not is_unavailable(exc):
+        raise exc
+    return _unavailable(settings.OVERLOAD_RETRY_AFTER)
 
 @app.get("/")
 def root():
@@ -41,6 +197,18 @@ def root():
 def health():
     return "ok"
 
+@app.get("/health/telegram")
+def health_telegram():
+    """Счётчики вызовов Bot API в этом процессе (задержки, ошибки)."""
+    return telegram.stats()
+
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    def prometheus_metrics():
+        """Формат Prometheus; наружу лучше не публиковать (закрыть на прокси)."""
+        body, content_type = metrics.render()
+        return Response(content=body, media_type=content_type)
+
 # -------------------------- Валидации ------------------------------
 
 def validate_capacity(vehicle_class: VehicleClass, pax: int) -> None:
@@ -74,177 +242,429 @@ def validate_datetime(dt: datetime) -> None:
             detail="Дата/время должны быть не раньше чем через 30 минут.",
         )
 
-# --------------------------- Утилиты -------------------------------
-
-VEHICLE_LABELS = {
-    "standard": "Стандарт",
-    "comfort":  "Комфорт",
-    "business": "Бизнес",
-    "premium":  "Премиум",
-    "minivan":  "Минивэн",
-}
-CONTACT_LABELS = {
-    "whatsapp": "WhatsApp",
-    "telegram": "Telegram",
-    "call":     "Звонок",
-}
-
-def human_vehicle_label(v: VehicleClass | str) -> str:
-    value = v.value if hasattr(v, "value") else str(v)
-    return VEHICLE_LABELS.get(value, value)
-
-def human_contact_label(s: str) -> str:
-    value = s.value if hasattr(s, "value") else str(s)
-    return CONTACT_LABELS.get(value, value)
-
-def human_datetime(dt: datetime) -> str:
-    """
-    Возвращает строку вида:
-    06.10.2025 02:42 (UTC+05:00)
-    Отображаем в том часовом поясе, в котором пришла дата; если tz нет — считаем UTC.
-    """
-    if dt.tzinfo is None:
-        dt_local = dt.replace(tzinfo=timezone.utc)
-    else:
-        dt_local = dt
-
-    offset = dt_local.utcoffset() or timedelta(0)
-    total_min = int(offset.total_seconds() // 60)
-    sign = "+" if total_min >= 0 else "-"
-    hh = abs(total_min) // 60
-    mm = abs(total_min) % 60
-    offset_str = f"{sign}{hh:02d}:{mm:02d}"
+# --------------------------- initData / запись ----------------------
 
-    return f"{dt_local.strftime('%d.%m.%Y %H:%M')} (UTC{offset_str})"
+def new_transfer(data: TransferCreate, init: TelegramInitData | None) -> Transfer:
+    auth_date = (
+        datetime.fromtimestamp(init.auth_date, timezone.utc).replace(tzinfo=None)
+        if init and init.auth_date else None
+    )
+    return Transfer(
+        departure_city=data.departure_city,
+        departure_address=data.departure_address,
+        arrival_city=data.arrival_city,
+        arrival_address=data.arrival_address,
+        departure_city_id=cities.index.observe(data.departure_city),
+        arrival_city_id=cities.index.observe(data.arrival_city),
+        datetime=to_utc_naive(data.datetime),
+        vehicle_class=data.vehicle_class,
+        pax_count=data.pax_count,
+        luggage=data.luggage,
+        child_seat=data.child_seat,
+        contact_phone=data.contact_phone,
+        contact_method=data.contact_method,
+        comment=(data.comment or "").strip()[:300] or None,
+        telegram_user_id=init.user_id if init else None,
+        telegram_auth_date=auth_date,
+    )
 
-def _digits_only(phone: str) -> str:
-    """Оставляет только цифры (нужно для wa.me)."""
-    return "".join(ch for ch in phone if ch.isdigit())
+def add_init_data_audit(session: AsyncSession, transfer_id: uuid.UUID, init_data: str) -> None:
+    if settings.STORE_RAW_INITDATA and init_data:
+        session.add(TransferInitDataAudit(transfer_id=transfer_id, init_data=init_data[:4000]))
 
-def build_contact_lines(phone: str, contact_method: str, transfer_id: str) -> list[str]:
-    """
-    Возвращает список строк для блока контакта:
-    - всегда даём кликабельный телефон (tel:+7...)
-    - если выбран WhatsApp — добавляем ссылку wa.me с предзаполненным текстом
-    - для Telegram/Звонка оставляем явную пометку способа связи
-    """
-    label = human_contact_label(contact_method)
-    tel_link = f"tel:{phone}"
-    lines = [f"Контакт: <a href=\"{tel_link}\">{phone}</a> ({label})"]
+def _validation_error_text(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(p) for p in err['loc']) or 'item'}: {err['msg']}"
+        for err in exc.errors(include_url=False)
+    )
 
-    method_value = contact_method.value if hasattr(contact_method, "value") else str(contact_method)
-    if method_value == "whatsapp":
-        digits = _digits_only(phone)
-        if digits:
-            text = f"Здравствуйте! Интерес по заявке ID {transfer_id}"
-            wa = f"https://wa.me/{digits}?text={quote(text)}"
-            lines.append(f"Ссылка для WhatsApp: {wa}")
+async def _read_batch_items(request: Request) -> list:
+    """Тело пакета: JSON-массив или NDJSON (Content-Type: application/x-ndjson)."""
+    body = await request.body()
+    content_type = request.headers.get("content-type", "")
+    try:
+        if "ndjson" in content_type:
+            return [fastjson.loads(line) for line in body.splitlines() if line.strip()]
+        items = fastjson.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Некорректный JSON/NDJSON.")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Ожидается JSON-массив заявок.")
+    return items
 
-    return lines
+# ---------------------------- Endpoint -----------------------------
 
-def build_transfer_text(data: TransferCreate, transfer_id: str) -> str:
+async def save_transfer(
+    session: AsyncSession,
+    transfer: Transfer,
+    data: TransferCreate,
+    init_data: str,
+    user_id: int | None,
+    idem_key: str | None,
+    timer: StageTimer,
+) -> uuid.UUID:
     """
-    Формирует понятный текст уведомления о заявке без смайликов и сырых enum'ов.
-    Добавляет кликабельный телефон и wa.me при выборе WhatsApp.
+    Всё, что пишется в одной транзакции с заявкой (без commit): бронь машины,
+    заявка, аудит initData, outbox, ключ идемпотентности, сводка /stats.
     """
-    veh = human_vehicle_label(data.vehicle_class)
-    contact_lines = build_contact_lines(data.contact_phone, data.contact_method, transfer_id)
-    dt_str = human_datetime(data.datetime)
-
-    luggage_str = "да" if data.luggage else "нет"
-    childseat_str = "да" if data.child_seat else "нет"
-    comment_block = f"\nКомментарий: {data.comment}" if (data.comment or "").strip() else ""
-
-    base = (
-        "Новая заявка на трансфер\n"
-        f"Когда: {dt_str}\n"
-        f"Класс автомобиля: {veh}\n"
-        f"Пассажиров: {data.pax_count}\n"
-        f"Багаж: {luggage_str}\n"
-        f"Детское кресло: {childseat_str}\n"
-        f"Откуда: {data.departure_city}, {data.departure_address}\n"
-        f"Куда: {data.arrival_city}, {data.arrival_address}\n"
-        + "\n".join(contact_lines) +
-        f"{comment_block}\n"
-        f"ID заявки: {transfer_id}"
-    )
-    return base
+    # Свободная машина нужного класса на время поездки
+    if settings.FLEET_CHECK_ENABLED:
+        with timer.stage("fleet"):
+            await fleet.reserve(session, transfer)
+
+    with timer.stage("prepare"):
+        session.add(transfer)
+        add_init_data_audit(session, transfer.id, init_data)
+
+        # Уведомления менеджерам и пользователю пишем в outbox в той же транзакции —
+        # доставит фоновый диспетчер, латентность запроса = только commit в БД.
+        # Подтверждение уходит в диалог с тем же ботом, из которого открыт WebApp.
+        outbox.enqueue_forward(
+            session,
+            transfer.id,
+            build_transfer_text(data, transfer.id),
+            urgent=outbox.is_urgent(transfer.datetime),
+        )
+        outbox.enqueue_user_confirmation(
+            session,
+            transfer.id,
+            user_id,
+            build_confirmation_text(data, transfer.id),
+        )
+        if idem_key:
+            idempotency.add(session, idem_key, transfer.id)
 
-# ---------------------------- Endpoint -----------------------------
+    with timer.stage("stats"):
+        await stats.record(session, [transfer])
+    return transfer.id
 
-@app.post("/transfers", response_model=TransferRead, status_code=201)
+
+@app.post("/transfers", response_model=TransferRead, status_code=201,
+          dependencies=[Depends(limit_transfer_rate)])
 async def create_transfer(
     data: TransferCreate,
     request: Request,
-    session: Session = Depends(get_session),
+    response: Response,
+    session: AsyncSession = Depends(get_async_session),
     # Принимаем оба варианта заголовка (на фронте используем X-Telegram-InitData):
     x_init_1: str | None = Header(None, alias="X-Telegram-InitData"),
     x_init_2: str | None = Header(None, alias="X-Telegram-Init-Data"),
+    idempotency_key: str | None = Header(None, alias="Idempotency-Key"),
 ):
     """
     Создание новой заявки.
     Валидации:
       - Проверка initData (если включена через env),
       - Проверка вместимости по классу авто,
-      - Проверка минимального времени выезда.
+      - Проверка минимального времени выезда,
+      - Свободная машина класса на время поездки (FLEET_CHECK_ENABLED).
+    Повтор с тем же Idempotency-Key (или тем же initData + телом) возвращает
+    исходную заявку с заголовком Idempotent-Replayed: true.
     """
+    timer = StageTimer()
+
     # 1) initData: берём из заголовков, затем из тела
     init_data = (x_init_1 or x_init_2 or data.telegram_init_data or "").strip()
 
-    # 2) Опциональная проверка подписи Telegram initData.
-    #    Пока тестируете на внешнем домене, можно отключить через env:
-    #    SKIP_INITDATA_VERIFY=true
-    if not settings.SKIP_INITDATA_VERIFY and settings.BOT_TOKEN:
-        from .security import verify_telegram_init_data
-        if not init_data or not verify_telegram_init_data(init_data):
-            raise HTTPException(status_code=401, detail="Invalid Telegram init data")
+    # 2) Проверка подписи Telegram initData
+    with timer.stage("verify"):
+        init = resolve_init_data(init_data)
+    user_id = init.user_id if init else None
+
+    # 2.1) Повтор уже принятой заявки — отдаём исходный ответ. Сначала кэш процесса,
+    # затем БД (кэш истёк или заявку принял другой воркер): до проверки времени и
+    # автопарка, иначе повтор упрётся в машину, которую забронировал оригинал (409).
+    idem_key = idempotency.derive_key(idempotency_key, init, data)
+    if idem_key:
+        replayed_id = idempotency.cached(idem_key)
+        if replayed_id is None:
+            with timer.stage("idempotency"):
+                replayed_id = await idempotency.lookup(session, idem_key)
+                # закрываем читающую транзакцию: пишущая начнётся заново с begin_write
+                # (BEGIN IMMEDIATE на SQLite), а соединение не простаивает на валидациях
+                await session.rollback()
+        if replayed_id is not None:
+            return _replay(response, replayed_id)
 
     # 3) Бизнес-валидации
-    validate_capacity(data.vehicle_class, data.pax_count)
-    validate_datetime(data.datetime)
-
-    # 4) Запись в БД
-    transfer = Transfer(
-        departure_city=data.departure_city,
-        departure_address=data.departure_address,
-        arrival_city=data.arrival_city,
-        arrival_address=data.arrival_address,
-        datetime=data.datetime,
-        vehicle_class=data.vehicle_class,
-        pax_count=data.pax_count,
-        luggage=data.luggage,
-        child_seat=data.child_seat,
-        contact_phone=data.contact_phone,
-        contact_method=data.contact_method,
-        comment=(data.comment or "").strip()[:300] or None,
-        telegram_init_data=init_data[:4000],
+    with timer.stage("validate"):
+        validate_capacity(data.vehicle_class, data.pax_count)
+        validate_datetime(data.datetime)
+
+    transfer = new_transfer(data, init)
+    save = functools.partial(
+        save_transfer,
+        transfer=transfer,
+        data=data,
+        init_data=init_data,
+        user_id=user_id,
+        idem_key=idem_key,
+        timer=timer,
     )
-    session.add(transfer)
-    session.commit()
-    session.refresh(transfer)
 
-    # 5) Отправка уведомления менеджерам/в канал
-    text = build_transfer_text(data, transfer.id)
+    # id генерируется на стороне приложения, поэтому refresh после commit не нужен
     try:
-        await forward_transfer_message(text)
-    except Exception:
-        pass  # уведомление не критично для успеха запроса
+        if sqlite_writer.writer is not None:
+            # SQLite: запись и commit — в общем writer-таске вместе с параллельными заявками
+            with timer.stage("group_commit"):
+                await sqlite_writer.writer.submit(save)
+        else:
+            await begin_write(session)
+            await save(session)
+            with timer.stage("db_commit"):
+                await session.commit()
+    except IntegrityError:
+        # параллельный повтор успел первым — откатываем свою копию вместе с outbox
+        await session.rollback()
+        replayed_id = await idempotency.lookup(session, idem_key) if idem_key else None
+        if replayed_id is None:
+            raise
+        return _replay(response, replayed_id)
+    if idem_key:
+        idempotency.remember(idem_key, transfer.id)
+    history.invalidate(user_id)
+    outbox.wakeup()
+
+    if settings.SERVER_TIMING:
+        response.headers["Server-Timing"] = timer.server_timing()
+    return TransferRead(id=transfer.id, status="accepted")
 
-    # 6) Подтверждение пользователю (в диалог с тем же ботом, из которого открыт WebApp)
-    # Работает, когда мини-апп открыт из Telegram и есть BOT_TOKEN.
-    try:
-        if settings.BOT_TOKEN and init_data:
-            confirm = (
-                "Ваша заявка успешно создана.\n\n"
-                f"ID заявки: {transfer.id}\n"
-                f"Когда: {human_datetime(data.datetime)}\n"
-                f"Класс автомобиля: {human_vehicle_label(data.vehicle_class)}\n"
-                f"Пассажиров: {data.pax_count}\n"
-                f"Откуда: {data.departure_city}, {data.departure_address}\n"
-                f"Куда: {data.arrival_city}, {data.arrival_address}\n"
+def _replay(response: Response, transfer_id: uuid.UUID) -> TransferRead:
+    response.headers["Idempotent-Replayed"] = "true"
+    return TransferRead(id=transfer_id, status="accepted")
+
+
+@dataclass
+class BatchItem:
+    """Элемент пакета, прошедший валидацию; пишется в save_batch."""
+    index: int
+    data: TransferCreate
+    transfer: Transfer
+    idem_key: str | None
+
+
+async def save_batch(
+    session: AsyncSession, items: list[BatchItem], init_data: str
+) -> dict[int, TransferBatchItemResult]:
+    """
+    Запись пакета в одной транзакции (без commit): повторы по ключам идемпотентности
+    получают исходные id, остальным — бронь машины, multi-row INSERT, аудит initData,
+    ключи идемпотентности, сводка /stats и одно сводное сообщение менеджерам.
+    """
+    results: dict[int, TransferBatchItemResult] = {}
+    known = await idempotency.lookup_many(session, [i.idem_key for i in items if i.idem_key])
+    accepted: list[BatchItem] = []
+    for item in items:
+        replayed_id = known.get(item.idem_key) if item.idem_key else None
+        if replayed_id is not None:
+            results[item.index] = TransferBatchItemResult(
+                index=item.index, status="accepted", id=replayed_id, replayed=True
             )
-            await send_user_confirmation(settings.BOT_TOKEN, init_data, confirm)
-    except Exception:
-        pass  # подтверждение пользователю — best effort
+            continue
+        if settings.FLEET_CHECK_ENABLED:
+            try:
+                await fleet.reserve(session, item.transfer)
+            except HTTPException as exc:
+                results[item.index] = TransferBatchItemResult(
+                    index=item.index, status="rejected", error=str(exc.detail)
+                )
+                continue
+        accepted.append(item)
+        results[item.index] = TransferBatchItemResult(
+            index=item.index, status="accepted", id=item.transfer.id
+        )
 
-    return TransferRead(id=transfer.id, status="accepted")
+    if accepted:
+        transfers = [item.transfer for item in accepted]
+        await session.exec(insert(Transfer), params=[t.model_dump() for t in transfers])
+        for item in accepted:
+            add_init_data_audit(session, item.transfer.id, init_data)
+            if item.idem_key:
+                idempotency.add(session, item.idem_key, item.transfer.id)
+        await stats.record(session, transfers)
+        # в режиме дайджеста пакет с ближним выездом не ждёт окна
+        urgent = any(outbox.is_urgent(t.datetime) for t in transfers)
+        for chunk in split_message(build_batch_text([(i.transfer.id, i.data) for i in accepted])):
+            outbox.enqueue_forward(session, None, chunk, urgent=urgent)
+    return results
+
+
+@app.post("/transfers/batch", response_model=TransferBatchRead)
+async def create_transfers_batch(
+    request: Request,
+    session: AsyncSession = Depends(get_async_session),
+    x_init_1: str | None = Header(None, alias="X-Telegram-InitData"),
+    x_init_2: str | None = Header(None, alias="X-Telegram-Init-Data"),
+    idempotency_key: str | None = Header(None, alias="Idempotency-Key"),
+):
+    """
+    Пакетная загрузка заявок (партнёрские агентства).
+    Тело — JSON-массив TransferCreate или NDJSON. Каждый элемент проходит те же
+    валидации, что и POST /transfers; валидные вставляются одним multi-row INSERT
+    в одной транзакции, менеджерам уходит одно сводное уведомление.
+    Идемпотентность — по элементам: ключ из Idempotency-Key пакета + позиции
+    элемента (без заголовка — initData.hash + тело и позиция элемента). Повтор пакета
+    возвращает исходные id с replayed=true и новых заявок не создаёт.
+    Лимит частоты — limit_batch_rate, токен на каждую новую заявку (429 до записи).
+    Ответ содержит результат по каждому элементу.
+    """
+    init_data = (x_init_1 or x_init_2 or "").strip()
+    init = resolve_init_data(init_data)
+
+    raw_items = await _read_batch_items(request)
+    if len(raw_items) > settings.TRANSFER_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Не больше {settings.TRANSFER_BATCH_MAX_ITEMS} заявок в пакете.",
+        )
+
+    batch_key = (idempotency_key or "").strip()
+    results: dict[int, TransferBatchItemResult] = {}
+    items: list[BatchItem] = []
+    for index, raw in enumerate(raw_items):
+        try:
+            if isinstance(raw, dict):
+                raw.setdefault("telegram_init_data", init_data)
+            data = TransferCreate.model_validate(raw)
+            validate_capacity(data.vehicle_class, data.pax_count)
+            validate_datetime(data.datetime)
+        except ValidationError as exc:
+            error = _validation_error_text(exc)
+        except HTTPException as exc:
+            error = str(exc.detail)
+        else:
+            # позиция входит в ключ и без заголовка: одинаковые элементы пакета —
+            # разные заявки, один и тот же ключ бывает только у повтора пакета
+            item_key = f"{batch_key}:{index}" if batch_key else None
+            idem_key = idempotency.derive_key(item_key, init, data, position=index)
+            replayed_id = idempotency.cached(idem_key) if idem_key else None
+            if replayed_id is not None:
+                results[index] = TransferBatchItemResult(
+                    index=index, status="accepted", id=replayed_id, replayed=True
+                )
+                continue
+            items.append(BatchItem(index, data, new_transfer(data, init), idem_key))
+            continue
+        results[index] = TransferBatchItemResult(index=index, status="rejected", error=error)
+
+    # токен на каждую заявку, которую пакет запишет; повтор пакета из кэша ничего
+    # не тратит, пакет из одних ошибок — как одна заявка
+    cost = len(items) or (0 if any(r.replayed for r in results.values()) else 1)
+    if cost:
+        await limit_batch_rate(request, init, cost)
+
+    if items:
+        save = functools.partial(save_batch, items=items, init_data=init_data)
+        try:
+            if sqlite_writer.writer is not None:
+                # SQLite: одной записью в общем writer-таске, не споря с ним за блокировку
+                saved = await sqlite_writer.writer.submit(save)
+            else:
+                await begin_write(session)
+                saved = await save(session)
+                await session.commit()
+        except IntegrityError:
+            # параллельный повтор того же пакета успел первым — отдаём его id
+            await session.rollback()
+            known = await idempotency.lookup_many(session, [i.idem_key for i in items if i.idem_key])
+            if any(i.idem_key not in known for i in items):
+                raise
+            saved = {
+                i.index: TransferBatchItemResult(
+                    index=i.index, status="accepted", id=known[i.idem_key], replayed=True
+                )
+                for i in items
+            }
+        results.update(saved)
+        created = [
+            i for i in items if saved[i.index].status == "accepted" and not saved[i.index].replayed
+        ]
+        for item in created:
+            if item.idem_key:
+                idempotency.remember(item.idem_key, item.transfer.id)
+        if created:
+            history.invalidate(init.user_id if init else None)
+            outbox.wakeup()
+
+    accepted = sum(1 for r in results.values() if r.status == "accepted")
+    return TransferBatchRead(
+        accepted=accepted,
+        rejected=len(results) - accepted,
+        items=[results[index] for index in sorted(results)],
+    )
+
+
+# ----------------------------- Чтение ------------------------------
+
+@app.get("/transfers", response_model=TransferPage, dependencies=[Depends(require_admin)])
+async def list_transfers(
+    filters: TransferFilters = Depends(),
+    cursor: str | None = Query(None, description="next_cursor из предыдущей страницы"),
+    limit: int = Query(50, ge=1, le=500),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Список заявок по времени поездки (keyset-пагинация, без OFFSET)."""
+    rows = (await session.exec(list_transfers_stmt(filters, cursor, limit))).all()
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return TransferPage(
+        items=[TransferDetail.model_validate(t, from_attributes=True) for t in rows[:limit]],
+        next_cursor=next_cursor,
+    )
+
+# объявлен до /transfers/{transfer_id}, иначе "export" попадёт в transfer_id
+@app.get("/transfers/export", dependencies=[Depends(require_admin)])
+async def export_transfers(
+    filters: TransferFilters = Depends(),
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+):
+    """Потоковая выгрузка (CSV/NDJSON) с теми же фильтрами, что и GET /transfers."""
+    # после начала отдачи 503 уже не вернуть — выгрузки отсекаем заранее, если слотов нет
+    db_admission.check()
+    filename = f"transfers-{datetime.now(timezone.utc):%Y%m%d-%H%M%S}.{format}"
+    return StreamingResponse(
+        stream_export(filters, format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@app.get("/transfers/{transfer_id}", response_model=TransferDetail,
+         dependencies=[Depends(require_admin)])
+async def get_transfer(
+    transfer_id: uuid.UUID,
+    session: AsyncSession = Depends(get_async_session),
+):
+    # не session.get: ключ таблицы — (id, datetime)
+    transfer = (await session.exec(select(Transfer).where(Transfer.id == transfer_id))).first()
+    if transfer is None:
+        raise HTTPException(status_code=404, detail="Заявка не найдена.")
+    return TransferDetail.model_validate(transfer, from_attributes=True)
+
+
+@app.get("/cities/suggest", response_model=list[CitySuggestion])
+async def suggest_cities(
+    q: str = Query("", max_length=100),
+    limit: int = Query(10, ge=1, le=50),
+):
+    """Подсказки городов по префиксу (регистр, раскладка и латиница не важны); индекс в памяти."""
+    return [CitySuggestion(id=city_id, name=name) for city_id, name in cities.index.suggest(q, limit)]
+
+
+@app.get("/stats", response_model=list[StatsRow], dependencies=[Depends(require_admin)])
+async def get_stats(
+    date_from: date | None = Query(None, description="День поездки от (включительно)"),
+    date_to: date | None = Query(None, description="День поездки до (не включая)"),
+    vehicle_class: VehicleClass | None = Query(None),
+    group_by: str = Query("day,vehicle_class,route", description="day, vehicle_class, route"),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Заявки и пассажиры по дням / классам / маршрутам — только из сводной таблицы."""
+    groups = tuple(sorted({g.strip() for g in group_by.split(",") if g.strip()}))
+    if not set(groups) <= stats.GROUPINGS:
+        raise HTTPException(status_code=422, detail="group_by: допустимы day, vehicle_class, route.")
+    return await stats.get_stats(session, date_from, date_to, vehicle_class, groups)
+
+
+@app.get("/me/transfers", response_model=UserTransfers)
+async def my_transfers(init: TelegramInitData = Depends(require_telegram_user)):
+    """Предстоящие и недавние заявки текущего пользователя (по initData)."""
+    return await history.get_user_transfers(init.user_id)
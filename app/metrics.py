@@ -0,0 +1,166 @@
+# app/metrics.py
+"""
+Метрики Prometheus (GET /metrics).
+
+  - transfer_http_request_duration_seconds — латентность запросов по шаблону
+    маршрута (/transfers/{transfer_id}, а не конкретный id) и коду ответа;
+  - transfer_stage_duration_seconds — этапы: verify / validate / prepare /
+    db_commit в POST /transfers и доставка уведомлений из outbox
+    (forward_transfer_message / send_user_confirmation);
+  - transfer_db_pool_* — ожидание свободного соединения и занятые соединения;
+  - transfer_admission_* — допущенные к БД, ждущие и отвергнутые (503) запросы;
+  - transfer_rate_limited_total — POST /transfers, отклонённые лимитом (429),
+    по ключу лимита (user / ip);
+  - transfer_telegram_requests_total / _duration_seconds — исходящие вызовы
+    Bot API по методу и HTTP-статусу («error» — ответа не было: таймаут, сеть).
+
+Всё считается в памяти процесса: наблюдение — это инкремент счётчика под
+локом, без I/O, поэтому метрики можно держать включёнными в проде.
+При uvicorn --workers N каждый воркер отдаёт свои значения.
+"""
+from __future__ import annotations
+
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+from .config import settings
+
+# Бакеты: запросы и вызовы Telegram — от 5 мс до 10 с, этапы — от 0.5 мс
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025) + LATENCY_BUCKETS
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "transfer_http_request_duration_seconds",
+    "HTTP request latency",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+STAGE_SECONDS = Histogram(
+    "transfer_stage_duration_seconds",
+    "Duration of request / delivery stages",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+DB_POOL_CHECKOUT_WAIT_SECONDS = Histogram(
+    "transfer_db_pool_checkout_wait_seconds",
+    "Time spent waiting for a connection from the DB pool",
+    buckets=STAGE_BUCKETS,
+)
+DB_POOL_IN_USE = Gauge(
+    "transfer_db_pool_connections_in_use",
+    "Connections currently checked out of the DB pool",
+    ["engine"],
+)
+DB_POOL_SIZE = Gauge(
+    "transfer_db_pool_size",
+    "Configured DB pool size (without overflow)",
+    ["engine"],
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    "transfer_admission_in_flight",
+    "Requests currently admitted",
+    ["resource"],
+)
+ADMISSION_QUEUED = Gauge(
+    "transfer_admission_queued",
+    "Requests waiting for admission",
+    ["resource"],
+)
+ADMISSION_REJECTED = Counter(
+    "transfer_admission_rejected_total",
+    "Requests rejected with 503 by admission control",
+    ["reason"],
+)
+RATE_LIMITED = Counter(
+    "transfer_rate_limited_total",
+    "Requests rejected with 429 by the per-client rate limit",
+    ["scope"],
+)
+TELEGRAM_REQUESTS = Counter(
+    "transfer_telegram_requests_total",
+    "Outbound Bot API requests by method and HTTP status",
+    ["method", "status"],
+)
+TELEGRAM_REQUEST_SECONDS = Histogram(
+    "transfer_telegram_request_duration_seconds",
+    "Outbound Bot API request latency",
+    ["method"],
+    buckets=LATENCY_BUCKETS,
+)
+
+
+def observe_stage(name: str, seconds: float) -> None:
+    if settings.METRICS_ENABLED:
+        STAGE_SECONDS.labels(name).observe(seconds)
+
+
+def observe_pool_wait(seconds: float) -> None:
+    if settings.METRICS_ENABLED:
+        DB_POOL_CHECKOUT_WAIT_SECONDS.observe(seconds)
+
+
+def observe_telegram(method: str, status: str, seconds: float) -> None:
+    if settings.METRICS_ENABLED:
+        TELEGRAM_REQUESTS.labels(method, status).inc()
+        TELEGRAM_REQUEST_SECONDS.labels(method).observe(seconds)
+
+
+def track_pool(name: str, pool) -> None:
+    """Гейджи пула читаются в момент scrape — на горячем пути ничего не считаем."""
+    if hasattr(pool, "checkedout"):
+        DB_POOL_IN_USE.labels(name).set_function(pool.checkedout)
+    if hasattr(pool, "size"):
+        DB_POOL_SIZE.labels(name).set_function(pool.size)
+
+
+def observe_admission_rejected(reason: str) -> None:
+    if settings.METRICS_ENABLED:
+        ADMISSION_REJECTED.labels(reason).inc()
+
+
+def observe_rate_limited(scope: str) -> None:
+    if settings.METRICS_ENABLED:
+        RATE_LIMITED.labels(scope).inc()
+
+
+def track_admission(name: str, controller) -> None:
+    ADMISSION_IN_FLIGHT.labels(name).set_function(lambda: controller.inflight)
+    ADMISSION_QUEUED.labels(name).set_function(lambda: controller.queued)
+
+
+def render() -> tuple[bytes, str]:
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """
+    Чистый ASGI-middleware (без BaseHTTPMiddleware — тот буферизует
+    StreamingResponse и добавляет задачу на каждый запрос).
+    Маршрут берём из scope["route"], который FastAPI кладёт при совпадении.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            HTTP_REQUEST_SECONDS.labels(scope["method"], route, str(status)).observe(
+                time.perf_counter() - started
+            )
@@ -1,5 +1,6 @@
+from sqlalchemy import BigInteger, Index, PrimaryKeyConstraint
 from sqlmodel import SQLModel, Field
-from datetime import datetime
+from datetime import date, datetime
 from enum import Enum
 from typing import Optional
 import uuid
@@ -18,13 +19,36 @@ class ContactMethod(str, Enum):
     call = "call"
 
 class Transfer(SQLModel, table=True):
-    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True, index=True)
+    # Первичный ключ (id, datetime): в PostgreSQL transfer секционирована по datetime
+    # (миграция 0003, app/partitions.py), а ключ секционирования обязан входить в каждое
+    # уникальное ограничение. Цена — БД не гарантирует уникальность одного id между
+    # месяцами; её даёт uuid4 из приложения, поиск по id — через ix_transfer_id.
+    # На SQLite партиций нет, и таблица из миграций сохраняет PRIMARY KEY (id).
+    # Индексы под GET /transfers: равенство по фильтру + диапазон по datetime,
+    # хвост id — для keyset-пагинации по (datetime, id).
+    __table_args__ = (
+        PrimaryKeyConstraint("id", "datetime", name="transfer_pkey"),
+        Index("ix_transfer_datetime_id", "datetime", "id"),
+        Index("ix_transfer_vehicle_class_datetime", "vehicle_class", "datetime", "id"),
+        Index("ix_transfer_departure_city_datetime", "departure_city", "datetime", "id"),
+        Index("ix_transfer_arrival_city_datetime", "arrival_city", "datetime", "id"),
+        # фильтры по нормализованному городу (app/cities.py)
+        Index("ix_transfer_departure_city_id_datetime", "departure_city_id", "datetime", "id"),
+        Index("ix_transfer_arrival_city_id_datetime", "arrival_city_id", "datetime", "id"),
+        # история пользователя: /me/transfers и /my в боте
+        Index("ix_transfer_telegram_user_id_datetime", "telegram_user_id", "datetime"),
+    )
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, index=True)
     created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
 
     departure_city: str
     departure_address: str
     arrival_city: str
     arrival_address: str
+    # нормализованные id городов («Москва», «москва», «Moscow» → moscow)
+    departure_city_id: Optional[str] = Field(default=None, max_length=64)
+    arrival_city_id: Optional[str] = Field(default=None, max_length=64)
     datetime: datetime
 
     vehicle_class: VehicleClass
@@ -36,4 +60,114 @@ class Transfer(SQLModel, table=True):
     contact_method: ContactMethod
     comment: Optional[str] = None
 
-    telegram_init_data: str = ""
+    # initData разбирается один раз при проверке; сырая строка не хранится
+    # (при STORE_RAW_INITDATA=true она пишется в transfer_init_data_audit).
+    telegram_user_id: Optional[int] = Field(default=None, sa_type=BigInteger)
+    telegram_auth_date: Optional[datetime] = None
+
+
+class TransferInitDataAudit(SQLModel, table=True):
+    """Необязательный аудит сырых initData (STORE_RAW_INITDATA=true)."""
+    __tablename__ = "transfer_init_data_audit"
+
+    transfer_id: uuid.UUID = Field(primary_key=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    init_data: str
+
+
+class OutboxKind(str, Enum):
+    forward = "forward"                      # сообщение менеджерам (FORWARD_CHAT_ID)
+    user_confirmation = "user_confirmation"  # подтверждение пользователю
+
+
+class OutboxStatus(str, Enum):
+    pending = "pending"
+    sent = "sent"
+    dead = "dead"  # исчерпаны попытки — остаётся в таблице для разбора
+
+
+class OutboxMessage(SQLModel, table=True):
+    """
+    Уведомление, записанное в одной транзакции с заявкой.
+    Доставляет его фоновый диспетчер (app/outbox.py).
+    """
+    __tablename__ = "outbox_message"
+    __table_args__ = (
+        Index("ix_outbox_message_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+    kind: OutboxKind
+    transfer_id: Optional[uuid.UUID] = Field(default=None, index=True)
+    chat_id: Optional[str] = None  # для forward берётся FORWARD_CHAT_ID при отправке
+    text: str
+    urgent: bool = False  # forward: отправить сразу, минуя дайджест
+
+    status: OutboxStatus = OutboxStatus.pending
+    attempts: int = 0
+    next_attempt_at: datetime = Field(default_factory=datetime.utcnow)
+    last_error: Optional[str] = None
+    sent_at: Optional[datetime] = None
+
+
+class TransferIdempotency(SQLModel, table=True):
+    """
+    Ключ идемпотентности POST /transfers → созданная заявка.
+    Повтор с тем же ключом возвращает исходный ответ, а не новую заявку.
+    """
+    __tablename__ = "transfer_idempotency"
+
+    key: str = Field(primary_key=True, max_length=64)  # sha256 hex
+    transfer_id: uuid.UUID
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+
+class Vehicle(SQLModel, table=True):
+    """Машина автопарка (app/fleet.py). Классы без машин не ограничиваются."""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    vehicle_class: VehicleClass = Field(index=True)
+    name: str = ""
+    active: bool = True
+
+
+class RouteDuration(SQLModel, table=True):
+    """Оценка длительности поездки между городами, минуты (подходит и для обратного пути)."""
+    __tablename__ = "route_duration"
+
+    departure_city: str = Field(primary_key=True)
+    arrival_city: str = Field(primary_key=True)
+    minutes: int = 0
+
+
+class VehicleBooking(SQLModel, table=True):
+    """
+    Занятость машины заявкой на [starts_at, ends_at). Брони одной машины не
+    пересекаются, поэтому проверка — один seek по (vehicle_id, starts_at).
+    """
+    __tablename__ = "vehicle_booking"
+    __table_args__ = (
+        Index("ix_vehicle_booking_vehicle_id_starts_at", "vehicle_id", "starts_at"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    vehicle_id: int
+    transfer_id: uuid.UUID = Field(unique=True)
+    starts_at: datetime
+    ends_at: datetime
+
+
+class TransferDailyStat(SQLModel, table=True):
+    """
+    Сводка для GET /stats: день поездки (UTC) × класс × маршрут.
+    Обновляется upsert'ом в той же транзакции, что и вставка заявки (app/stats.py).
+    """
+    __tablename__ = "transfer_daily_stat"
+
+    day: date = Field(primary_key=True)
+    vehicle_class: VehicleClass = Field(primary_key=True)
+    departure_city_id: str = Field(primary_key=True, max_length=64)  # "" — город не распознан
+    arrival_city_id: str = Field(primary_key=True, max_length=64)
+    transfers: int = 0
+    pax: int = 0
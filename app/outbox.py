@@ -0,0 +1,272 @@
+# app/outbox.py
+"""
+Outbox уведомлений.
+
+create_transfer пишет сообщения в таблицу outbox_message в той же транзакции,
+что и саму заявку, — поэтому ни рестарт, ни недоступность Telegram не теряют
+уведомления. Доставкой занимается фоновый диспетчер: он забирает готовые к
+отправке строки короткой транзакцией (FOR UPDATE SKIP LOCKED + аренда на
+OUTBOX_LEASE_SECONDS — можно запускать несколько экземпляров), отправляет их
+без открытой транзакции и записывает итоги второй короткой транзакцией.
+Неудачные отправки повторяются с экспоненциальной задержкой, после
+OUTBOX_MAX_ATTEMPTS сообщение переводится в статус dead.
+
+Сообщения менеджерам идут через TokenBucket (FORWARD_RATE_PER_MINUTE) —
+при нехватке токена строка откладывается без траты попытки, 429 с
+retry_after останавливает отправку в чат на указанное время. При
+FORWARD_DIGEST_ENABLED несрочные заявки копятся FORWARD_DIGEST_WINDOW секунд
+(или до FORWARD_DIGEST_MAX_ITEMS) и уходят одним сообщением; срочные
+(urgent — выезд скоро) отправляются сразу.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable
+
+from sqlmodel import or_, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .config import settings
+from .db import write_session
+from .models import OutboxKind, OutboxMessage, OutboxStatus
+from .telegram_client import TelegramAPIError
+from .telegram_forwarder import forward_limiter, forward_transfer_message, pack_messages
+from .telegram_notify import send_user_confirmation
+from .timing import timed
+
+logger = logging.getLogger(__name__)
+
+# Будильник диспетчера: create_transfer дёргает его после commit,
+# чтобы не ждать очередного опроса таблицы.
+_wakeup = asyncio.Event()
+
+
+def wakeup() -> None:
+    _wakeup.set()
+
+
+# ------------------------------ Запись ------------------------------
+
+def enqueue_forward(
+    session: AsyncSession, transfer_id: uuid.UUID | None, text: str, urgent: bool = False
+) -> None:
+    """Сообщение менеджерам; ничего не делает, если пересылка не настроена."""
+    if not settings.FORWARD_BOT_TOKEN or not settings.FORWARD_CHAT_ID:
+        return
+    session.add(
+        OutboxMessage(kind=OutboxKind.forward, transfer_id=transfer_id, text=text, urgent=urgent)
+    )
+
+
+def is_urgent(departure: datetime) -> bool:
+    """Выезд (naive UTC) раньше чем через FORWARD_URGENT_WITHIN_MINUTES — менеджерам сразу."""
+    return departure - datetime.utcnow() < timedelta(minutes=settings.FORWARD_URGENT_WITHIN_MINUTES)
+
+
+def enqueue_user_confirmation(
+    session: AsyncSession, transfer_id: uuid.UUID | None, user_id: int | None, text: str
+) -> None:
+    """Подтверждение пользователю; нужен BOT_TOKEN и user.id из initData."""
+    if not settings.BOT_TOKEN or not user_id:
+        return
+    session.add(
+        OutboxMessage(
+            kind=OutboxKind.user_confirmation,
+            transfer_id=transfer_id,
+            chat_id=str(user_id),
+            text=text,
+        )
+    )
+
+
+# ----------------------------- Доставка -----------------------------
+
+def backoff_delay(attempts: int) -> float:
+    """Экспоненциальная задержка с джиттером ±20% (attempts — уже сделанные попытки)."""
+    delay = settings.OUTBOX_BACKOFF_BASE * (2 ** max(attempts - 1, 0))
+    delay = min(delay, settings.OUTBOX_BACKOFF_MAX)
+    return delay * random.uniform(0.8, 1.2)
+
+
+async def _deliver(msg: OutboxMessage) -> None:
+    if msg.kind == OutboxKind.forward:
+        with timed("forward_transfer_message"):
+            await forward_transfer_message(msg.text)
+    elif msg.kind == OutboxKind.user_confirmation:
+        if not settings.BOT_TOKEN:
+            raise RuntimeError("BOT_TOKEN is not configured")
+        with timed("send_user_confirmation"):
+            await send_user_confirmation(settings.BOT_TOKEN, msg.chat_id, msg.text)
+    else:
+        raise ValueError(f"Unknown outbox kind: {msg.kind}")
+
+
+def _mark_sent(msg: OutboxMessage) -> None:
+    msg.status = OutboxStatus.sent
+    msg.sent_at = datetime.utcnow()
+
+
+def _mark_failed(msg: OutboxMessage, exc: Exception) -> None:
+    msg.attempts += 1
+    msg.last_error = repr(exc)[:500]
+    permanent = isinstance(exc, TelegramAPIError) and exc.permanent
+    if permanent or msg.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+        msg.status = OutboxStatus.dead
+        logger.error("outbox message %s is dead after %s attempts: %s",
+                     msg.id, msg.attempts, msg.last_error)
+        return
+    delay = backoff_delay(msg.attempts)
+    # 429: Telegram сам говорит, сколько ждать
+    if isinstance(exc, TelegramAPIError) and exc.retry_after:
+        delay = max(delay, float(exc.retry_after))
+    msg.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+
+
+def _defer(msg: OutboxMessage, seconds: float) -> None:
+    """Лимит частоты: переносим без траты попытки."""
+    msg.next_attempt_at = datetime.utcnow() + timedelta(seconds=seconds)
+
+
+def _note_forward_error(exc: Exception) -> None:
+    if isinstance(exc, TelegramAPIError) and exc.retry_after:
+        forward_limiter.pause(float(exc.retry_after))
+
+
+async def _claim(stmt, ready: Callable[[list[OutboxMessage]], bool] | None = None) -> list[OutboxMessage]:
+    """
+    Короткая транзакция: забирает строки (FOR UPDATE SKIP LOCKED) и сдвигает их
+    next_attempt_at на OUTBOX_LEASE_SECONDS вперёд — пока пачка отправляется,
+    другие диспетчеры её не возьмут. Сама отправка идёт без открытой транзакции
+    и без занятого соединения пула. Если процесс упадёт до _save, строки
+    вернутся в очередь по истечении аренды (доставка — at-least-once).
+    ready=False — ничего не забирать (окно дайджеста ещё открыто).
+    """
+    async with write_session() as session:
+        rows = list((await session.exec(stmt)).all())
+        if not rows or (ready is not None and not ready(rows)):
+            return []
+        lease_until = datetime.utcnow() + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)
+        for row in rows:
+            row.next_attempt_at = lease_until
+        session.add_all(rows)
+        await session.commit()
+    return rows
+
+
+async def _save(rows: list[OutboxMessage]) -> None:
+    """Вторая короткая транзакция: итоги отправки (sent / попытка / перенос)."""
+    async with write_session() as session:
+        session.add_all(rows)
+        await session.commit()
+
+
+async def dispatch_batch() -> int:
+    """Отправляет одну пачку готовых сообщений. Возвращает размер пачки."""
+    stmt = (
+        select(OutboxMessage)
+        .where(OutboxMessage.status == OutboxStatus.pending)
+        .where(OutboxMessage.next_attempt_at <= datetime.utcnow())
+        .order_by(OutboxMessage.next_attempt_at, OutboxMessage.id)
+        .limit(settings.OUTBOX_BATCH_SIZE)
+        .with_for_update(skip_locked=True)
+    )
+    if settings.FORWARD_DIGEST_ENABLED:
+        # несрочные сообщения менеджерам забирает dispatch_digest
+        stmt = stmt.where(or_(OutboxMessage.kind != OutboxKind.forward, OutboxMessage.urgent))
+    batch = await _claim(stmt)
+    if not batch:
+        return 0
+
+    for msg in batch:
+        if msg.kind == OutboxKind.forward:
+            wait = forward_limiter.try_acquire()
+            if wait > 0:
+                _defer(msg, wait)
+                continue
+        try:
+            await _deliver(msg)
+        except Exception as exc:
+            if msg.kind == OutboxKind.forward:
+                _note_forward_error(exc)
+            _mark_failed(msg, exc)
+        else:
+            _mark_sent(msg)
+
+    await _save(batch)
+    return len(batch)
+
+
+async def dispatch_digest() -> int:
+    """
+    Отправляет накопленные несрочные заявки менеджерам сводным сообщением,
+    когда окно FORWARD_DIGEST_WINDOW истекло или набралось FORWARD_DIGEST_MAX_ITEMS.
+    Возвращает число доставленных строк outbox.
+    """
+    if not settings.FORWARD_DIGEST_ENABLED:
+        return 0
+    now = datetime.utcnow()
+    stmt = (
+        select(OutboxMessage)
+        .where(OutboxMessage.status == OutboxStatus.pending)
+        .where(OutboxMessage.kind == OutboxKind.forward)
+        .where(OutboxMessage.urgent.is_(False))
+        .where(OutboxMessage.next_attempt_at <= now)
+        .order_by(OutboxMessage.created_at, OutboxMessage.id)
+        .limit(settings.FORWARD_DIGEST_MAX_ITEMS)
+        .with_for_update(skip_locked=True)
+    )
+
+    def ready(rows: list[OutboxMessage]) -> bool:
+        window_closed = rows[0].created_at <= now - timedelta(seconds=settings.FORWARD_DIGEST_WINDOW)
+        return window_closed or len(rows) >= settings.FORWARD_DIGEST_MAX_ITEMS
+
+    rows = await _claim(stmt, ready)
+    if not rows:
+        return 0
+
+    packed = pack_messages([row.text for row in rows])
+    # строка доставлена, когда ушло последнее сообщение с её текстом
+    last_part = {i: n for n, (indices, _) in enumerate(packed) for i in indices}
+    delivered = 0
+    for n, (_, text) in enumerate(packed):
+        wait = forward_limiter.try_acquire()
+        if wait > 0:
+            for row in rows[delivered:]:
+                _defer(row, wait)
+            break
+        try:
+            with timed("forward_transfer_message"):
+                await forward_transfer_message(text)
+        except Exception as exc:
+            _note_forward_error(exc)
+            for row in rows[delivered:]:
+                _mark_failed(row, exc)
+            break
+        while delivered < len(rows) and last_part[delivered] == n:
+            _mark_sent(rows[delivered])
+            delivered += 1
+
+    await _save(rows)
+    return delivered
+
+
+async def run_dispatcher() -> None:
+    """Бесконечный цикл доставки; останавливается отменой задачи."""
+    while True:
+        _wakeup.clear()
+        try:
+            processed = await dispatch_batch()
+            await dispatch_digest()
+        except Exception:
+            logger.exception("outbox dispatch failed")
+            processed = 0
+        if processed >= settings.OUTBOX_BATCH_SIZE:
+            continue  # есть ещё — сразу следующая пачка
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=settings.OUTBOX_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
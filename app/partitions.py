@@ -0,0 +1,218 @@
+# app/partitions.py
+"""
+Помесячные партиции transfer по datetime (только PostgreSQL).
+
+Миграция 0003 делает transfer секционированной таблицей (PARTITION BY RANGE
+(datetime)): по партиции на календарный месяц поездки (transfer_p2025_10 =
+[2025-10-01, 2025-11-01)) и transfer_default для дат без своей партиции.
+Индексы объявлены на родителе и есть в каждой партиции, поэтому их размер и
+VACUUM зависят от активного окна, а запросы с фильтром по datetime читают
+только нужные месяцы.
+
+Первичный ключ — (id, datetime): Postgres требует ключ секционирования во
+всех уникальных ограничениях. id по-прежнему UUID из приложения, поиск по нему
+идёт через ix_transfer_id в каждой партиции.
+
+Обслуживание (cron, например раз в сутки):
+    python -m app.partitions ensure [--ahead 12]
+    python -m app.partitions archive [--retain 24] [--dir archive] [--keep]
+    python -m app.partitions list
+ensure создаёт месяцы вперёд и партиции для строк, попавших в transfer_default
+(поездки дальше окна), перенося эти строки. archive выгружает месяцы старше
+окна хранения в <dir>/transfer_pYYYY_MM.ndjson.gz (все колонки, кодирование
+как в app.export), сверяет число строк, отсоединяет и удаляет партицию
+(--keep — только отсоединить). Сводка transfer_daily_stat за эти месяцы
+остаётся: app.stats rebuild пересчитывает только дни, которые ещё в transfer.
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import os
+import re
+import sys
+from datetime import date, datetime
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from .config import settings
+from .db import engine, is_sqlite
+from .export import encode_rows
+
+DEFAULT_PARTITION = "transfer_default"
+_NAME = re.compile(r"^transfer_p(\d{4})_(\d{2})$")
+
+
+def month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, n: int) -> date:
+    years, index = divmod(month.month - 1 + n, 12)
+    return date(month.year + years, index + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"transfer_p{month:%Y_%m}"
+
+
+def is_partition(table_name: str) -> bool:
+    """Таблица-партиция transfer (не из моделей: alembic autogenerate её пропускает)."""
+    return table_name == DEFAULT_PARTITION or _NAME.match(table_name) is not None
+
+
+def _bound(month: date) -> str:
+    # границы — из date, не из пользовательского ввода: подставлять литералом безопасно
+    return f"'{month:%Y-%m-%d} 00:00:00'"
+
+
+def is_partitioned(conn: Connection) -> bool:
+    return conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'transfer'::regclass)"
+    )).scalar()
+
+
+def existing(conn: Connection) -> dict[date, str]:
+    """Месячные партиции transfer: первый день месяца → имя таблицы."""
+    names = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'transfer'::regclass"
+    )).scalars()
+    months = {}
+    for name in names:
+        m = _NAME.match(name)
+        if m:
+            months[date(int(m[1]), int(m[2]), 1)] = name
+    return months
+
+
+def create_default(conn: Connection) -> None:
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF transfer DEFAULT"))
+
+
+def create_month(conn: Connection, month: date) -> int:
+    """
+    Создаёт партицию месяца; его строки из transfer_default переносятся в неё.
+    Возвращает число перенесённых строк.
+    """
+    name, lo, hi = partition_name(month), _bound(month), _bound(add_months(month, 1))
+    conn.execute(text(f"CREATE TABLE {name} (LIKE transfer INCLUDING DEFAULTS)"))
+    moved = conn.execute(text(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+        f"WHERE datetime >= {lo} AND datetime < {hi} RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    )).rowcount
+    # CHECK заранее — ATTACH не сканирует новую таблицу, блокировка родителя короче
+    conn.execute(text(
+        f"ALTER TABLE {name} ADD CONSTRAINT {name}_range CHECK (datetime >= {lo} AND datetime < {hi})"
+    ))
+    conn.execute(text(f"ALTER TABLE transfer ATTACH PARTITION {name} FOR VALUES FROM ({lo}) TO ({hi})"))
+    conn.execute(text(f"ALTER TABLE {name} DROP CONSTRAINT {name}_range"))
+    return moved
+
+
+def ensure(conn: Connection, ahead: int) -> list[tuple[str, int]]:
+    """Месяцы от текущего на ahead вперёд плюс месяцы, чьи строки лежат в transfer_default."""
+    current = month_start(datetime.utcnow().date())
+    wanted = {add_months(current, n) for n in range(ahead + 1)}
+    stray = conn.execute(text(
+        f"SELECT DISTINCT date_trunc('month', datetime)::date FROM {DEFAULT_PARTITION}"
+    )).scalars()
+    wanted.update(stray)
+    have = existing(conn)
+    return [(partition_name(m), create_month(conn, m)) for m in sorted(wanted) if m not in have]
+
+
+def archive_month(conn: Connection, month: date, name: str, directory: Path, keep: bool) -> int:
+    """
+    Выгружает партицию в gzip NDJSON, отсоединяет и (без keep) удаляет её.
+    Всё в одной транзакции conn: при ошибке партиция остаётся на месте.
+    """
+    # SHARE на саму партицию: запись в неё ждёт, остальные месяцы работают как обычно
+    conn.execute(text(f"LOCK TABLE {name} IN SHARE MODE"))
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{name}.ndjson.gz"
+    tmp = path.with_name(path.name + ".tmp")
+    written = 0
+    result = conn.execution_options(
+        stream_results=True, yield_per=settings.EXPORT_CHUNK_ROWS
+    ).execute(text(f"SELECT * FROM {name} ORDER BY datetime, id"))
+    field_names = list(result.keys())
+    with gzip.open(tmp, "wt", encoding="utf-8") as out:
+        for rows in result.partitions():
+            out.write(encode_rows(rows, "ndjson", field_names))
+            written += len(rows)
+        out.flush()
+        os.fsync(out.fileno())
+    total = conn.execute(text(f"SELECT count(*) FROM {name}")).scalar()
+    if total != written:
+        tmp.unlink()
+        raise RuntimeError(f"{name}: wrote {written} rows, table has {total}")
+    tmp.replace(path)
+
+    # ACCESS EXCLUSIVE на родителя — только отсюда до commit
+    conn.execute(text(f"ALTER TABLE transfer DETACH PARTITION {name}"))
+    if not keep:
+        conn.execute(text(f"DROP TABLE {name}"))
+    return written
+
+
+def archive(retain: int, directory: Path, keep: bool) -> list[tuple[str, int]]:
+    cutoff = add_months(month_start(datetime.utcnow().date()), -retain)
+    with engine.connect() as conn:
+        old = sorted((m, n) for m, n in existing(conn).items() if add_months(m, 1) <= cutoff)
+    done = []
+    for month, name in old:
+        with engine.begin() as conn:  # по транзакции на месяц
+            done.append((name, archive_month(conn, month, name, directory, keep)))
+    return done
+
+
+# ------------------------------- CLI -------------------------------
+
+def _list() -> None:
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples::bigint, "
+            "pg_size_pretty(pg_total_relation_size(c.oid)) "
+            "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'transfer'::regclass ORDER BY c.relname"
+        )).all()
+    for name, bound, estimate, size in rows:
+        print(f"{name}\t{bound}\t~{max(estimate, 0)} rows\t{size}")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Партиции transfer по месяцам поездки")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("ensure", help="создать партиции на месяцы вперёд")
+    p.add_argument("--ahead", type=int, default=settings.PARTITION_MONTHS_AHEAD)
+    p = sub.add_parser("archive", help="выгрузить и удалить старые месяцы")
+    p.add_argument("--retain", type=int, default=settings.PARTITION_RETAIN_MONTHS)
+    p.add_argument("--dir", type=Path, default=Path(settings.ARCHIVE_DIR))
+    p.add_argument("--keep", action="store_true", help="только отсоединить, таблицу не удалять")
+    sub.add_parser("list", help="партиции, их границы и размер")
+    args = parser.parse_args(argv)
+
+    if is_sqlite:
+        sys.exit("partitions: только для PostgreSQL")
+    with engine.connect() as conn:
+        if not is_partitioned(conn):
+            sys.exit("transfer не секционирована — сначала alembic upgrade head")
+
+    if args.command == "ensure":
+        with engine.begin() as conn:
+            created = ensure(conn, args.ahead)
+        for name, moved in created:
+            print(f"{name}: created, {moved} rows moved from {DEFAULT_PARTITION}")
+    elif args.command == "archive":
+        for name, rows in archive(args.retain, args.dir, args.keep):
+            print(f"{name}: {rows} rows → {args.dir / (name + '.ndjson.gz')}")
+    else:
+        _list()
+
+
+if __name__ == "__main__":
+    main()
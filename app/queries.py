@@ -0,0 +1,97 @@
+# app/queries.py
+"""
+Чтение заявок: фильтры и keyset-пагинация.
+
+Страница выбирается условием (datetime, id) > (курсор) по индексу, а не OFFSET,
+поэтому стоимость запроса зависит от размера страницы, а не от номера.
+"""
+import base64
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi import HTTPException, Query
+from sqlalchemy import tuple_
+from sqlmodel import select
+
+from .models import Transfer, VehicleClass
+
+
+def to_utc_naive(dt: datetime) -> datetime:
+    """В БД время хранится в UTC без tzinfo; наивное значение считаем UTC."""
+    if dt.tzinfo is None:
+        return dt
+    return dt.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+class TransferFilters:
+    """Общие фильтры списка/выгрузки заявок (query-параметры)."""
+
+    def __init__(
+        self,
+        datetime_from: Optional[datetime] = Query(None, description="Время поездки от (включительно)"),
+        datetime_to: Optional[datetime] = Query(None, description="Время поездки до (не включая)"),
+        departure_city: Optional[str] = Query(None),
+        arrival_city: Optional[str] = Query(None),
+        departure_city_id: Optional[str] = Query(None, description="id из /cities/suggest"),
+        arrival_city_id: Optional[str] = Query(None, description="id из /cities/suggest"),
+        vehicle_class: Optional[VehicleClass] = Query(None),
+        created_from: Optional[datetime] = Query(None, description="Создана от (включительно)"),
+        created_to: Optional[datetime] = Query(None, description="Создана до (не включая)"),
+    ):
+        self.datetime_from = datetime_from
+        self.datetime_to = datetime_to
+        self.departure_city = departure_city
+        self.arrival_city = arrival_city
+        self.departure_city_id = departure_city_id
+        self.arrival_city_id = arrival_city_id
+        self.vehicle_class = vehicle_class
+        self.created_from = created_from
+        self.created_to = created_to
+
+    def conditions(self) -> list:
+        conds = []
+        if self.datetime_from is not None:
+            conds.append(Transfer.datetime >= to_utc_naive(self.datetime_from))
+        if self.datetime_to is not None:
+            conds.append(Transfer.datetime < to_utc_naive(self.datetime_to))
+        if self.departure_city:
+            conds.append(Transfer.departure_city == self.departure_city)
+        if self.arrival_city:
+            conds.append(Transfer.arrival_city == self.arrival_city)
+        if self.departure_city_id:
+            conds.append(Transfer.departure_city_id == self.departure_city_id)
+        if self.arrival_city_id:
+            conds.append(Transfer.arrival_city_id == self.arrival_city_id)
+        if self.vehicle_class is not None:
+            conds.append(Transfer.vehicle_class == self.vehicle_class)
+        if self.created_from is not None:
+            conds.append(Transfer.created_at >= to_utc_naive(self.created_from))
+        if self.created_to is not None:
+            conds.append(Transfer.created_at < to_utc_naive(self.created_to))
+        return conds
+
+
+# ----------------------------- Курсор ------------------------------
+
+def encode_cursor(transfer: Transfer) -> str:
+    raw = f"{transfer.datetime.isoformat()}|{transfer.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        dt_str, id_str = base64.urlsafe_b64decode(padded).decode().split("|", 1)
+        return datetime.fromisoformat(dt_str), uuid.UUID(id_str)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Некорректный cursor.")
+
+
+def list_transfers_stmt(filters: TransferFilters, cursor: Optional[str], limit: int):
+    """SELECT страницы; берём limit + 1 строку, чтобы понять, есть ли следующая."""
+    stmt = select(Transfer).where(*filters.conditions())
+    if cursor:
+        after_dt, after_id = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(Transfer.datetime, Transfer.id) > (after_dt, after_id))
+    return stmt.order_by(Transfer.datetime, Transfer.id).limit(limit + 1)
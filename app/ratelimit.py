@@ -0,0 +1,173 @@
+# app/ratelimit.py
+"""
+Ограничители частоты.
+
+TokenBucket — для исходящих сообщений в Telegram: в группу можно слать около
+20 сообщений в минуту, иначе 429 с retry_after. Диспетчер outbox не ждёт
+токен внутри транзакции (строки заблокированы FOR UPDATE), а спрашивает
+try_acquire() и при нехватке откладывает сообщение на возвращённое время.
+
+RateLimiter — входящие запросы (POST /transfers, POST /transfers/batch):
+корзина на ключ (пользователь Telegram или IP). Запрос может стоить несколько
+токенов (пакет — по токену на заявку). Запрос дороже ёмкости корзины проходит
+при полной корзине в долг: следующие ждут, пока она не выйдет из минуса.
+Корзины хранит бэкенд:
+  - LocalBuckets — в памяти процесса, OrderedDict ключ → (токены, время)
+    с вытеснением давно не приходивших (LRU), без объекта на ключ;
+  - RedisBuckets — общие для всех воркеров/инстансов (RATE_LIMIT_REDIS_URL,
+    нужен пакет redis): та же арифметика атомарно в Lua-скрипте.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from collections import OrderedDict
+from typing import Protocol
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """rate — токенов в секунду, capacity — размер всплеска. rate <= 0 — без ограничения."""
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> float:
+        """Берёт токен и возвращает 0.0 или, если токена нет, сколько секунд подождать."""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        self._refill(now)
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            return 0.0
+        return (1.0 - self._tokens) / self.rate
+
+    def pause(self, seconds: float) -> None:
+        """429 от Telegram: ничего не отправляем retry_after секунд, всплеск начинается заново."""
+        now = time.monotonic()
+        self._blocked_until = max(self._blocked_until, now + seconds)
+        self._tokens = 0.0
+        self._updated = self._blocked_until
+
+
+class BucketBackend(Protocol):
+    async def acquire(self, key: str, rate: float, capacity: float, cost: float = 1.0) -> float:
+        """Берёт cost токенов из корзины key; 0.0 или сколько секунд подождать."""
+
+    async def close(self) -> None: ...
+
+
+class LocalBuckets:
+    """
+    Корзины в памяти процесса. Вытесненный ключ начнёт с полной корзины —
+    при maxsize с запасом на активных клиентов лимит для частых не слабеет.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._data: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def acquire(self, key: str, rate: float, capacity: float, cost: float = 1.0) -> float:
+        now = time.monotonic()
+        tokens, updated = self._data.pop(key, (capacity, now))  # pop + вставка = в конец LRU
+        tokens = min(capacity, tokens + (now - updated) * rate)
+        need = min(cost, capacity)  # дороже ёмкости — в долг, иначе не пройдёт никогда
+        wait = 0.0
+        if tokens >= need:
+            tokens -= cost
+        else:
+            wait = (need - tokens) / rate
+        self._data[key] = (tokens, now)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+        return wait
+
+    async def close(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# KEYS[1] — корзина; ARGV: rate (токенов/сек), capacity, cost. Время — часы Redis,
+# одни на все воркеры. Ответ строкой: числа Lua в ответе Redis усекаются до целых.
+_REDIS_BUCKET = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local need = math.min(cost, capacity)
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= need then
+  tokens = tokens - cost
+else
+  wait = (need - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], math.ceil((capacity - math.min(tokens, 0)) / rate) + 1)
+return tostring(wait)
+"""
+
+
+class RedisBuckets:
+    """Корзины в Redis: ключ живёт, пока корзина не наполнится снова."""
+
+    def __init__(self, url: str, prefix: str = "ratelimit:") -> None:
+        try:
+            import redis.asyncio as redis
+        except ImportError:  # необязательная зависимость
+            raise RuntimeError("RATE_LIMIT_REDIS_URL requires redis (pip install redis)") from None
+        self.prefix = prefix
+        self._redis = redis.from_url(url)
+        self._script = self._redis.register_script(_REDIS_BUCKET)
+
+    async def acquire(self, key: str, rate: float, capacity: float, cost: float = 1.0) -> float:
+        return float(await self._script(keys=[self.prefix + key], args=[rate, capacity, cost]))
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+class RateLimiter:
+    """
+    Лимиты по областям: rules = {"user": (в минуту, всплеск), "ip": (...)}.
+    Ошибка общего бэкенда (Redis недоступен) не роняет запросы — лимит временно не действует.
+    """
+
+    def __init__(self, backend: BucketBackend, rules: dict[str, tuple[float, float]]) -> None:
+        self.backend = backend
+        self.rules = {scope: (per_minute / 60, max(burst, 1.0)) for scope, (per_minute, burst) in rules.items()}
+
+    async def check(self, scope: str, key: str, cost: float = 1.0) -> float:
+        rate, capacity = self.rules[scope]
+        if rate <= 0:
+            return 0.0
+        try:
+            return await self.backend.acquire(f"{scope}:{key}", rate, capacity, cost)
+        except Exception:
+            logger.warning("rate limit backend failed, request allowed", exc_info=True)
+            return 0.0
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+
+def build_backend(redis_url: str, max_keys: int) -> BucketBackend:
+    return RedisBuckets(redis_url) if redis_url else LocalBuckets(max_keys)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, constr, conint
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional
 import uuid
 from .models import VehicleClass, ContactMethod
@@ -24,3 +24,55 @@ class TransferCreate(BaseModel):
 class TransferRead(BaseModel):
     id: uuid.UUID
     status: str = "accepted"
+
+class TransferDetail(BaseModel):
+    """Заявка целиком (для диспетчеров); время — в UTC."""
+    id: uuid.UUID
+    created_at: datetime
+    departure_city: str
+    departure_address: str
+    arrival_city: str
+    arrival_address: str
+    departure_city_id: Optional[str] = None
+    arrival_city_id: Optional[str] = None
+    datetime: datetime
+    vehicle_class: VehicleClass
+    pax_count: int
+    luggage: bool
+    child_seat: bool
+    contact_phone: str
+    contact_method: ContactMethod
+    comment: Optional[str] = None
+
+class TransferPage(BaseModel):
+    items: list[TransferDetail]
+    next_cursor: Optional[str] = None  # None — страниц больше нет
+
+class UserTransfers(BaseModel):
+    upcoming: list[TransferDetail]  # ближайшие сначала
+    recent: list[TransferDetail]    # последние прошедшие, свежие сначала
+
+class TransferBatchItemResult(BaseModel):
+    index: int                      # позиция элемента во входном списке / строке NDJSON
+    status: str                     # accepted | rejected
+    id: Optional[uuid.UUID] = None
+    error: Optional[str] = None
+    replayed: bool = False          # повтор по ключу идемпотентности: id исходной заявки
+
+class TransferBatchRead(BaseModel):
+    accepted: int
+    rejected: int
+    items: list[TransferBatchItemResult]
+
+class CitySuggestion(BaseModel):
+    id: str    # нормализованный id, он же пишется в transfer.*_city_id
+    name: str
+
+class StatsRow(BaseModel):
+    """Строка GET /stats; поля, не вошедшие в group_by, — None."""
+    day: Optional[date] = None                 # день поездки, UTC
+    vehicle_class: Optional[VehicleClass] = None
+    departure_city_id: Optional[str] = None    # "" — город не распознан
+    arrival_city_id: Optional[str] = None
+    transfers: int
+    pax: int
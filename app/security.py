@@ -1,26 +1,104 @@
-import hashlib, hmac, urllib.parse
+import hashlib, hmac, re, time, urllib.parse
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Optional
+
+from . import fastjson
+from .cache import TTLCache
 from .config import settings
 
-def verify_telegram_init_data(init_data: str) -> bool:
-    """Validate Telegram WebApp initData signature.
+
+@dataclass(frozen=True)
+class TelegramInitData:
+    """Разобранный initData Telegram WebApp."""
+    hash: str
+    auth_date: Optional[int] = None
+    user: Optional[dict[str, Any]] = None
+    fields: dict[str, str] = field(default_factory=dict)
+
+    @property
+    def user_id(self) -> Optional[int]:
+        uid = (self.user or {}).get("id")
+        try:
+            return int(uid) if uid is not None else None
+        except (TypeError, ValueError):
+            return None
+
+
+# hex HMAC-SHA256; всё остальное (в т.ч. не-ASCII — compare_digest на нём падает) отсекаем сразу
+_HASH_RE = re.compile(r"[0-9a-fA-F]{64}")
+
+
+@lru_cache(maxsize=8)
+def _secret_key(bot_token: str) -> bytes:
+    # Схема WebApp: secret = HMAC_SHA256(key="WebAppData", msg=bot_token).
+    # (sha256(bot_token) — это схема Login Widget, для initData она не подходит.)
+    return hmac.new(b"WebAppData", bot_token.encode(), hashlib.sha256).digest()
+
+
+# Уже проверенные initData: мини-апп в рамках одной сессии шлёт одну и ту же строку,
+# повторно парсить и считать HMAC не нужно. Ключ — дайджест (токен + строка).
+_verified = TTLCache(maxsize=settings.INITDATA_CACHE_SIZE, ttl=settings.INITDATA_CACHE_TTL)
+
+
+def parse_init_data(raw: str) -> Optional[TelegramInitData]:
+    """Разбор initData без проверки подписи (dev-режим, когда BOT_TOKEN не задан)."""
+    if not raw:
+        return None
+    # initData приходит как query-string; parse_qsl сам сделает percent-decode
+    fields = dict(urllib.parse.parse_qsl(raw, keep_blank_values=True))
+    user = None
+    if fields.get("user"):
+        try:
+            user = fastjson.loads(fields["user"])
+        except ValueError:
+            user = None
+    try:
+        auth_date = int(fields["auth_date"]) if "auth_date" in fields else None
+    except ValueError:
+        auth_date = None
+    return TelegramInitData(
+        hash=fields.get("hash", ""),
+        auth_date=auth_date,
+        user=user if isinstance(user, dict) else None,
+        fields=fields,
+    )
+
+
+def verify_init_data(raw: str, bot_token: Optional[str] = None) -> Optional[TelegramInitData]:
+    """Validate Telegram WebApp initData signature and auth_date age.
     https://core.telegram.org/bots/webapps#validating-data-received-via-the-web-app
+
+    Returns the parsed initData, or None if it is missing, forged or expired.
     """
-    if not settings.BOT_TOKEN:
-        # dev mode: allow empty or fake init_data; set BOT_TOKEN in prod
-        return True
-    try:
-        parts = [p for p in init_data.split("&") if p]
-        data = {}
-        hash_recv = ""
-        for p in parts:
-            k, v = p.split("=", 1)
-            if k == "hash":
-                hash_recv = v
-            else:
-                data[k] = urllib.parse.unquote_plus(v)
-        data_check_string = "\n".join(f"{k}={data[k]}" for k in sorted(data.keys()))
-        secret_key = hashlib.sha256(settings.BOT_TOKEN.encode()).digest()
-        calc = hmac.new(secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()
-        return hmac.compare_digest(calc, hash_recv)
-    except Exception:
-        return False
+    token = bot_token or settings.BOT_TOKEN
+    if not raw or not token or "hash=" not in raw:
+        return None
+
+    now = time.time()
+    max_age = settings.INITDATA_MAX_AGE
+    key = hashlib.blake2b(f"{token}\n{raw}".encode(), digest_size=16).digest()
+    cached = _verified.get(key)
+    if cached is not None:
+        return cached
+
+    data = parse_init_data(raw)
+    if not _HASH_RE.fullmatch(data.hash):
+        return None
+    # data_check_string: key=value\n (отсортированные ключи, кроме "hash")
+    check = "\n".join(f"{k}={v}" for k, v in sorted(data.fields.items()) if k != "hash")
+    calc = hmac.new(_secret_key(token), check.encode(), hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(calc, data.hash.lower()):
+        return None
+
+    ttl = float(settings.INITDATA_CACHE_TTL)
+    if max_age > 0:
+        if data.auth_date is None:
+            return None
+        remaining = data.auth_date + max_age - now
+        if remaining <= 0:
+            return None
+        # из кэша initData не должен пережить свой срок годности
+        ttl = min(ttl, remaining)
+    _verified.set(key, data, ttl=ttl)
+    return data
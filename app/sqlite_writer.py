@@ -0,0 +1,116 @@
+# app/sqlite_writer.py
+"""
+Group commit для SQLite: все записи POST /transfers идут через один
+writer-таск, который собирает накопившиеся заявки в одну транзакцию.
+
+В SQLite пишет одно соединение за раз; при параллельных запросах каждая
+заявка — своя транзакция, ожидание блокировки (busy_timeout) и свой commit
+(fsync журнала). Writer забирает из очереди всё, что пришло, пока шёл
+предыдущий commit (до SQLITE_WRITER_MAX_BATCH), выполняет каждую запись в
+своём SAVEPOINT — ошибка одной заявки (409 автопарка, дубль ключа
+идемпотентности) откатывает только её — и делает один commit на пачку.
+Искусственной задержки нет: одиночная заявка коммитится сразу.
+
+Запись — async-функция от сессии, которая не делает commit; её результат
+(id заявки, итоги пакета) или исключение возвращается вызывающему после
+commit пачки. Транзакция пачки начинается с BEGIN IMMEDIATE (db.write_session):
+чтения внутри записей (автопарк, ключи) не упрутся в SQLITE_BUSY_SNAPSHOT,
+если между ними закоммитил диспетчер outbox.
+
+Через writer пишут POST /transfers и POST /transfers/batch.
+Включается для sqlite:// при SQLITE_GROUP_COMMIT=true (writer is None для Postgres).
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+from typing import Any, AsyncContextManager, Awaitable, Callable
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .config import settings
+from .db import is_sqlite, write_session
+
+Job = Callable[[AsyncSession], Awaitable[Any]]
+
+
+class GroupCommitWriter:
+    def __init__(
+        self, session_factory: Callable[[], AsyncContextManager[AsyncSession]], max_batch: int
+    ) -> None:
+        self._session_factory = session_factory
+        self.max_batch = max(max_batch, 1)
+        self._queue: asyncio.Queue[tuple[Job, asyncio.Future]] | None = None
+        self._task: asyncio.Task | None = None
+        self.batches = 0
+        self.jobs = 0
+
+    def _ensure_started(self) -> asyncio.Queue:
+        # очередь и таск — в event loop первого вызова (uvicorn, тесты)
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run(), name="sqlite-writer")
+        return self._queue
+
+    async def submit(self, job: Job) -> Any:
+        """Ставит запись в очередь и ждёт commit пачки; исключение job пробрасывается."""
+        future = asyncio.get_running_loop().create_future()
+        self._ensure_started().put_nowait((job, future))
+        return await future
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("sqlite writer stopped"))
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            await self._commit(batch)
+
+    async def _commit(self, batch: list[tuple[Job, asyncio.Future]]) -> None:
+        outcomes: list[tuple[asyncio.Future, BaseException | None, Any]] = []
+        try:
+            async with self._session_factory() as session:
+                for job, future in batch:
+                    if future.cancelled():  # клиент ушёл до записи — не пишем
+                        continue
+                    try:
+                        async with session.begin_nested():
+                            result = await job(session)
+                    except Exception as exc:
+                        outcomes.append((future, exc, None))
+                    else:
+                        outcomes.append((future, None, result))
+                await session.commit()
+        except Exception as exc:
+            # commit не прошёл — не записалось ничего из пачки
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        self.batches += 1
+        self.jobs += len(outcomes)
+        for future, exc, result in outcomes:
+            if future.done():
+                continue
+            if exc is not None:
+                future.set_exception(exc)
+            else:
+                future.set_result(result)
+
+
+writer = (
+    GroupCommitWriter(write_session, settings.SQLITE_WRITER_MAX_BATCH)
+    if is_sqlite and settings.SQLITE_GROUP_COMMIT
+    else None
+)
@@ -0,0 +1,143 @@
+# app/stats.py
+"""
+Статистика для диспетчеров: заявки по дням, классам и маршрутам.
+
+GROUP BY по всей transfer на каждое обновление дашборда не масштабируется,
+поэтому счётчики лежат в сводной таблице transfer_daily_stat
+(день поездки × класс × пара городов → число заявок, сумма пассажиров).
+Её обновляет record() — upsert в той же транзакции, что и вставка заявок
+(POST /transfers и /transfers/batch), так что сводка не расходится с данными.
+GET /stats читает только сводку и кэширует ответ на STATS_CACHE_TTL секунд.
+
+Пересчитать (после ручных правок или app.cities backfill):
+    python -m app.stats rebuild
+"""
+from __future__ import annotations
+
+import argparse
+from collections import defaultdict
+from datetime import date
+from typing import Iterable, Optional
+
+from sqlalchemy import delete, func, insert, text
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .cache import TTLCache
+from .config import settings
+from .db import engine, is_sqlite
+from .models import Transfer, TransferDailyStat, VehicleClass
+
+KEY_COLUMNS = ("day", "vehicle_class", "departure_city_id", "arrival_city_id")
+GROUPINGS = {"day", "vehicle_class", "route"}
+
+_cache = TTLCache(maxsize=256, ttl=settings.STATS_CACHE_TTL)
+
+
+def _upsert_stmt():
+    # диалект — при первой заявке, а не при импорте приложения
+    if is_sqlite:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    stmt = dialect_insert(TransferDailyStat)
+    table = TransferDailyStat.__table__
+    return stmt.on_conflict_do_update(
+        index_elements=list(KEY_COLUMNS),
+        set_={
+            "transfers": table.c.transfers + stmt.excluded.transfers,
+            "pax": table.c.pax + stmt.excluded.pax,
+        },
+    )
+
+
+async def record(session: AsyncSession, transfers: Iterable[Transfer]) -> None:
+    """Прибавляет заявки к сводке в текущей транзакции (до commit)."""
+    totals: dict[tuple, list[int]] = defaultdict(lambda: [0, 0])
+    for t in transfers:
+        key = (t.datetime.date(), t.vehicle_class, t.departure_city_id or "", t.arrival_city_id or "")
+        totals[key][0] += 1
+        totals[key][1] += t.pax_count
+    if not totals:
+        return
+    # один порядок ключей во всех транзакциях — без взаимных блокировок у пакетов
+    params = [
+        dict(zip(KEY_COLUMNS, key), transfers=n, pax=pax)
+        for key, (n, pax) in sorted(totals.items())
+    ]
+    await session.exec(_upsert_stmt(), params=params)
+
+
+async def get_stats(
+    session: AsyncSession,
+    date_from: Optional[date],
+    date_to: Optional[date],
+    vehicle_class: Optional[VehicleClass],
+    group_by: tuple[str, ...],
+) -> list[dict]:
+    key = (date_from, date_to, vehicle_class, group_by)
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+
+    s = TransferDailyStat
+    columns = []
+    if "day" in group_by:
+        columns.append(s.day)
+    if "vehicle_class" in group_by:
+        columns.append(s.vehicle_class)
+    if "route" in group_by:
+        columns += [s.departure_city_id, s.arrival_city_id]
+    stmt = select(*columns, func.sum(s.transfers).label("transfers"), func.sum(s.pax).label("pax"))
+    if date_from is not None:
+        stmt = stmt.where(s.day >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(s.day < date_to)
+    if vehicle_class is not None:
+        stmt = stmt.where(s.vehicle_class == vehicle_class)
+    if columns:
+        stmt = stmt.group_by(*columns).order_by(*columns)
+
+    rows = [dict(row._mapping) for row in (await session.exec(stmt)).all()]
+    rows = [r for r in rows if r["transfers"]]  # без группировки на пустой таблице — одна строка NULL
+    _cache.set(key, rows)
+    return rows
+
+
+# ------------------------------- CLI -------------------------------
+
+def rebuild() -> int:
+    """
+    Пересчитывает сводку из transfer в одной транзакции. Дни раньше самой
+    старой заявки в transfer (месяцы, ушедшие в архив app.partitions) не трогает.
+    """
+    day = func.date(Transfer.datetime)
+    dep = func.coalesce(Transfer.departure_city_id, "")
+    arr = func.coalesce(Transfer.arrival_city_id, "")
+    source = (
+        select(day, Transfer.vehicle_class, dep, arr, func.count(), func.sum(Transfer.pax_count))
+        .group_by(day, Transfer.vehicle_class, dep, arr)
+    )
+    with Session(engine) as session:
+        if not is_sqlite:
+            # upsert'ы из create_transfer ждут конца пересчёта и не теряются и не двоятся
+            session.exec(text("LOCK TABLE transfer_daily_stat IN EXCLUSIVE MODE"))
+        first = session.exec(select(func.min(Transfer.datetime))).one()
+        if first is not None:
+            session.exec(delete(TransferDailyStat).where(TransferDailyStat.day >= first.date()))
+        session.exec(insert(TransferDailyStat).from_select([*KEY_COLUMNS, "transfers", "pax"], source))
+        session.commit()
+        return session.exec(select(func.count()).select_from(TransferDailyStat)).one()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Сводная статистика заявок")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("rebuild", help="пересчитать transfer_daily_stat из transfer")
+    args = parser.parse_args(argv)
+    if args.command == "rebuild":
+        print(f"transfer_daily_stat: {rebuild()} rows")
+
+
+if __name__ == "__main__":
+    main()
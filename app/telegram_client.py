@@ -0,0 +1,145 @@
+# app/telegram_client.py
+"""
+Общий HTTP-клиент для Bot API.
+
+Один httpx.AsyncClient на процесс: keep-alive и пул соединений к
+api.telegram.org вместо нового TCP+TLS на каждое сообщение. Открывается и
+закрывается в lifespan приложения; если им пользуются вне API (outbox_worker,
+скрипты), клиент создаётся лениво при первом вызове.
+
+httpx импортируется там же, при создании клиента (~0.1 с на холодном старте):
+lifespan прогревает его в фоне, POST /transfers его не ждёт.
+
+TELEGRAM_API_BASE позволяет подставить локальную заглушку вместо Telegram.
+"""
+from __future__ import annotations
+
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from . import fastjson, metrics
+from .config import settings
+from .timing import percentiles
+
+if TYPE_CHECKING:
+    import httpx
+
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+class TelegramAPIError(Exception):
+    """Bot API ответил ошибкой (HTTP-статус не 2xx или ok=false)."""
+
+    def __init__(self, method: str, status_code: int, description: str = "",
+                 retry_after: float | None = None):
+        super().__init__(f"{method}: {status_code} {description}".strip())
+        self.method = method
+        self.status_code = status_code
+        self.description = description
+        self.retry_after = retry_after
+
+    @property
+    def permanent(self) -> bool:
+        """Повтор не поможет: чат не найден, бот заблокирован и т.п."""
+        return self.status_code in (400, 401, 403, 404)
+
+
+@dataclass
+class CallStats:
+    calls: int = 0
+    errors: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+    # последние замеры — для перцентилей
+    recent: deque = field(default_factory=lambda: deque(maxlen=1024))
+
+    def as_dict(self) -> dict:
+        avg = self.total_seconds / self.calls if self.calls else 0.0
+        out = {
+            "calls": self.calls,
+            "errors": self.errors,
+            "avg_ms": round(avg * 1000, 2),
+            "max_ms": round(self.max_seconds * 1000, 2),
+        }
+        for name, seconds in percentiles(list(self.recent)).items():
+            out[f"{name}_ms"] = round(seconds * 1000, 2)
+        return out
+
+
+class TelegramClient:
+    def __init__(self) -> None:
+        self._client: httpx.AsyncClient | None = None
+        self._stats: dict[str, CallStats] = {}
+
+    def _build(self) -> httpx.AsyncClient:
+        import httpx
+
+        return httpx.AsyncClient(
+            base_url=settings.TELEGRAM_API_BASE,
+            timeout=httpx.Timeout(settings.TELEGRAM_TIMEOUT,
+                                  connect=settings.TELEGRAM_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=settings.TELEGRAM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.TELEGRAM_MAX_KEEPALIVE,
+                keepalive_expiry=settings.TELEGRAM_KEEPALIVE_EXPIRY,
+            ),
+            http2=settings.TELEGRAM_HTTP2,
+        )
+
+    async def start(self) -> None:
+        if self._client is None:
+            self._client = self._build()
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def call(self, token: str, method: str, payload: dict) -> dict:
+        """POST /bot<token>/<method>; возвращает поле result или бросает TelegramAPIError."""
+        if self._client is None:
+            await self.start()
+        stats = self._stats.setdefault(method, CallStats())
+        started = time.perf_counter()
+        status = "error"  # ответа не было: таймаут, сеть
+        try:
+            resp = await self._client.post(
+                f"/bot{token}/{method}", content=fastjson.dumps(payload), headers=_JSON_HEADERS
+            )
+            status = str(resp.status_code)
+            try:
+                data = fastjson.loads(resp.content)
+            except ValueError:
+                data = None
+            if not isinstance(data, dict):
+                # не ответ Bot API: HTML-страница прокси, обрезанное тело и т.п.
+                raise TelegramAPIError(method, resp.status_code, "unexpected response body")
+            if resp.status_code >= 400 or not data.get("ok", False):
+                params = data.get("parameters")
+                raise TelegramAPIError(
+                    method,
+                    data.get("error_code") or resp.status_code,
+                    data.get("description", ""),
+                    params.get("retry_after") if isinstance(params, dict) else None,
+                )
+            return data.get("result") or {}
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            stats.calls += 1
+            stats.total_seconds += elapsed
+            stats.max_seconds = max(stats.max_seconds, elapsed)
+            stats.recent.append(elapsed)
+            metrics.observe_telegram(method, status, elapsed)
+
+    def stats(self) -> dict[str, dict]:
+        """Счётчики по методам Bot API: вызовы, ошибки, средняя/макс. задержка."""
+        return {method: s.as_dict() for method, s in self._stats.items()}
+
+
+telegram = TelegramClient()
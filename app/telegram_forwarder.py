@@ -1,18 +1,73 @@
-import httpx
 from .config import settings
+from .ratelimit import TokenBucket
+from .telegram_client import telegram
 
-API_BASE = "https://api.telegram.org"
+# Общий бюджет на FORWARD_CHAT_ID в этом процессе (несколько диспетчеров — у каждого свой)
+forward_limiter = TokenBucket(settings.FORWARD_RATE_PER_MINUTE / 60, settings.FORWARD_RATE_BURST)
 
 async def forward_transfer_message(text: str) -> None:
-    """Send a message with the transfer summary to the second bot/chat."""
+    """Send a message with the transfer summary to the second bot/chat.
+
+    Raises on network errors and Bot API errors, so the outbox can retry.
+    """
     if not settings.FORWARD_BOT_TOKEN or not settings.FORWARD_CHAT_ID:
         return
-    url = f"{API_BASE}/bot{settings.FORWARD_BOT_TOKEN}/sendMessage"
     payload = {
         "chat_id": settings.FORWARD_CHAT_ID,
         "text": text,
         "parse_mode": "HTML",
         "disable_web_page_preview": True
     }
-    async with httpx.AsyncClient(timeout=10) as client:
-        await client.post(url, json=payload)
+    await telegram.call(settings.FORWARD_BOT_TOKEN, "sendMessage", payload)
+
+MESSAGE_LIMIT = 4096  # максимальная длина текста sendMessage
+
+def split_message(text: str, limit: int = MESSAGE_LIMIT) -> list[str]:
+    """Режет текст на части не длиннее limit, по возможности по границам строк."""
+    chunks: list[str] = []
+    current = ""
+    for line in text.split("\n"):
+        while len(line) > limit:  # строка сама по себе длиннее лимита
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(line[:limit])
+            line = line[limit:]
+        candidate = f"{current}\n{line}" if current else line
+        if len(candidate) > limit:
+            chunks.append(current)
+            current = line
+        else:
+            current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+DIGEST_SEPARATOR = "\n\n"
+
+def pack_messages(texts: list[str], limit: int = MESSAGE_LIMIT) -> list[tuple[list[int], str]]:
+    """
+    Склеивает тексты в как можно меньшее число сообщений не длиннее limit.
+    Возвращает пары (индексы исходных текстов, сообщение). Текст длиннее лимита
+    режется split_message и занимает несколько сообщений подряд.
+    """
+    packed: list[tuple[list[int], str]] = []
+    indices: list[int] = []
+    current = ""
+    for i, text in enumerate(texts):
+        candidate = f"{current}{DIGEST_SEPARATOR}{text}" if current else text
+        if len(candidate) <= limit:
+            indices.append(i)
+            current = candidate
+            continue
+        if current:
+            packed.append((indices, current))
+        if len(text) <= limit:
+            indices, current = [i], text
+        else:
+            packed.extend(([i], part) for part in split_message(text, limit))
+            indices, current = [], ""
+    if current:
+        packed.append((indices, current))
+    return packed
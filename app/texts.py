@@ -0,0 +1,139 @@
+# app/texts.py
+"""
+Тексты уведомлений и человекочитаемые подписи (общие для API и бота).
+Сообщения уходят с parse_mode=HTML, поэтому всё, что ввёл пользователь
+(города, адреса, телефон, комментарий), экранируется: один «<» в комментарии
+даёт 400 от Telegram, и в режиме дайджеста в dead-letter уходит весь дайджест.
+"""
+from __future__ import annotations
+
+import uuid
+from html import escape
+from datetime import datetime, timedelta, timezone
+from urllib.parse import quote
+
+from .models import VehicleClass
+from .schemas import TransferCreate
+
+VEHICLE_LABELS = {
+    "standard": "Стандарт",
+    "comfort":  "Комфорт",
+    "business": "Бизнес",
+    "premium":  "Премиум",
+    "minivan":  "Минивэн",
+}
+CONTACT_LABELS = {
+    "whatsapp": "WhatsApp",
+    "telegram": "Telegram",
+    "call":     "Звонок",
+}
+
+def human_vehicle_label(v: VehicleClass | str) -> str:
+    value = v.value if hasattr(v, "value") else str(v)
+    return VEHICLE_LABELS.get(value, value)
+
+def human_contact_label(s: str) -> str:
+    value = s.value if hasattr(s, "value") else str(s)
+    return CONTACT_LABELS.get(value, value)
+
+def human_datetime(dt: datetime) -> str:
+    """
+    Возвращает строку вида:
+    06.10.2025 02:42 (UTC+05:00)
+    Отображаем в том часовом поясе, в котором пришла дата; если tz нет — считаем UTC.
+    """
+    if dt.tzinfo is None:
+        dt_local = dt.replace(tzinfo=timezone.utc)
+    else:
+        dt_local = dt
+
+    offset = dt_local.utcoffset() or timedelta(0)
+    total_min = int(offset.total_seconds() // 60)
+    sign = "+" if total_min >= 0 else "-"
+    hh = abs(total_min) // 60
+    mm = abs(total_min) % 60
+    offset_str = f"{sign}{hh:02d}:{mm:02d}"
+
+    return f"{dt_local.strftime('%d.%m.%Y %H:%M')} (UTC{offset_str})"
+
+def _digits_only(phone: str) -> str:
+    """Оставляет только цифры (нужно для wa.me)."""
+    return "".join(ch for ch in phone if ch.isdigit())
+
+def build_contact_lines(phone: str, contact_method: str, transfer_id: str) -> list[str]:
+    """
+    Возвращает список строк для блока контакта:
+    - всегда даём кликабельный телефон (tel:+7...)
+    - если выбран WhatsApp — добавляем ссылку wa.me с предзаполненным текстом
+    - для Telegram/Звонка оставляем явную пометку способа связи
+    """
+    label = human_contact_label(contact_method)
+    tel_link = escape(f"tel:{phone}")
+    lines = [f"Контакт: <a href=\"{tel_link}\">{escape(phone)}</a> ({label})"]
+
+    method_value = contact_method.value if hasattr(contact_method, "value") else str(contact_method)
+    if method_value == "whatsapp":
+        digits = _digits_only(phone)
+        if digits:
+            text = f"Здравствуйте! Интерес по заявке ID {transfer_id}"
+            wa = f"https://wa.me/{digits}?text={quote(text)}"
+            lines.append(f"Ссылка для WhatsApp: {escape(wa)}")
+
+    return lines
+
+def build_transfer_text(data: TransferCreate, transfer_id: str) -> str:
+    """
+    Формирует понятный текст уведомления о заявке без смайликов и сырых enum'ов.
+    Добавляет кликабельный телефон и wa.me при выборе WhatsApp.
+    """
+    veh = human_vehicle_label(data.vehicle_class)
+    contact_lines = build_contact_lines(data.contact_phone, data.contact_method, transfer_id)
+    dt_str = human_datetime(data.datetime)
+
+    luggage_str = "да" if data.luggage else "нет"
+    childseat_str = "да" if data.child_seat else "нет"
+    comment_block = f"\nКомментарий: {escape(data.comment)}" if (data.comment or "").strip() else ""
+
+    base = (
+        "Новая заявка на трансфер\n"
+        f"Когда: {dt_str}\n"
+        f"Класс автомобиля: {veh}\n"
+        f"Пассажиров: {data.pax_count}\n"
+        f"Багаж: {luggage_str}\n"
+        f"Детское кресло: {childseat_str}\n"
+        f"Откуда: {escape(data.departure_city)}, {escape(data.departure_address)}\n"
+        f"Куда: {escape(data.arrival_city)}, {escape(data.arrival_address)}\n"
+        + "\n".join(contact_lines) +
+        f"{comment_block}\n"
+        f"ID заявки: {transfer_id}"
+    )
+    return base
+
+def build_confirmation_text(data: TransferCreate, transfer_id) -> str:
+    """Короткое подтверждение для пользователя (в диалог с ботом WebApp)."""
+    return (
+        "Ваша заявка успешно создана.\n\n"
+        f"ID заявки: {transfer_id}\n"
+        f"Когда: {human_datetime(data.datetime)}\n"
+        f"Класс автомобиля: {human_vehicle_label(data.vehicle_class)}\n"
+        f"Пассажиров: {data.pax_count}\n"
+        f"Откуда: {escape(data.departure_city)}, {escape(data.departure_address)}\n"
+        f"Куда: {escape(data.arrival_city)}, {escape(data.arrival_address)}\n"
+    )
+
+def build_batch_text(items: list[tuple[uuid.UUID, TransferCreate]]) -> str:
+    """Одно сводное уведомление на пакет заявок (вместо N сообщений)."""
+    lines = [f"Новые заявки на трансфер (пакет): {len(items)}"]
+    for n, (transfer_id, data) in enumerate(items, start=1):
+        lines.append("")
+        lines.append(
+            f"{n}. {human_datetime(data.datetime)}, {human_vehicle_label(data.vehicle_class)}, "
+            f"пассажиров: {data.pax_count}"
+        )
+        lines.append(f"Откуда: {escape(data.departure_city)}, {escape(data.departure_address)}")
+        lines.append(f"Куда: {escape(data.arrival_city)}, {escape(data.arrival_address)}")
+        lines.append(
+            f"Контакт: {escape(data.contact_phone)} ({human_contact_label(data.contact_method)})"
+        )
+        lines.append(f"ID заявки: {transfer_id}")
+    return "\n".join(lines)
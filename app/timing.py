@@ -0,0 +1,57 @@
+# app/timing.py
+"""Замеры этапов обработки запроса (verify / validate / db ...)."""
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from .metrics import observe_stage
+
+
+class StageTimer:
+    """
+    Копит длительности этапов одного запроса и пишет их в гистограмму
+    transfer_stage_duration_seconds. При SERVER_TIMING=true они же отдаются
+    клиенту заголовком Server-Timing (его разбирает bench/bench_transfers.py).
+    """
+
+    __slots__ = ("stages",)
+
+    def __init__(self) -> None:
+        self.stages: list[tuple[str, float]] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.stages.append((name, elapsed))
+            observe_stage(name, elapsed)
+
+    def server_timing(self) -> str:
+        return ", ".join(f"{name};dur={seconds * 1000:.3f}" for name, seconds in self.stages)
+
+
+@contextmanager
+def timed(name: str) -> Iterator[None]:
+    """Одиночный замер вне запроса (фоновая доставка и т.п.) — только в метрики."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - started)
+
+
+def percentiles(values: list[float], points=(50, 95, 99)) -> dict[str, float]:
+    """Перцентили методом ближайшего ранга; пустой список → пустой словарь."""
+    if not values:
+        return {}
+    ordered = sorted(values)
+    out = {}
+    for p in points:
+        idx = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+        out[f"p{p}"] = ordered[idx]
+    return out
@@ -0,0 +1,117 @@
+# app/webhook.py
+"""
+Webhook-режим бота (BOT_MODE=webhook).
+
+Telegram шлёт апдейты POST-запросами на WEBHOOK_URL + WEBHOOK_PATH, маршрут
+кладёт их в общий aiogram Dispatcher. В отличие от long polling, getUpdates
+не нужен, поэтому API можно запускать в несколько воркеров/процессов.
+Подлинность запроса проверяется по заголовку X-Telegram-Bot-Api-Secret-Token.
+
+aiogram (вместе с bot_handlers) импортируется в фоновом потоке из
+start_webhook, а не при импорте приложения: до регистрации webhook апдейтов
+всё равно нет, а API начинает принимать заявки раньше.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import hmac
+import logging
+from typing import TYPE_CHECKING
+
+from fastapi import APIRouter, Header, HTTPException, Request
+
+from .config import settings
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+_bot: Bot | None = None
+# ссылки на задачи обработки апдейтов, чтобы их не собрал GC до завершения
+_tasks: set[asyncio.Task] = set()
+
+
+def webhook_secret() -> str:
+    """WEBHOOK_SECRET или детерминированный секрет из BOT_TOKEN (одинаковый во всех воркерах)."""
+    if settings.WEBHOOK_SECRET:
+        return settings.WEBHOOK_SECRET
+    return hashlib.sha256(f"webhook:{settings.BOT_TOKEN}".encode()).hexdigest()
+
+
+@router.post(settings.WEBHOOK_PATH, include_in_schema=False)
+async def telegram_webhook(
+    request: Request,
+    secret: str | None = Header(None, alias="X-Telegram-Bot-Api-Secret-Token"),
+):
+    if _bot is None:
+        raise HTTPException(status_code=503, detail="Bot is not started")
+    # байты: на не-ASCII строках compare_digest бросает TypeError (был бы 500)
+    if not secret or not hmac.compare_digest(secret.encode(), webhook_secret().encode()):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+    from aiogram.types import Update
+
+    from .bot_handlers import dp
+
+    update = Update.model_validate(await request.json(), context={"bot": _bot})
+    # Отвечаем Telegram сразу, обработка идёт в фоне
+    task = asyncio.create_task(_process_update(dp, update))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return {"ok": True}
+
+
+async def _process_update(dp, update) -> None:
+    # как в polling: ошибка обработчика (например, БД в /my) — в лог с трассировкой,
+    # а не «Task exception was never retrieved»
+    try:
+        await dp.feed_update(_bot, update)
+    except Exception:
+        logger.exception("telegram update %s failed", update.update_id)
+
+
+def _load_aiogram():
+    # aiogram — сотни модулей; импорт в потоке не блокирует event loop API
+    from .bot_handlers import dp
+
+    return dp
+
+
+def check_config() -> None:
+    if not settings.BOT_TOKEN or not settings.WEBHOOK_URL:
+        raise RuntimeError("BOT_MODE=webhook requires BOT_TOKEN and WEBHOOK_URL")
+
+
+async def start_webhook() -> None:
+    """Создаёт Bot и регистрирует webhook (setWebhook идемпотентен — можно из каждого воркера)."""
+    global _bot
+    check_config()
+    dp = await asyncio.to_thread(_load_aiogram)
+    from aiogram import Bot
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+
+    # тот же базовый URL Bot API, что и у app/telegram_client (можно подставить заглушку)
+    session = AiohttpSession(api=TelegramAPIServer.from_base(settings.TELEGRAM_API_BASE))
+    _bot = Bot(settings.BOT_TOKEN, session=session)
+    url = settings.WEBHOOK_URL.rstrip("/") + settings.WEBHOOK_PATH
+    await _bot.set_webhook(
+        url,
+        secret_token=webhook_secret(),
+        allowed_updates=dp.resolve_used_update_types(),
+    )
+    logger.info("telegram webhook set to %s", url)
+
+
+async def stop_webhook() -> None:
+    # webhook не удаляем: остальные воркеры продолжают принимать апдейты
+    global _bot
+    if _tasks:
+        await asyncio.gather(*_tasks, return_exceptions=True)
+    if _bot is not None:
+        await _bot.session.close()
+        _bot = None
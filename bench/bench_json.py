@@ -0,0 +1,141 @@
+# bench/bench_json.py
+"""
+Микробенчмарк JSON-пути: stdlib json (FAST_JSON=false) против orjson (FAST_JSON=true).
+
+Меряет в одном процессе, без сети и БД, то, что API делает на каждый запрос:
+  - request: разбор тела POST /transfers и валидация TransferCreate
+    (тип телефона PhoneE164 и остальные ограничения — уже собранный
+    pydantic-core валидатор, он общий для обоих режимов);
+  - response: рендер TransferRead (POST /transfers) и страницы из 50
+    TransferDetail (GET /transfers) классом ответа FastAPI;
+  - telegram: тело sendMessage и разбор ответа Bot API;
+  - init_data: поле user из initData.
+Для каждой операции — мкс на вызов (лучший из --repeat прогонов) и ускорение.
+
+Пример:
+    python bench/bench_json.py --number 20000
+Результаты — bench/results/json-<время>.json.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sys
+import timeit
+import urllib.parse
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import orjson
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DATABASE_URL", "sqlite://")  # app.config требует; БД не открывается
+
+from bench_transfers import BOT_TOKEN, git_revision, make_payload, sign_init_data  # noqa: E402
+from fastapi.responses import JSONResponse, ORJSONResponse  # noqa: E402
+
+from app.fastjson import _std_dumps  # noqa: E402
+from app.schemas import TransferCreate, TransferDetail, TransferPage, TransferRead  # noqa: E402
+from app.texts import build_transfer_text  # noqa: E402
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+MODES = {
+    "stdlib": {"loads": json.loads, "dumps": _std_dumps, "response": JSONResponse},
+    "orjson": {"loads": orjson.loads, "dumps": orjson.dumps, "response": ORJSONResponse},
+}
+
+
+def fixtures(seed: int) -> dict:
+    rnd = random.Random(seed)
+    init_data = sign_init_data(BOT_TOKEN, 123456789)
+    payload = make_payload(rnd, init_data)
+    data = TransferCreate.model_validate(payload)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    page = TransferPage(items=[
+        TransferDetail(
+            id=uuid.uuid4(), created_at=now, departure_city_id="moscow", arrival_city_id="kazan",
+            **{**TransferCreate.model_validate(make_payload(rnd, init_data)).model_dump(
+                exclude={"telegram_init_data"}), "datetime": now + timedelta(days=1)},
+        )
+        for _ in range(50)
+    ], next_cursor="MjAyNS0xMC0yMFQxMDowMDowMHw0Mg")
+    return {
+        "body": json.dumps(payload, ensure_ascii=False).encode(),
+        "read": TransferRead(id=uuid.uuid4()).model_dump(mode="json"),
+        "page": page.model_dump(mode="json"),
+        "send": {"chat_id": "-100123", "text": build_transfer_text(data, uuid.uuid4()),
+                 "parse_mode": "HTML", "disable_web_page_preview": True},
+        "reply": json.dumps({"ok": True, "result": {"message_id": 42, "date": 1760000000,
+                                                    "chat": {"id": -100123, "type": "supergroup"}}}).encode(),
+        "user": dict(urllib.parse.parse_qsl(init_data))["user"],
+    }
+
+
+def operations(mode: dict, fx: dict) -> dict:
+    loads, dumps, response = mode["loads"], mode["dumps"], mode["response"]
+    return {
+        "request_transfer_create": lambda: TransferCreate.model_validate(loads(fx["body"])),
+        "response_transfer_read": lambda: response(fx["read"]).body,
+        "response_transfer_page_50": lambda: response(fx["page"]).body,
+        "telegram_send_payload": lambda: dumps(fx["send"]),
+        "telegram_parse_reply": lambda: loads(fx["reply"]),
+        "init_data_user": lambda: loads(fx["user"]),
+    }
+
+
+def measure(fn, number: int, repeat: int) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="stdlib json vs orjson on API payloads")
+    parser.add_argument("--number", type=int, default=20000, help="вызовов в одном прогоне")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--label", default="json")
+    parser.add_argument("--output", help="путь к JSON (по умолчанию bench/results/...)")
+    args = parser.parse_args()
+
+    fx = fixtures(args.seed)
+    results: dict[str, dict] = {}
+    for name in operations(MODES["stdlib"], fx):
+        row = {}
+        for mode_name, mode in MODES.items():
+            row[f"{mode_name}_us"] = round(measure(operations(mode, fx)[name], args.number, args.repeat), 2)
+        row["speedup"] = round(row["stdlib_us"] / row["orjson_us"], 2)
+        results[name] = row
+
+    # POST /transfers целиком: тело, ответ, initData и два сообщения из outbox (forward + подтверждение)
+    weights = {"request_transfer_create": 1, "response_transfer_read": 1, "init_data_user": 1,
+               "telegram_send_payload": 2, "telegram_parse_reply": 2}
+    per_request = {m: round(sum(results[k][f"{m}_us"] * w for k, w in weights.items()), 2) for m in MODES}
+    result = {
+        "label": args.label,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "config": {"number": args.number, "repeat": args.repeat, "python": sys.version.split()[0],
+                   "orjson": orjson.__version__},
+        "operations": results,
+        "post_transfer_json_us": per_request,
+    }
+
+    output = Path(args.output) if args.output else (
+        RESULTS_DIR / f"{args.label}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, ensure_ascii=False, indent=2))
+
+    print(f"{'operation':<28}{'stdlib µs':>12}{'orjson µs':>12}{'×':>7}")
+    for name, row in results.items():
+        print(f"{name:<28}{row['stdlib_us']:>12}{row['orjson_us']:>12}{row['speedup']:>7}")
+    print(f"POST /transfers JSON total: {per_request}")
+    print(f"results → {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# bench/stub_telegram.py
+"""
+Локальная заглушка Bot API для бенчмарков и ручных тестов.
+
+Отвечает на POST /bot<token>/<method> с настраиваемой задержкой и долей ошибок
+(429 с retry_after или 500). Для sendMessage запоминает момент получения
+каждого «ID заявки: …», чтобы бенчмарк мог посчитать задержку доставки
+уведомлений через outbox, и сколько раз заявка пришла в каждый чат (дубли).
+
+Отдельно:
+    python bench/stub_telegram.py --port 8081 --latency-ms 80 --error-rate 0.05
+и в приложении TELEGRAM_API_BASE=http://127.0.0.1:8081
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TRANSFER_ID_RE = re.compile(r"ID заявки: ([0-9a-f-]{36})")
+
+
+class StubState:
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.delivered: dict[str, float] = {}  # transfer_id -> time.time() первой доставки
+        self.sent: dict[tuple[str, str], int] = {}  # (chat_id, transfer_id) -> сколько раз пришло
+
+
+def make_handler(state: StubState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, как у api.telegram.org
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length)
+            delay = state.latency_ms + random.uniform(-state.jitter_ms, state.jitter_ms)
+            if delay > 0:
+                time.sleep(delay / 1000)
+
+            with state.lock:
+                state.requests += 1
+                failed = random.random() < state.error_rate
+                if failed:
+                    state.errors += 1
+
+            if failed:
+                if random.random() < 0.5:
+                    self._reply(429, {"ok": False, "error_code": 429,
+                                      "description": "Too Many Requests: retry after 1",
+                                      "parameters": {"retry_after": 1}})
+                else:
+                    self._reply(500, {"ok": False, "error_code": 500,
+                                      "description": "Internal Server Error"})
+                return
+
+            method = self.path.rsplit("/", 1)[-1]
+            if method == "sendMessage":
+                try:
+                    message = json.loads(body or b"{}")
+                except ValueError:
+                    message = {}
+                text, chat_id = message.get("text", ""), str(message.get("chat_id", ""))
+                now = time.time()
+                with state.lock:
+                    for transfer_id in TRANSFER_ID_RE.findall(text):
+                        state.delivered.setdefault(transfer_id, now)
+                        key = (chat_id, transfer_id)
+                        state.sent[key] = state.sent.get(key, 0) + 1
+                result = {"message_id": state.requests, "date": int(now),
+                          "chat": {"id": 0, "type": "private"}}
+            else:
+                result = True
+            self._reply(200, {"ok": True, "result": result})
+
+        def _reply(self, status: int, payload: dict) -> None:
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):  # без построчного лога
+            pass
+
+    return Handler
+
+
+def start_stub(port: int, state: StubState) -> ThreadingHTTPServer:
+    """Запускает заглушку в фоновом потоке; остановка — server.shutdown()."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="telegram-stub", daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Заглушка Telegram Bot API")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    state = StubState(args.latency_ms, args.jitter_ms, args.error_rate)
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(state))
+    print(f"telegram stub on http://127.0.0.1:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,17 @@
 # bot.py
 import os
 import asyncio
-from aiogram import Bot, Dispatcher
-from aiogram.filters import CommandStart
-from aiogram.types import Message
+from aiogram import Bot
+
+from app.bot_handlers import dp
 
 BOT_TOKEN = os.environ["BOT_TOKEN"]
 
 bot = Bot(BOT_TOKEN)
-dp = Dispatcher()
-
-@dp.message(CommandStart())
-async def on_start(m: Message):
-    # Никаких кнопок. Пользователь жмёт нижнюю меню-кнопку
-    # «Заявка на трансфер», которую ты настроил через BotFather (/setmenubutton → Web App).
-    await m.answer(
-        "Здравствуйте! Чтобы оформить поездку, нажмите нижнюю кнопку "
-        "«Заявка на трансфер»."
-    )
 
 async def main():
+    # только polling (dev); в проде бот работает через webhook API (BOT_MODE=webhook)
+    await bot.delete_webhook()
     await dp.start_polling(bot)
 
 if __name__ == "__main__":
@@ -0,0 +1,41 @@
+# migrations/env.py
+"""Alembic: URL и метаданные берутся из приложения (DATABASE_URL, app.models)."""
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine, pool
+from sqlmodel import SQLModel
+
+import app.models  # noqa: F401  — регистрирует таблицы в SQLModel.metadata
+from app.db import db_url, is_sqlite
+from app.partitions import is_partition
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = SQLModel.metadata
+
+
+def include_name(name, type_, parent_names) -> bool:
+    # партиции transfer создаёт app.partitions, в моделях их нет — иначе autogenerate их удалит
+    return not (type_ == "table" and is_partition(name))
+
+
+def run_migrations_online() -> None:
+    connectable = create_engine(db_url, poolclass=pool.NullPool)
+    with connectable.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_name=include_name,
+            render_as_batch=is_sqlite,  # SQLite не умеет большинство ALTER TABLE
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    # миграции смотрят на текущую схему (has_table / get_columns) — без соединения нельзя
+    raise SystemExit("--sql не поддерживается: запустите alembic upgrade head против БД")
+run_migrations_online()
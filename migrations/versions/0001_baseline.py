@@ -0,0 +1,67 @@
+"""Исходная схема: таблица transfer, как её создавал create_all до миграций.
+
+На БД, созданной create_all, таблица уже есть — миграция её не трогает,
+поэтому `alembic upgrade head` можно запускать и на старой базе.
+
+Revision ID: 0001
+Revises:
+Create Date: 2025-10-20
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+VEHICLE_CLASSES = ("standard", "comfort", "business", "premium", "minivan")
+CONTACT_METHODS = ("whatsapp", "telegram", "call")
+
+
+def enum_type(name: str, values: tuple[str, ...]) -> sa.types.TypeEngine:
+    """Enum как у SQLModel: нативный тип в Postgres (создаётся отдельно), VARCHAR в SQLite."""
+    return sa.Enum(*values, name=name).with_variant(
+        postgresql.ENUM(*values, name=name, create_type=False), "postgresql"
+    )
+
+
+def create_enum(name: str, values: tuple[str, ...]) -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        postgresql.ENUM(*values, name=name).create(op.get_bind(), checkfirst=True)
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table("transfer"):
+        return
+    create_enum("vehicleclass", VEHICLE_CLASSES)
+    create_enum("contactmethod", CONTACT_METHODS)
+    op.create_table(
+        "transfer",
+        sa.Column("id", sa.Uuid(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("departure_city", sa.String(), nullable=False),
+        sa.Column("departure_address", sa.String(), nullable=False),
+        sa.Column("arrival_city", sa.String(), nullable=False),
+        sa.Column("arrival_address", sa.String(), nullable=False),
+        sa.Column("datetime", sa.DateTime(), nullable=False),
+        sa.Column("vehicle_class", enum_type("vehicleclass", VEHICLE_CLASSES), nullable=False),
+        sa.Column("pax_count", sa.Integer(), nullable=False),
+        sa.Column("luggage", sa.Boolean(), nullable=False),
+        sa.Column("child_seat", sa.Boolean(), nullable=False),
+        sa.Column("contact_phone", sa.String(), nullable=False),
+        sa.Column("contact_method", enum_type("contactmethod", CONTACT_METHODS), nullable=False),
+        sa.Column("comment", sa.String(), nullable=True),
+        sa.Column("telegram_init_data", sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_transfer_created_at", "transfer", ["created_at"])
+    op.create_index("ix_transfer_id", "transfer", ["id"])
+
+
+def downgrade() -> None:
+    op.drop_table("transfer")
+    if op.get_bind().dialect.name == "postgresql":
+        postgresql.ENUM(name="contactmethod").drop(op.get_bind(), checkfirst=True)
+        postgresql.ENUM(name="vehicleclass").drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,209 @@
+"""Схема после перехода с create_all: outbox, идемпотентность, автопарк, города, статистика.
+
+Каждый шаг проверяет, нет ли уже таблицы / колонки / индекса: часть из них
+могла создать create_all на старых версиях. Колонки в существующие таблицы
+create_all не добавлял — их добавляет эта миграция. Если в transfer ещё есть
+telegram_init_data, она разбирается в telegram_user_id / telegram_auth_date
+(как python -m app.backfill_initdata) и удаляется — в той же транзакции, что и
+вся миграция: на большой таблице это один долгий UPDATE с блокировкой строк.
+Такую таблицу переведи заранее скриптом (он коммитит по пачкам), тогда этот
+шаг пропускается.
+
+downgrade не поддерживается (см. downgrade()).
+
+После миграции на старой базе:
+    python -m app.cities backfill && python -m app.stats rebuild
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2025-10-20
+"""
+from alembic import op
+from alembic.util import CommandError
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+VEHICLE_CLASSES = ("standard", "comfort", "business", "premium", "minivan")
+OUTBOX_KINDS = ("forward", "user_confirmation")
+OUTBOX_STATUSES = ("pending", "sent", "dead")
+
+TRANSFER_COLUMNS = (
+    ("telegram_user_id", sa.BigInteger()),
+    ("telegram_auth_date", sa.DateTime()),
+    ("departure_city_id", sa.String(64)),
+    ("arrival_city_id", sa.String(64)),
+)
+TRANSFER_INDEXES = (
+    ("ix_transfer_datetime_id", ["datetime", "id"]),
+    ("ix_transfer_vehicle_class_datetime", ["vehicle_class", "datetime", "id"]),
+    ("ix_transfer_departure_city_datetime", ["departure_city", "datetime", "id"]),
+    ("ix_transfer_arrival_city_datetime", ["arrival_city", "datetime", "id"]),
+    ("ix_transfer_departure_city_id_datetime", ["departure_city_id", "datetime", "id"]),
+    ("ix_transfer_arrival_city_id_datetime", ["arrival_city_id", "datetime", "id"]),
+    ("ix_transfer_telegram_user_id_datetime", ["telegram_user_id", "datetime"]),
+)
+NEW_TABLES = (
+    "transfer_daily_stat",
+    "vehicle_booking",
+    "route_duration",
+    "vehicle",
+    "transfer_idempotency",
+    "outbox_message",
+    "transfer_init_data_audit",
+)
+
+
+def enum_type(name: str, values: tuple[str, ...]) -> sa.types.TypeEngine:
+    return sa.Enum(*values, name=name).with_variant(
+        postgresql.ENUM(*values, name=name, create_type=False), "postgresql"
+    )
+
+
+def create_enum(name: str, values: tuple[str, ...]) -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        postgresql.ENUM(*values, name=name).create(op.get_bind(), checkfirst=True)
+
+
+def _has_table(name: str) -> bool:
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def _columns(table: str) -> set[str]:
+    return {c["name"] for c in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def _indexes(table: str) -> set[str]:
+    return {i["name"] for i in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def _upgrade_transfer() -> None:
+    existing = _columns("transfer")
+    for name, type_ in TRANSFER_COLUMNS:
+        if name not in existing:
+            op.add_column("transfer", sa.Column(name, type_, nullable=True))
+    indexes = _indexes("transfer")
+    for name, columns in TRANSFER_INDEXES:
+        if name not in indexes:
+            op.create_index(name, "transfer", columns)
+
+    if "telegram_init_data" in existing:
+        from app.backfill_initdata import backfill
+
+        backfill(op.get_bind(), batch_size=1000, audit=False, commit=False)
+        with op.batch_alter_table("transfer") as batch:
+            batch.drop_column("telegram_init_data")
+
+
+def _create_tables() -> None:
+    if not _has_table("transfer_init_data_audit"):
+        op.create_table(
+            "transfer_init_data_audit",
+            sa.Column("transfer_id", sa.Uuid(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.Column("init_data", sa.String(), nullable=False),
+            sa.PrimaryKeyConstraint("transfer_id"),
+        )
+
+    if not _has_table("outbox_message"):
+        create_enum("outboxkind", OUTBOX_KINDS)
+        create_enum("outboxstatus", OUTBOX_STATUSES)
+        op.create_table(
+            "outbox_message",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.Column("kind", enum_type("outboxkind", OUTBOX_KINDS), nullable=False),
+            sa.Column("transfer_id", sa.Uuid(), nullable=True),
+            sa.Column("chat_id", sa.String(), nullable=True),
+            sa.Column("text", sa.String(), nullable=False),
+            sa.Column("urgent", sa.Boolean(), nullable=False, server_default=sa.false()),
+            sa.Column("status", enum_type("outboxstatus", OUTBOX_STATUSES), nullable=False),
+            sa.Column("attempts", sa.Integer(), nullable=False),
+            sa.Column("next_attempt_at", sa.DateTime(), nullable=False),
+            sa.Column("last_error", sa.String(), nullable=True),
+            sa.Column("sent_at", sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_outbox_message_transfer_id", "outbox_message", ["transfer_id"])
+        op.create_index(
+            "ix_outbox_message_status_next_attempt_at", "outbox_message", ["status", "next_attempt_at"]
+        )
+    elif "urgent" not in _columns("outbox_message"):
+        op.add_column(
+            "outbox_message",
+            sa.Column("urgent", sa.Boolean(), nullable=False, server_default=sa.false()),
+        )
+
+    if not _has_table("transfer_idempotency"):
+        op.create_table(
+            "transfer_idempotency",
+            sa.Column("key", sa.String(64), nullable=False),
+            sa.Column("transfer_id", sa.Uuid(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint("key"),
+        )
+        op.create_index("ix_transfer_idempotency_created_at", "transfer_idempotency", ["created_at"])
+
+    if not _has_table("vehicle"):
+        op.create_table(
+            "vehicle",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("vehicle_class", enum_type("vehicleclass", VEHICLE_CLASSES), nullable=False),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("active", sa.Boolean(), nullable=False),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_vehicle_vehicle_class", "vehicle", ["vehicle_class"])
+
+    if not _has_table("route_duration"):
+        op.create_table(
+            "route_duration",
+            sa.Column("departure_city", sa.String(), nullable=False),
+            sa.Column("arrival_city", sa.String(), nullable=False),
+            sa.Column("minutes", sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint("departure_city", "arrival_city"),
+        )
+
+    if not _has_table("vehicle_booking"):
+        op.create_table(
+            "vehicle_booking",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("vehicle_id", sa.Integer(), nullable=False),
+            sa.Column("transfer_id", sa.Uuid(), nullable=False),
+            sa.Column("starts_at", sa.DateTime(), nullable=False),
+            sa.Column("ends_at", sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint("id"),
+            sa.UniqueConstraint("transfer_id"),
+        )
+        op.create_index(
+            "ix_vehicle_booking_vehicle_id_starts_at", "vehicle_booking", ["vehicle_id", "starts_at"]
+        )
+
+    if not _has_table("transfer_daily_stat"):
+        op.create_table(
+            "transfer_daily_stat",
+            sa.Column("day", sa.Date(), nullable=False),
+            sa.Column("vehicle_class", enum_type("vehicleclass", VEHICLE_CLASSES), nullable=False),
+            sa.Column("departure_city_id", sa.String(64), nullable=False),
+            sa.Column("arrival_city_id", sa.String(64), nullable=False),
+            sa.Column("transfers", sa.Integer(), nullable=False),
+            sa.Column("pax", sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint("day", "vehicle_class", "departure_city_id", "arrival_city_id"),
+        )
+
+
+def upgrade() -> None:
+    create_enum("vehicleclass", VEHICLE_CLASSES)
+    _upgrade_transfer()
+    _create_tables()
+
+
+def downgrade() -> None:
+    # Необратима: upgrade удаляет telegram_init_data (сырые initData не восстановить),
+    # а часть схемы могла существовать до миграции — что именно она создала, неизвестно.
+    # Откат на 0001 — только восстановлением БД из бэкапа.
+    raise CommandError("0002 необратима: восстановите БД из резервной копии")
@@ -0,0 +1,88 @@
+"""Помесячные партиции transfer по datetime (PostgreSQL; на SQLite — ничего).
+
+Таблица пересоздаётся как PARTITION BY RANGE (datetime) с ключом (id, datetime):
+партиции на каждый месяц с данными и PARTITION_MONTHS_AHEAD вперёд,
+transfer_default — для остального. Строки копируются в одной транзакции
+(на время миграции запись в transfer блокируется). Дальше партиции
+обслуживает python -m app.partitions ensure / archive.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2025-10-27
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+TRANSFER_INDEXES = (
+    ("ix_transfer_id", ["id"]),
+    ("ix_transfer_created_at", ["created_at"]),
+    ("ix_transfer_datetime_id", ["datetime", "id"]),
+    ("ix_transfer_vehicle_class_datetime", ["vehicle_class", "datetime", "id"]),
+    ("ix_transfer_departure_city_datetime", ["departure_city", "datetime", "id"]),
+    ("ix_transfer_arrival_city_datetime", ["arrival_city", "datetime", "id"]),
+    ("ix_transfer_departure_city_id_datetime", ["departure_city_id", "datetime", "id"]),
+    ("ix_transfer_arrival_city_id_datetime", ["arrival_city_id", "datetime", "id"]),
+    ("ix_transfer_telegram_user_id_datetime", ["telegram_user_id", "datetime"]),
+)
+
+
+def _rename_away(old: str) -> None:
+    """Переименовывает transfer в old и освобождает имена её индексов и ключа."""
+    op.rename_table("transfer", old)
+    for name, _ in TRANSFER_INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+    op.execute(f"ALTER TABLE {old} DROP CONSTRAINT transfer_pkey")
+
+
+def _create_indexes() -> None:
+    for name, columns in TRANSFER_INDEXES:
+        op.create_index(name, "transfer", columns)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+    from app import partitions
+    from app.config import settings
+
+    if partitions.is_partitioned(bind):
+        return
+
+    _rename_away("transfer_legacy")
+    op.execute("CREATE TABLE transfer (LIKE transfer_legacy INCLUDING DEFAULTS) PARTITION BY RANGE (datetime)")
+    op.execute("ALTER TABLE transfer ADD CONSTRAINT transfer_pkey PRIMARY KEY (id, datetime)")
+    _create_indexes()
+    partitions.create_default(bind)
+
+    first, last = bind.execute(sa.text("SELECT min(datetime), max(datetime) FROM transfer_legacy")).one()
+    current = partitions.month_start(datetime.utcnow().date())
+    month = partitions.month_start(first.date()) if first else current
+    until = partitions.add_months(current, settings.PARTITION_MONTHS_AHEAD)
+    if last is not None:
+        until = max(until, partitions.month_start(last.date()))
+    while month <= until:
+        partitions.create_month(bind, month)
+        month = partitions.add_months(month, 1)
+
+    op.execute("INSERT INTO transfer SELECT * FROM transfer_legacy")
+    op.drop_table("transfer_legacy")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+    _rename_away("transfer_partitioned")
+    op.execute("CREATE TABLE transfer (LIKE transfer_partitioned INCLUDING DEFAULTS)")
+    op.execute("ALTER TABLE transfer ADD CONSTRAINT transfer_pkey PRIMARY KEY (id)")
+    op.execute("INSERT INTO transfer SELECT * FROM transfer_partitioned")
+    op.drop_table("transfer_partitioned")  # вместе с партициями
+    _create_indexes()
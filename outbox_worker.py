@@ -0,0 +1,23 @@
+# outbox_worker.py
+# Отдельный процесс доставки уведомлений из outbox.
+# Используйте вместе с OUTBOX_DISPATCHER_ENABLED=false у API,
+# если не хотите гонять диспетчер в процессе uvicorn.
+import asyncio
+import logging
+
+from app.db import dispose_engines
+from app.outbox import run_dispatcher
+from app.telegram_client import telegram
+
+
+async def main() -> None:
+    try:
+        await run_dispatcher()
+    finally:
+        await telegram.close()
+        await dispose_engines()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
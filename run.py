@@ -3,37 +3,19 @@ import os
 import asyncio
 import contextlib
 
-from aiogram import Bot, Dispatcher
-from aiogram.filters import CommandStart
-from aiogram.types import Message
-
-import uvicorn
-from uvicorn.config import Config
-from uvicorn.server import Server
-
-# импорт FastAPI-приложения (твой backend)
+# импорт FastAPI-приложения (твой backend); aiogram — только в режиме polling
+from app.config import settings
 from app.main import app
 
 # ==== настройки бота ====
 BOT_TOKEN = os.environ["BOT_TOKEN"]  # токен твоего бота
 
-bot = Bot(BOT_TOKEN)
-dp = Dispatcher()
-
-
-@dp.message(CommandStart())
-async def on_start(m: Message):
-    # Никаких WebApp-кнопок. Пользователь открывает мини-апп
-    # через нижнюю меню-кнопку «Заявка на трансфер»
-    # (настраивается в BotFather -> /setmenubutton -> Web App).
-    await m.answer(
-        "Здравствуйте! Чтобы оформить поездку, нажмите нижнюю кнопку "
-        "«Заявка на трансфер»."
-    )
-
 
 # ==== запуск Uvicorn (FastAPI) в этом же процессе ====
 async def run_uvicorn() -> None:
+    from uvicorn.config import Config
+    from uvicorn.server import Server
+
     port = int(os.environ.get("PORT", "10000"))  # Render прокидывает PORT
     config = Config(
         app=app,
@@ -46,10 +28,27 @@ async def run_uvicorn() -> None:
     await server.serve()
 
 
+async def run_polling() -> None:
+    from aiogram import Bot
+
+    from app.bot_handlers import dp
+
+    bot = Bot(BOT_TOKEN)
+    # getUpdates не работает, пока у бота висит webhook (например, после прод-режима)
+    await bot.delete_webhook()
+    await dp.start_polling(bot)
+
+
 async def main() -> None:
-    # Поднимаем сервер API и бота одновременно.
+    if settings.BOT_MODE == "webhook":
+        # Апдейты принимает сам API (app/webhook.py), отдельный поллинг не нужен.
+        # В этом режиме можно вместо run.py запускать uvicorn с --workers N.
+        await run_uvicorn()
+        return
+
+    # Dev-режим: поднимаем сервер API и long polling бота одновременно.
     api_task = asyncio.create_task(run_uvicorn(), name="uvicorn")
-    bot_task = asyncio.create_task(dp.start_polling(bot), name="bot")
+    bot_task = asyncio.create_task(run_polling(), name="bot")
 
     # Ждём первую ошибку, вторую аккуратно гасим
     done, pending = await asyncio.wait(
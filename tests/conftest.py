@@ -0,0 +1,91 @@
+# tests/conftest.py
+"""
+Общая настройка тестов: настройки читаются при импорте app.config, поэтому
+окружение задаётся здесь, до первого импорта app. БД — SQLite-файл во
+временной папке (WAL, writer и BEGIN IMMEDIATE — как в SQLite-режиме),
+схема — create_all.
+
+Запуск из корня репозитория: python -m pytest
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import tempfile
+import time
+import urllib.parse
+from datetime import datetime, timedelta, timezone
+
+_tmp = tempfile.mkdtemp(prefix="transfer-tests-")
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{_tmp}/test.db",
+    BOT_TOKEN="1000000:test-token",
+    FORWARD_BOT_TOKEN="2000000:test-forward",
+    FORWARD_CHAT_ID="-100123",
+    BOT_MODE="polling",
+    OUTBOX_DISPATCHER_ENABLED="false",
+    IDEMPOTENCY_PURGE_INTERVAL="0",
+    FORWARD_RATE_PER_MINUTE="0",
+    DB_AUTO_CREATE="false",
+    DB_POOL_WARM="0",
+    TELEGRAM_API_BASE="http://127.0.0.1:9",  # сеть в тестах не нужна: отправка подменяется
+)
+
+import pytest  # noqa: E402
+
+from app.db import async_engine, init_db  # noqa: E402
+
+BOT_TOKEN = os.environ["BOT_TOKEN"]
+
+
+def pytest_configure(config):
+    # «execution_options ignored» и подобные — признак того, что BEGIN IMMEDIATE не сработал
+    config.addinivalue_line("filterwarnings", "error::sqlalchemy.exc.SAWarning")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    init_db()
+
+
+def run(coro):
+    """asyncio.run + сброс пула: соединения aiosqlite не переживают свой event loop."""
+    async def main():
+        try:
+            return await coro
+        finally:
+            await async_engine.dispose()
+
+    return asyncio.run(main())
+
+
+def sign_init_data(user_id: int, bot_token: str = BOT_TOKEN) -> str:
+    """initData, подписанный так же, как это делает Telegram."""
+    fields = {
+        "auth_date": str(int(time.time())),
+        "user": json.dumps({"id": user_id, "first_name": "Тест"}, ensure_ascii=False),
+    }
+    check = "\n".join(f"{k}={fields[k]}" for k in sorted(fields))
+    secret = hmac.new(b"WebAppData", bot_token.encode(), hashlib.sha256).digest()
+    fields["hash"] = hmac.new(secret, check.encode(), hashlib.sha256).hexdigest()
+    return urllib.parse.urlencode(fields)
+
+
+def transfer_payload(**overrides) -> dict:
+    """Валидное тело POST /transfers (выезд через двое суток)."""
+    when = datetime.now(timezone.utc) + timedelta(days=2)
+    payload = {
+        "departure_city": "Москва",
+        "departure_address": "Шереметьево, Т2",
+        "arrival_city": "Тверь",
+        "arrival_address": "Вокзал",
+        "datetime": when.isoformat(),
+        "vehicle_class": "comfort",
+        "pax_count": 2,
+        "contact_phone": "+79990000000",
+        "contact_method": "telegram",
+        "telegram_init_data": "",
+    }
+    payload.update(overrides)
+    return payload
@@ -0,0 +1,91 @@
+# tests/test_batch.py
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from fastapi.testclient import TestClient
+from sqlalchemy import func
+from sqlmodel import select
+
+from app.db import AsyncSessionLocal
+from app.main import app
+from app.models import OutboxKind, OutboxMessage, Transfer
+from conftest import run, sign_init_data, transfer_payload
+
+
+async def _count(ids: list[str]) -> int:
+    async with AsyncSessionLocal() as session:
+        return (await session.exec(
+            select(func.count()).select_from(Transfer)
+            .where(Transfer.id.in_([uuid.UUID(i) for i in ids]))
+        )).one()
+
+
+def _post(client: TestClient, items: list, user_id: int, key: str | None = None):
+    headers = {"X-Telegram-InitData": sign_init_data(user_id)}
+    if key:
+        headers["Idempotency-Key"] = key
+    return client.post("/transfers/batch", json=items, headers=headers)
+
+
+def test_identical_items_are_separate_transfers():
+    """Две одинаковые заявки в пакете (две машины для группы) — две записи, не повтор."""
+    item = transfer_payload(vehicle_class="minivan", pax_count=7)
+    with TestClient(app) as client:
+        resp = _post(client, [item, item], user_id=401)
+    body = resp.json()
+    assert resp.status_code == 200
+    assert body["accepted"] == 2 and body["rejected"] == 0
+    ids = [i["id"] for i in body["items"]]
+    assert len(set(ids)) == 2
+    assert not any(i["replayed"] for i in body["items"])
+    assert run(_count(ids)) == 2
+
+
+def test_batch_retry_is_replayed():
+    items = [transfer_payload(), transfer_payload(pax_count=3)]
+    init = sign_init_data(402)
+    with TestClient(app) as client:
+        headers = {"X-Telegram-InitData": init, "Idempotency-Key": "batch-1"}
+        first = client.post("/transfers/batch", json=items, headers=headers).json()
+        retry = client.post("/transfers/batch", json=items, headers=headers).json()
+        # без заголовка ключ — initData.hash + тело + позиция
+        plain = client.post("/transfers/batch", json=items,
+                            headers={"X-Telegram-InitData": init}).json()
+        plain_retry = client.post("/transfers/batch", json=items,
+                                  headers={"X-Telegram-InitData": init}).json()
+    first_ids = [i["id"] for i in first["items"]]
+    assert [i["id"] for i in retry["items"]] == first_ids
+    assert all(i["replayed"] for i in retry["items"]) and retry["accepted"] == 2
+    plain_ids = [i["id"] for i in plain["items"]]
+    assert not set(plain_ids) & set(first_ids)
+    assert [i["id"] for i in plain_retry["items"]] == plain_ids
+    assert all(i["replayed"] for i in plain_retry["items"])
+    assert run(_count(first_ids + plain_ids)) == 4
+
+
+def test_invalid_items_are_rejected_by_index():
+    items = [transfer_payload(), transfer_payload(pax_count=9), {"departure_city": "Москва"}]
+    with TestClient(app) as client:
+        body = _post(client, items, user_id=403).json()
+    assert (body["accepted"], body["rejected"]) == (1, 2)
+    assert [i["status"] for i in body["items"]] == ["accepted", "rejected", "rejected"]
+    assert "максимум 3" in body["items"][1]["error"]
+
+
+async def _summary_urgency(transfer_id: str) -> list[bool]:
+    async with AsyncSessionLocal() as session:
+        rows = (await session.exec(
+            select(OutboxMessage)
+            .where(OutboxMessage.kind == OutboxKind.forward)
+            .where(OutboxMessage.text.contains(transfer_id))
+        )).all()
+        return [row.urgent for row in rows]
+
+
+def test_batch_summary_is_urgent_when_any_item_departs_soon():
+    soon = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+    with TestClient(app) as client:
+        mixed = _post(client, [transfer_payload(), transfer_payload(datetime=soon)], user_id=404)
+        later = _post(client, [transfer_payload()], user_id=405)
+    assert run(_summary_urgency(mixed.json()["items"][0]["id"])) == [True]
+    assert run(_summary_urgency(later.json()["items"][0]["id"])) == [False]
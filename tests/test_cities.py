@@ -0,0 +1,44 @@
+# tests/test_cities.py
+import pytest
+
+from app.cities import BUNDLED_CITIES, CityIndex
+
+
+def _index(**kwargs) -> CityIndex:
+    index = CityIndex(**kwargs)
+    for city_id, name, aliases in BUNDLED_CITIES:
+        index.add(city_id, name, aliases)
+    return index
+
+
+@pytest.mark.parametrize("names", [
+    ["Urengoy", "Уренгой"],
+    ["Уренгой", "Urengoy"],
+    ["москва", "Moscow", "vjcrdf"],
+    ["Питер", "г. Санкт-Петербург", "Saint Petersburg"],
+])
+def test_ids_do_not_depend_on_input_order(names):
+    forward = _index(min_count=1)
+    backward = _index(min_count=1)
+    ids = [forward.observe(n) for n in names]
+    ids_reversed = [backward.observe(n) for n in reversed(names)]
+    assert len(set(ids)) == 1
+    assert ids == ids_reversed[::-1]
+
+
+def test_unknown_names_need_min_count_before_suggest():
+    index = _index(min_count=3)
+    for _ in range(2):
+        index.observe("Новый Уренгой")
+    assert index.suggest("новый") == []
+    index.observe("Новый Уренгой")
+    assert index.suggest("новый") == [("novyy-urengoy", "Новый Уренгой")]
+
+
+def test_candidates_are_bounded():
+    index = _index(min_count=3, max_candidates=100, max_learned=10)
+    before = len(index)
+    for n in range(5000):
+        index.observe(f"Город {n}")
+    assert len(index) == before
+    assert len(index._candidates) == 100
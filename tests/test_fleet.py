@@ -0,0 +1,60 @@
+# tests/test_fleet.py
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import idempotency
+from app.config import settings
+from app.db import write_session
+from app.main import app
+from app.models import Vehicle, VehicleClass
+from conftest import run, sign_init_data, transfer_payload
+
+# у premium в тестах одна машина; время — своё у каждого теста, чтобы брони не пересекались
+_BASE = datetime.now(timezone.utc).replace(microsecond=0) + timedelta(days=30)
+
+
+async def _add_vehicle() -> None:
+    async with write_session() as session:
+        session.add(Vehicle(vehicle_class=VehicleClass.premium, name="test"))
+        await session.commit()
+
+
+@pytest.fixture(scope="module", autouse=True)
+def premium_vehicle():
+    run(_add_vehicle())
+
+
+@pytest.fixture(autouse=True)
+def fleet_check(monkeypatch):
+    monkeypatch.setattr(settings, "FLEET_CHECK_ENABLED", True)
+
+
+def _premium(days: int, **overrides) -> dict:
+    when = _BASE + timedelta(days=days)
+    return transfer_payload(vehicle_class="premium", datetime=when.isoformat(), **overrides)
+
+
+def test_second_booking_of_the_only_vehicle_is_rejected():
+    headers = {"X-Telegram-InitData": sign_init_data(301)}
+    with TestClient(app) as client:
+        first = client.post("/transfers", json=_premium(0), headers=headers)
+        overlapping = client.post("/transfers", json=_premium(0, pax_count=1), headers=headers)
+        later = client.post("/transfers", json=_premium(1), headers=headers)
+    assert first.status_code == 201
+    assert overlapping.status_code == 409
+    assert later.status_code == 201
+
+
+def test_replay_is_not_rejected_by_its_own_booking():
+    """Повтор после истечения кэша процесса (или на другом воркере) — replay, не 409."""
+    headers = {"X-Telegram-InitData": sign_init_data(302), "Idempotency-Key": "fleet-replay"}
+    with TestClient(app) as client:
+        first = client.post("/transfers", json=_premium(2), headers=headers)
+        idempotency._recent.clear()
+        retry = client.post("/transfers", json=_premium(2), headers=headers)
+    assert first.status_code == 201
+    assert retry.status_code == 201
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json()["id"] == first.json()["id"]
@@ -0,0 +1,106 @@
+# tests/test_outbox.py
+import asyncio
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete
+from sqlmodel import select
+
+from app import outbox
+from app.db import write_session
+from app.models import OutboxKind, OutboxMessage, OutboxStatus
+from app.sqlite_writer import GroupCommitWriter
+from conftest import run
+
+
+def _message(text: str) -> OutboxMessage:
+    return OutboxMessage(kind=OutboxKind.user_confirmation, chat_id="1", text=text)
+
+
+async def _pending() -> int:
+    async with write_session() as session:
+        rows = (await session.exec(
+            select(OutboxMessage).where(OutboxMessage.status == OutboxStatus.pending)
+        )).all()
+        return len(rows)
+
+
+def test_delivered_exactly_once_with_concurrent_writer(monkeypatch):
+    """
+    Два диспетчера и writer, который коммитит, пока идёт отправка: каждое
+    сообщение уходит ровно один раз (раньше коммит writer'а между SELECT и
+    UPDATE диспетчера откатывал пачку, и она отправлялась повторно).
+    """
+    sent: list[str] = []
+
+    async def fake_send(token, chat_id, text):
+        sent.append(text)
+        await asyncio.sleep(0.002)
+
+    monkeypatch.setattr(outbox, "send_user_confirmation", fake_send)
+
+    async def scenario() -> set[str]:
+        async with write_session() as session:
+            await session.exec(delete(OutboxMessage))
+            session.add_all(_message(f"initial-{i}") for i in range(60))
+            await session.commit()
+
+        writer = GroupCommitWriter(write_session, max_batch=8)
+        written: set[str] = {f"initial-{i}" for i in range(60)}
+        stop = asyncio.Event()
+
+        async def keep_writing():
+            n = 0
+            while not stop.is_set():
+                text = f"written-{n}"
+
+                async def job(session, text=text):
+                    session.add(_message(text))
+
+                await writer.submit(job)
+                written.add(text)
+                n += 1
+
+        async def dispatcher():
+            while not stop.is_set():
+                if not await outbox.dispatch_batch():
+                    await asyncio.sleep(0.005)
+
+        tasks = [asyncio.create_task(keep_writing())] + [
+            asyncio.create_task(dispatcher()) for _ in range(2)
+        ]
+        await asyncio.sleep(1.0)
+        stop.set()
+        await asyncio.gather(*tasks)
+        await writer.stop()
+        while await outbox.dispatch_batch():
+            pass
+        assert await _pending() == 0
+        return written
+
+    written = run(scenario())
+    counts = Counter(sent)
+    assert set(counts) == written
+    assert [text for text, n in counts.items() if n > 1] == []
+
+
+def test_claimed_rows_are_leased(monkeypatch):
+    """Строки, забранные диспетчером, не видны второму до конца аренды."""
+    async def scenario():
+        async with write_session() as session:
+            await session.exec(delete(OutboxMessage))
+            session.add(_message("leased"))
+            await session.commit()
+        stmt = (
+            select(OutboxMessage)
+            .where(OutboxMessage.status == OutboxStatus.pending)
+            .where(OutboxMessage.next_attempt_at <= datetime.utcnow())
+        )
+        first = await outbox._claim(stmt)
+        second = await outbox._claim(stmt)
+        return first, second
+
+    first, second = run(scenario())
+    assert [m.text for m in first] == ["leased"]
+    assert second == []
+    assert first[0].next_attempt_at > datetime.utcnow() + timedelta(seconds=60)
@@ -0,0 +1,25 @@
+# tests/test_overload.py
+import sqlite3
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import OperationalError
+
+from app import history
+from app.main import app
+from conftest import sign_init_data
+
+
+@pytest.mark.parametrize("message, status", [
+    ("database is locked", 503),     # БД занята — перегрузка, Retry-After
+    ("no such table: transfer", 500),  # ошибка схемы — не маскируется под перегрузку
+])
+def test_operational_error_mapping(monkeypatch, message, status):
+    async def failing(user_id):
+        raise OperationalError("SELECT 1", {}, sqlite3.OperationalError(message))
+
+    monkeypatch.setattr(history, "get_user_transfers", failing)
+    client = TestClient(app, raise_server_exceptions=False)
+    resp = client.get("/me/transfers", headers={"X-Telegram-InitData": sign_init_data(601)})
+    assert resp.status_code == status
+    assert ("Retry-After" in resp.headers) == (status == 503)
@@ -0,0 +1,66 @@
+# tests/test_ratelimit.py
+from fastapi.testclient import TestClient
+
+from app import auth
+from app.main import app
+from app.ratelimit import LocalBuckets, RateLimiter
+from conftest import run, sign_init_data, transfer_payload
+
+
+def test_local_bucket_limits_after_burst():
+    limiter = RateLimiter(LocalBuckets(100), {"ip": (60.0, 2)})
+
+    async def scenario():
+        return [await limiter.check("ip", "10.0.0.1") for _ in range(3)] + [
+            await limiter.check("ip", "10.0.0.2")
+        ]
+
+    first, second, third, other = run(scenario())
+    assert first == second == 0
+    assert 0 < third <= 1.0   # 60 в минуту → токен через секунду
+    assert other == 0         # у другого клиента своя корзина
+
+
+def test_post_transfers_returns_429_with_retry_after(monkeypatch):
+    monkeypatch.setattr(
+        auth, "transfer_limiter",
+        RateLimiter(LocalBuckets(100), {"user": (6.0, 2), "ip": (0, 1)}),
+    )
+    headers = {"X-Telegram-InitData": sign_init_data(777)}
+    with TestClient(app) as client:
+        codes = [client.post("/transfers", json=transfer_payload(), headers=headers) for _ in range(3)]
+    assert [r.status_code for r in codes] == [201, 201, 429]
+    assert int(codes[2].headers["Retry-After"]) >= 1
+
+
+def test_replay_of_accepted_transfer_is_not_limited(monkeypatch):
+    monkeypatch.setattr(
+        auth, "transfer_limiter",
+        RateLimiter(LocalBuckets(100), {"user": (6.0, 1), "ip": (0, 1)}),
+    )
+    headers = {"X-Telegram-InitData": sign_init_data(778), "Idempotency-Key": "rl-replay"}
+    payload = transfer_payload()
+    with TestClient(app) as client:
+        first = client.post("/transfers", json=payload, headers=headers)
+        retry = client.post("/transfers", json=payload, headers=headers)
+    assert first.status_code == retry.status_code == 201
+    assert retry.headers["Idempotent-Replayed"] == "true"
+
+
+def test_batch_is_charged_per_item(monkeypatch):
+    monkeypatch.setattr(
+        auth, "transfer_limiter",
+        RateLimiter(LocalBuckets(100), {"user": (0, 1), "ip": (0, 1), "batch": (6.0, 3)}),
+    )
+    headers = {"X-Telegram-InitData": sign_init_data(779)}
+    batch = [transfer_payload()] * 2
+    with TestClient(app) as client:
+        first = client.post("/transfers/batch", json=batch, headers=headers)
+        second = client.post("/transfers/batch", json=[transfer_payload(pax_count=1)] * 2,
+                             headers=headers)
+        # повтор первого пакета (те же ключи) токенов не тратит
+        replay = client.post("/transfers/batch", json=batch, headers=headers)
+    assert first.status_code == 200 and first.json()["accepted"] == 2
+    assert second.status_code == 429 and int(second.headers["Retry-After"]) >= 1
+    assert replay.status_code == 200
+    assert all(i["replayed"] for i in replay.json()["items"])
@@ -0,0 +1,65 @@
+# tests/test_read_api.py
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from conftest import sign_init_data, transfer_payload
+
+ADMIN = {"X-Admin-Token": "test-admin"}
+
+
+@pytest.fixture(autouse=True)
+def admin_token(monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "test-admin")
+
+
+def test_admin_endpoints_fail_closed_without_token(monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", None)
+    client = TestClient(app)
+    for path in ("/transfers", "/transfers/export", "/stats"):
+        assert client.get(path).status_code == 503
+    monkeypatch.setattr(settings, "ADMIN_OPEN", True)
+    assert client.get("/stats").status_code == 200
+
+
+def test_admin_token_is_required():
+    client = TestClient(app)
+    assert client.get("/transfers").status_code == 401
+    assert client.get("/transfers", headers={"X-Admin-Token": "wrong"}).status_code == 401
+    assert client.get("/transfers", headers=ADMIN).status_code == 200
+
+
+def test_keyset_pagination_walks_every_row_once():
+    """Страницы по (datetime, id): одинаковое время у нескольких заявок не теряет и не дублирует строк."""
+    when = datetime.now(timezone.utc).replace(microsecond=0) + timedelta(days=5)
+    times = [when] * 4 + [when + timedelta(hours=1)] * 3
+    items = [
+        transfer_payload(departure_city="Пагинск", datetime=t.isoformat()) for t in times
+    ]
+    with TestClient(app) as client:
+        batch = client.post(
+            "/transfers/batch", json=items, headers={"X-Telegram-InitData": sign_init_data(501)}
+        ).json()
+        assert batch["accepted"] == len(items)
+
+        seen, cursor, pages = [], None, 0
+        while True:
+            params = {"departure_city": "Пагинск", "limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            page = client.get("/transfers", params=params, headers=ADMIN).json()
+            seen += page["items"]
+            pages += 1
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        bad = client.get("/transfers", params={"cursor": "!!"}, headers=ADMIN)
+
+    assert pages == 4
+    assert sorted(t["id"] for t in seen) == sorted(i["id"] for i in batch["items"])
+    keys = [(t["datetime"], t["id"]) for t in seen]
+    assert keys == sorted(keys)
+    assert bad.status_code == 400
@@ -0,0 +1,47 @@
+# tests/test_security.py
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.security import verify_init_data
+from conftest import sign_init_data, transfer_payload
+
+
+def test_valid_init_data_is_accepted():
+    init = verify_init_data(sign_init_data(42))
+    assert init is not None and init.user_id == 42
+
+
+@pytest.mark.parametrize("raw", [
+    "auth_date=1&hash=%D0%B9",          # не-ASCII: compare_digest бросал TypeError
+    "auth_date=1&hash=abc",             # не 64 символа
+    "auth_date=1&hash=" + "z" * 64,     # не hex
+    "auth_date=1&hash=" + "a" * 64,     # hex, но подпись не та
+])
+def test_malformed_hash_is_rejected(raw):
+    assert verify_init_data(raw) is None
+
+
+def test_malformed_hash_returns_401_not_500():
+    client = TestClient(app, raise_server_exceptions=False)
+    resp = client.post(
+        "/transfers",
+        json=transfer_payload(),
+        headers={"X-Telegram-InitData": "auth_date=1&hash=%D0%B9"},
+    )
+    assert resp.status_code == 401
+    resp = client.get("/me/transfers", headers={"X-Telegram-InitData": "auth_date=1&hash=%D0%B9"})
+    assert resp.status_code == 401
+
+
+def test_me_transfers_needs_verified_signature(monkeypatch):
+    """Неподписанный user={"id":N} не открывает чужие заявки, даже с SKIP_INITDATA_VERIFY."""
+    unsigned = "auth_date=1&user=%7B%22id%22%3A42%7D&hash=" + "0" * 64
+    client = TestClient(app)
+    assert client.get("/me/transfers", headers={"X-Telegram-InitData": unsigned}).status_code == 401
+    signed = sign_init_data(42)
+    assert client.get("/me/transfers", headers={"X-Telegram-InitData": signed}).status_code == 200
+    monkeypatch.setattr(settings, "SKIP_INITDATA_VERIFY", True)
+    for raw in (unsigned, signed):
+        assert client.get("/me/transfers", headers={"X-Telegram-InitData": raw}).status_code == 401
@@ -0,0 +1,33 @@
+# tests/test_texts.py
+import uuid
+
+from app.schemas import TransferCreate
+from app.texts import build_batch_text, build_confirmation_text, build_transfer_text
+from conftest import transfer_payload
+
+_MARKUP = "<b>&"
+
+
+def _data() -> TransferCreate:
+    return TransferCreate.model_validate(transfer_payload(
+        departure_city=f"Москва {_MARKUP}",
+        departure_address=f"Т2 {_MARKUP}",
+        arrival_city=f"Тверь {_MARKUP}",
+        arrival_address=f"Вокзал {_MARKUP}",
+        contact_method="whatsapp",
+        comment=f"встречать с табличкой {_MARKUP}",
+    ))
+
+
+def test_user_fields_are_html_escaped():
+    """parse_mode=HTML: «<» из комментария не должен ломать сообщение (400 от Telegram)."""
+    transfer_id = uuid.uuid4()
+    texts = [
+        build_transfer_text(_data(), transfer_id),
+        build_confirmation_text(_data(), transfer_id),
+        build_batch_text([(transfer_id, _data())]),
+    ]
+    for text in texts:
+        assert _MARKUP not in text
+        assert "&lt;b&gt;&amp;" in text
+    assert '<a href="tel:+79990000000">' in texts[0]  # своя разметка остаётся
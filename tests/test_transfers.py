@@ -0,0 +1,35 @@
+# tests/test_transfers.py
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import select
+
+from app import sqlite_writer
+from app.db import AsyncSessionLocal
+from app.main import app
+from app.models import Transfer
+from conftest import run, sign_init_data, transfer_payload
+
+
+async def _load(transfer_id: uuid.UUID) -> Transfer | None:
+    async with AsyncSessionLocal() as session:
+        return (await session.exec(select(Transfer).where(Transfer.id == transfer_id))).first()
+
+
+@pytest.mark.parametrize("group_commit", [True, False])
+def test_create_transfer_is_written_through_async_session(monkeypatch, group_commit):
+    """POST /transfers пишет через AsyncSession: и через writer, и напрямую."""
+    if not group_commit:
+        monkeypatch.setattr(sqlite_writer, "writer", None)
+    with TestClient(app) as client:
+        resp = client.post(
+            "/transfers",
+            json=transfer_payload(comment="  у выхода B  "),
+            headers={"X-Telegram-InitData": sign_init_data(101)},
+        )
+    assert resp.status_code == 201
+    transfer = run(_load(uuid.UUID(resp.json()["id"])))
+    assert transfer is not None
+    assert transfer.telegram_user_id == 101
+    assert transfer.comment == "у выхода B"
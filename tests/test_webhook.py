@@ -0,0 +1,21 @@
+# tests/test_webhook.py
+import logging
+from types import SimpleNamespace
+
+from app import webhook
+from conftest import run
+
+
+class _FailingDispatcher:
+    async def feed_update(self, bot, update):
+        raise RuntimeError("db is down")
+
+
+def test_handler_error_is_logged(caplog):
+    """Ошибка обработчика апдейта не теряется в «Task exception was never retrieved»."""
+    update = SimpleNamespace(update_id=7)
+    with caplog.at_level(logging.ERROR, logger="app.webhook"):
+        run(webhook._process_update(_FailingDispatcher(), update))
+    [record] = caplog.records
+    assert "update 7 failed" in record.getMessage()
+    assert record.exc_info[0] is RuntimeError